@@ -3,42 +3,115 @@
 
 This script reads a JSON configuration that describes which workflows to run,
 which local assets to upload, and how to patch prompts or other node inputs
-before execution. It uploads the required assets, runs each workflow in
-sequence, downloads any image/video outputs, and stores run metadata for later
-inspection.
+before execution. It uploads the required assets, runs the workflows with a
+bounded number of prompts in flight, downloads any image/video outputs, and
+stores run metadata for later inspection.
+
+The engine is asyncio based (:class:`AsyncComfyAPIClient`,
+:class:`AsyncBatchWorkflowTester`); :class:`ComfyAPIClient` and
+:class:`BatchWorkflowTester` are blocking wrappers that drive it from a
+background event loop.
 """
 
 from __future__ import annotations
 
 import argparse
+import asyncio
+import glob
+import hashlib
+import itertools
 import json
 import logging
+import math
 import os
 import re
+import threading
 import time
 import uuid
-from dataclasses import dataclass, field
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager, suppress
+from dataclasses import dataclass, field, replace
+from functools import partial
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Mapping, MutableMapping, Optional, Sequence, Tuple
-
-import requests
-import websocket
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Coroutine,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    MutableMapping,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+import aiohttp
+
+import case_table
+from latency_history import DEFAULT_LATENCY_HISTORY, LatencyHistory, format_report
+from metrics import LONG_BUCKETS, Counter, Gauge, Histogram
+from result_cache import ResultCache, prompt_key
+from upload_cache import UploadCache
 
 
 LOG = logging.getLogger("batch_workflow_tester")
 
 DEFAULT_CONFIG_PATH = "workflow_test_config.json"
 DEFAULT_OUTPUT_ROOT = "workflow_test_output"
+DEFAULT_UPLOAD_CACHE = ".comfy_upload_cache.json"
+# Number of prompts kept queued on the server while earlier results are fetched.
+DEFAULT_MAX_IN_FLIGHT = 1
 
 # Very small helper to hint upload endpoint selection when the config omits it.
 IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp", ".bmp", ".gif"}
 VIDEO_EXTENSIONS = {".mp4", ".mov", ".avi", ".mkv", ".webm", ".gif"}
+OUTPUT_BUCKETS = ("images", "files", "gifs", "videos", "audio")
+# Outputs are streamed to disk in chunks of this size instead of being held in memory.
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+# Outputs of one prompt fetched side by side, and attempts per output.
+DOWNLOAD_CONCURRENCY = 4
+DOWNLOAD_ATTEMPTS = 3
+# Failures that mean the server itself is unreachable rather than the workflow being wrong.
+CONNECTION_ERRORS = (aiohttp.ClientConnectionError, asyncio.TimeoutError)
+
+# Telemetry, exported by the web app on /metrics.
+HTTP_SECONDS = Histogram(
+    "comfy_http_request_seconds", "Latency of ComfyUI API requests.", ("server", "operation"), buckets=LONG_BUCKETS
+)
+HTTP_ERRORS = Counter("comfy_http_errors_total", "ComfyUI API requests that failed.", ("server", "operation"))
+UPLOAD_BYTES = Counter("comfy_upload_bytes_total", "Bytes uploaded to ComfyUI.", ("server",))
+DOWNLOAD_BYTES = Counter("comfy_download_bytes_total", "Output bytes downloaded from ComfyUI.", ("server",))
+PROMPTS = Counter("comfy_prompts_total", "Prompts executed, by outcome.", ("server", "status"))
+RUNS = Counter("comfy_runs_total", "Cases run by the batch tester, by outcome.", ("status",))
+RUN_STAGE_SECONDS = Histogram(
+    "comfy_run_stage_seconds", "Time spent in each stage of a run.", ("server", "stage"), buckets=LONG_BUCKETS
+)
+SERVER_UP = Gauge("comfy_server_up", "1 if the last request to the server got through, 0 if it could not connect.", ("server",))
+SERVER_QUEUE_DEPTH = Gauge("comfy_server_queue_depth", "Prompts queued or running on the server at the last poll.", ("server",))
+SERVER_VRAM_FREE = Gauge("comfy_server_vram_free_bytes", "Free VRAM reported by the server at the last poll.", ("server",))
+
+T = TypeVar("T")
 
 
 class ComfyAPIError(RuntimeError):
     """Represents an error reported by the ComfyUI API during execution."""
 
 
+class ComfyHTTPError(ComfyAPIError):
+    """A ComfyUI endpoint answered with an HTTP error status."""
+
+    def __init__(self, message: str, status: int):
+        super().__init__(message)
+        self.status = status
+
+
 def _sanitize_for_fs(value: str) -> str:
     cleaned = re.sub(r"[^\w.\-]+", "_", value).strip("_")
     return cleaned or "workflow"
@@ -55,37 +128,465 @@ def _iter_dict_items(data: Mapping[str, Any]) -> Iterable[Tuple[str, Any]]:
         yield key, value
 
 
-class ComfyAPIClient:
-    """Thin wrapper around the ComfyUI HTTP/WebSocket API."""
+@dataclass
+class NodeTiming:
+    """When one node ran, in ``time.monotonic`` seconds."""
+
+    node: str
+    started_at: float
+    finished_at: Optional[float] = None
+    cached: bool = False
+    steps: int = 0
+    first_progress_at: Optional[float] = None
+
+    def to_dict(self, origin: float, class_type: Optional[str] = None) -> Dict[str, Any]:
+        finished_at = self.finished_at if self.finished_at is not None else self.started_at
+        data: Dict[str, Any] = {
+            "node": self.node,
+            "start": round(self.started_at - origin, 4),
+            "duration": round(finished_at - self.started_at, 4),
+        }
+        if class_type:
+            data["class_type"] = class_type
+        if self.cached:
+            data["cached"] = True
+        if self.steps:
+            data["steps"] = self.steps
+        if self.first_progress_at is not None:
+            # Time before the first sampling step, typically spent loading models.
+            data["until_first_progress"] = round(self.first_progress_at - self.started_at, 4)
+        return data
+
+
+@dataclass
+class PromptTimeline:
+    """Execution events of one prompt as seen on the websocket.
+
+    ComfyUI announces each node with ``executing`` when it starts, so a node
+    runs until the next ``executing`` message (``node: None`` ends the prompt).
+    """
+
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    nodes: Dict[str, NodeTiming] = field(default_factory=dict)
+    current: Optional[NodeTiming] = None
+
+    def record(self, message_type: Any, data: Mapping[str, Any], now: float) -> None:
+        if message_type == "execution_start":
+            self._begin(now)
+        elif message_type == "execution_cached":
+            self._begin(now)
+            for node in data.get("nodes") or []:
+                self.nodes.setdefault(str(node), NodeTiming(str(node), now, now, cached=True))
+        elif message_type == "executing":
+            self._close_current(now)
+            node = data.get("node")
+            if node is None:
+                self.finished_at = now
+            else:
+                self._begin(now)
+                self.current = self.nodes[str(node)] = NodeTiming(str(node), now)
+        elif message_type == "progress":
+            node = data.get("node")
+            timing = self.current if node is None else self.nodes.get(str(node))
+            if timing is not None:
+                timing.steps = max(timing.steps, int(data.get("max") or 0))
+                if timing.first_progress_at is None:
+                    timing.first_progress_at = now
+        elif message_type in ("execution_success", "execution_error", "execution_interrupted"):
+            self._close_current(now)
+            if self.finished_at is None:
+                self.finished_at = now
+
+    def node_timings(self, class_types: Optional[Mapping[str, str]] = None) -> List[Dict[str, Any]]:
+        if self.started_at is None:
+            return []
+        class_types = class_types or {}
+        return [timing.to_dict(self.started_at, class_types.get(node)) for node, timing in self.nodes.items()]
+
+    def _begin(self, now: float) -> None:
+        if self.started_at is None:
+            self.started_at = now
+
+    def _close_current(self, now: float) -> None:
+        if self.current is not None:
+            self.current.finished_at = now
+            self.current = None
+
+
+@dataclass
+class RunTimings:
+    """Seconds spent in each stage of one run, plus per-node execution times.
+
+    Stages are recorded in the order they happen: ``upload``, ``queue_wait``,
+    ``execution``, ``history_fetch``, ``download`` and ``persist``. When the
+    server reported no start event, the queue wait is counted as execution.
+    """
+
+    stages: Dict[str, float] = field(default_factory=dict)
+    nodes: List[Dict[str, Any]] = field(default_factory=list)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add(name, time.monotonic() - started)
+
+    def add(self, name: str, seconds: float) -> None:
+        self.stages[name] = round(self.stages.get(name, 0.0) + max(0.0, seconds), 4)
+
+    def record_prompt(
+        self,
+        submitted_at: float,
+        finished_at: float,
+        timeline: Optional[PromptTimeline],
+        prompt: Optional[Mapping[str, Any]] = None,
+    ) -> None:
+        started_at = timeline.started_at if timeline is not None else None
+        if timeline is not None and timeline.finished_at is not None:
+            finished_at = timeline.finished_at
+        if started_at is None:
+            self.add("execution", finished_at - submitted_at)
+            return
+        self.add("queue_wait", started_at - submitted_at)
+        self.add("execution", finished_at - started_at)
+        class_types = {
+            str(node_id): str(node.get("class_type"))
+            for node_id, node in (prompt or {}).items()
+            if isinstance(node, Mapping) and node.get("class_type")
+        }
+        self.nodes = timeline.node_timings(class_types)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {"stages": dict(self.stages), "total": round(sum(self.stages.values()), 4)}
+        if self.nodes:
+            data["nodes"] = list(self.nodes)
+        return data
+
+
+class PromptEventStream:
+    """One long-lived websocket per client_id, shared by every prompt it queues.
+
+    A reader task routes ``executing``/``progress``/``execution_error`` messages
+    to the future registered for their prompt_id and reconnects with backoff
+    when the connection drops. Completions that arrive before a future is
+    registered are remembered briefly so fast prompts are never missed. The
+    same messages build a :class:`PromptTimeline` per prompt, collected with
+    :meth:`take_timeline`.
+    """
+
+    RECENT_LIMIT = 256
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        ws_url: str,
+        *,
+        timeout: float,
+        on_reconnect: Optional[Callable[[List[str]], Awaitable[None]]] = None,
+        max_backoff: float = 10.0,
+    ):
+        self.session = session
+        self.ws_url = ws_url
+        self.timeout = timeout
+        self.on_reconnect = on_reconnect
+        self.max_backoff = max_backoff
+        self.last_message_at = time.monotonic()
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._waiters: Dict[str, "asyncio.Future[None]"] = {}
+        self._recent: "OrderedDict[str, Optional[ComfyAPIError]]" = OrderedDict()
+        self._timelines: "OrderedDict[str, PromptTimeline]" = OrderedDict()
+        self._closed = False
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    # ------------------------------------------------------------- lifecycle
+    async def start(self) -> None:
+        """Connect and start the reader; raises if the first connection fails."""
+        self._ws = await self._connect()
+        self._task = asyncio.create_task(self._run(), name="comfy-events")
+
+    async def close(self) -> None:
+        self._closed = True
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+        if self._ws is not None:
+            await self._ws.close()
+            self._ws = None
+        waiters, self._waiters = self._waiters, {}
+        for prompt_id, waiter in waiters.items():
+            self._settle(waiter, ComfyAPIError(f"Event stream closed while waiting for prompt {prompt_id}"))
+
+    # --------------------------------------------------------------- waiting
+    def register(self, prompt_id: str) -> "asyncio.Future[None]":
+        waiter: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        if prompt_id in self._recent:
+            self._settle(waiter, self._recent.pop(prompt_id))
+        else:
+            self._waiters[prompt_id] = waiter
+        return waiter
+
+    async def wait(self, prompt_id: str, waiter: "asyncio.Future[None]") -> None:
+        """Wait until the prompt finishes; time out after ``timeout`` seconds of silence."""
+        registered_at = time.monotonic()
+        try:
+            while True:
+                done, _ = await asyncio.wait({waiter}, timeout=1.0)
+                if done:
+                    waiter.result()
+                    return
+                idle = time.monotonic() - max(self.last_message_at, registered_at)
+                if idle > self.timeout:
+                    raise ComfyAPIError(f"Timed out waiting for prompt {prompt_id}")
+        finally:
+            if self._waiters.get(prompt_id) is waiter:
+                del self._waiters[prompt_id]
 
-    def __init__(self, base_url: str, *, timeout: float = 120.0):
+    def pending(self) -> List[str]:
+        return list(self._waiters)
+
+    def take_timeline(self, prompt_id: str) -> Optional[PromptTimeline]:
+        return self._timelines.pop(prompt_id, None)
+
+    def resolve(self, prompt_id: str, error: Optional[ComfyAPIError] = None) -> None:
+        waiter = self._waiters.pop(prompt_id, None)
+        if waiter is None:
+            self._recent[prompt_id] = error
+            while len(self._recent) > self.RECENT_LIMIT:
+                self._recent.popitem(last=False)
+            return
+        self._settle(waiter, error)
+
+    @staticmethod
+    def _settle(waiter: "asyncio.Future[None]", error: Optional[ComfyAPIError]) -> None:
+        if waiter.done():
+            return
+        if error is None:
+            waiter.set_result(None)
+        else:
+            waiter.set_exception(error)
+
+    # ---------------------------------------------------------------- reader
+    async def _connect(self) -> aiohttp.ClientWebSocketResponse:
+        LOG.debug("Opening websocket %s", self.ws_url)
+        ws = await asyncio.wait_for(self.session.ws_connect(self.ws_url, heartbeat=30.0), self.timeout)
+        self.last_message_at = time.monotonic()
+        return ws
+
+    async def _run(self) -> None:
+        backoff = 0.5
+        while not self._closed:
+            ws = self._ws
+            if ws is None:
+                try:
+                    ws = self._ws = await self._connect()
+                except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as exc:
+                    LOG.debug("Websocket reconnect to %s failed: %s", self.ws_url, exc)
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, self.max_backoff)
+                    continue
+                backoff = 0.5
+                LOG.info("Websocket %s reconnected", self.ws_url)
+                if self.on_reconnect is not None:
+                    try:
+                        await self.on_reconnect(self.pending())
+                    except Exception as exc:  # pylint: disable=broad-except
+                        LOG.warning("Reconciling prompts after reconnect failed: %s", exc)
+            message = await ws.receive()
+            if message.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSING, aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                if self._closed:
+                    break
+                LOG.warning("Websocket %s dropped: %s", self.ws_url, ws.exception() or "closed by server")
+                await ws.close()
+                self._ws = None
+                continue
+            self.last_message_at = time.monotonic()
+            if message.type != aiohttp.WSMsgType.TEXT or not message.data:
+                continue
+            try:
+                payload = json.loads(message.data)
+            except ValueError:
+                continue
+            self._dispatch(payload)
+
+    def _dispatch(self, message: Mapping[str, Any]) -> None:
+        message_type = message.get("type")
+        data = message.get("data") or {}
+        if not isinstance(data, Mapping):
+            return
+        prompt_id = data.get("prompt_id")
+        if message_type == "progress":
+            node_label = data.get("node") or "pipeline"
+            LOG.debug("Progress %s %s: %s/%s", prompt_id, node_label, data.get("value"), data.get("max"))
+        if not prompt_id:
+            return
+        timeline = self._timelines.get(prompt_id)
+        if timeline is None:
+            timeline = self._timelines[prompt_id] = PromptTimeline()
+            # Timelines nobody collects (e.g. prompts queued by another tool with our client_id) are dropped.
+            while len(self._timelines) > self.RECENT_LIMIT:
+                self._timelines.popitem(last=False)
+        timeline.record(message_type, data, self.last_message_at)
+        if message_type == "execution_error":
+            self.resolve(prompt_id, ComfyAPIError(f"Execution error: {dict(data)}"))
+        elif message_type == "execution_interrupted":
+            self.resolve(prompt_id, ComfyAPIError("Execution interrupted by server"))
+        elif message_type == "executing" and data.get("node") is None:
+            self.resolve(prompt_id)
+        elif message_type == "execution_success":
+            self.resolve(prompt_id)
+
+
+class AsyncComfyAPIClient:
+    """asyncio client for the ComfyUI HTTP/WebSocket API.
+
+    All prompts queued by one client share a single persistent websocket, so
+    any number of tasks may await :meth:`execute_prompt` concurrently. The
+    HTTP session is opened on first use inside the running event loop. With an
+    ``upload_cache``, files this server already holds are not sent again.
+    """
+
+    def __init__(self, base_url: str, *, timeout: float = 120.0, upload_cache: Optional[UploadCache] = None):
         base_url = base_url.rstrip("/")
         if base_url.endswith("/json"):
             base_url = base_url[:-5]
         self.base_url = base_url
-        self.session = requests.Session()
         self.client_id = str(uuid.uuid4())
         self.timeout = timeout
+        self.upload_cache = upload_cache
+        self._pending_uploads: Dict[str, "asyncio.Task[str]"] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._events: Optional[PromptEventStream] = None
+        self._events_lock = asyncio.Lock()
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            # Request timeouts are applied per call; uploads and downloads may take long.
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=None, sock_connect=self.timeout))
+        return self._session
+
+    async def close(self) -> None:
+        events, self._events = self._events, None
+        if events is not None:
+            await events.close()
+        session, self._session = self._session, None
+        if session is not None:
+            await session.close()
+        if self.upload_cache is not None:
+            # Uploads are written back on a timer; persist whatever is still pending.
+            await asyncio.to_thread(self.upload_cache.flush)
+
+    async def __aenter__(self) -> "AsyncComfyAPIClient":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator["AsyncComfyAPIClient"]:
+        """Counterpart of :meth:`AsyncServerPool.lease` for a single server."""
+        yield self
+
+    @contextmanager
+    def _track(self, operation: str) -> Iterator[None]:
+        """Record latency and failures of one request; connection failures mark the server down."""
+        started = time.monotonic()
+        try:
+            yield
+        except CONNECTION_ERRORS:
+            HTTP_SECONDS.observe(time.monotonic() - started, server=self.base_url, operation=operation)
+            HTTP_ERRORS.inc(server=self.base_url, operation=operation)
+            SERVER_UP.set(0, server=self.base_url)
+            raise
+        except (aiohttp.ClientError, ComfyAPIError):
+            HTTP_SECONDS.observe(time.monotonic() - started, server=self.base_url, operation=operation)
+            HTTP_ERRORS.inc(server=self.base_url, operation=operation)
+            raise
+        HTTP_SECONDS.observe(time.monotonic() - started, server=self.base_url, operation=operation)
+        SERVER_UP.set(1, server=self.base_url)
+
+    # ------------------------------------------------------------------- status
+    async def get_queue_depth(self, *, timeout: Optional[float] = None) -> int:
+        data = await self._get_json("/queue", "Queue status fetch failed", timeout=timeout)
+        return len(data.get("queue_running") or []) + len(data.get("queue_pending") or [])
+
+    async def get_system_stats(self, *, timeout: Optional[float] = None) -> Dict[str, Any]:
+        return await self._get_json("/system_stats", "System stats fetch failed", timeout=timeout)
+
+    async def _get_json(self, path: str, context: str, *, timeout: Optional[float] = None) -> Dict[str, Any]:
+        request_timeout = aiohttp.ClientTimeout(total=timeout or self.timeout)
+        with self._track(path.strip("/").split("/")[0]):
+            async with self.session.get(f"{self.base_url}{path}", timeout=request_timeout) as response:
+                await self._ensure_success(response, context)
+                return await response.json(content_type=None)
 
     # ------------------------------------------------------------------ uploads
-    def upload_file(self, path: Path, *, upload_type: Optional[str] = None) -> str:
+    async def upload_file(self, path: Path, *, upload_type: Optional[str] = None) -> str:
+        if not path.exists():
+            raise FileNotFoundError(f"Input asset not found: {path}")
+        cache = self.upload_cache
+        if cache is None:
+            name, _ = await self._send_file(path, upload_type)
+            return name
+
+        digest = await asyncio.to_thread(cache.digest, path)
+        # Identical content requested by concurrent cases is sent once.
+        task = self._pending_uploads.get(digest)
+        if task is None:
+            task = asyncio.ensure_future(self._upload_cached(cache, digest, path, upload_type))
+            self._pending_uploads[digest] = task
+            task.add_done_callback(lambda _: self._pending_uploads.pop(digest, None))
+        return await asyncio.shield(task)
+
+    async def _upload_cached(self, cache: UploadCache, digest: str, path: Path, upload_type: Optional[str]) -> str:
+        entry = cache.get(self.base_url, digest)
+        if entry is not None:
+            if not cache.needs_validation(entry):
+                LOG.debug("Reusing upload %s for %s", entry.name, path)
+                return entry.name
+            if await self.asset_exists(entry.name, subfolder=entry.subfolder):
+                cache.mark_validated(self.base_url, digest)
+                LOG.debug("Reusing upload %s for %s (revalidated)", entry.name, path)
+                return entry.name
+            LOG.info("Cached upload %s is gone from %s, uploading again", entry.name, self.base_url)
+            cache.invalidate(self.base_url, digest)
+        name, subfolder = await self._send_file(path, upload_type)
+        cache.put(self.base_url, digest, name, subfolder)
+        return name
+
+    async def asset_exists(self, name: str, *, subfolder: str = "", folder_type: str = "input") -> bool:
+        params = {"filename": name, "subfolder": subfolder, "type": folder_type}
+        async with self.session.head(
+            f"{self.base_url}/view", params=params, timeout=aiohttp.ClientTimeout(total=self.timeout)
+        ) as response:
+            if response.status == 404:
+                return False
+            await self._ensure_success(response, f"Checking {name} failed")
+            return True
+
+    async def _send_file(self, path: Path, upload_type: Optional[str]) -> Tuple[str, str]:
         upload_type = (upload_type or self._guess_upload_type(path)).strip("/")
         endpoint = f"{self.base_url}/upload/{upload_type}"
         LOG.debug("Uploading %s -> %s", path, endpoint)
 
-        if not path.exists():
-            raise FileNotFoundError(f"Input asset not found: {path}")
+        size = path.stat().st_size
+        with self._track("upload"), path.open("rb") as handle:
+            form = aiohttp.FormData()
+            form.add_field("image", handle, filename=path.name)
+            async with self.session.post(endpoint, data=form) as response:
+                await self._ensure_success(response, f"Upload failed for {path}")
+                payload = await response.json(content_type=None)
+        UPLOAD_BYTES.inc(size, server=self.base_url)
 
-        with path.open("rb") as handle:
-            response = self.session.post(endpoint, files={"image": handle})
-        self._ensure_success(response, f"Upload failed for {path}")
-
-        payload = response.json()
         uploaded_name = payload.get("name")
         if not uploaded_name:
             raise ComfyAPIError(f"Upload response missing name for {path}")
         LOG.debug("Uploaded %s as %s", path.name, uploaded_name)
-        return uploaded_name
+        return uploaded_name, payload.get("subfolder") or ""
 
     @staticmethod
     def _guess_upload_type(path: Path) -> str:
@@ -93,59 +594,117 @@ class ComfyAPIClient:
         return "image"
 
     # --------------------------------------------------------------- execution
-    def execute_prompt(self, prompt: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
-        prompt_id = self._queue_prompt(prompt)
-        self._wait_for_completion(prompt_id)
-        history = self._get_history(prompt_id)
+    async def execute_prompt(
+        self, prompt: Dict[str, Any], *, timings: Optional[RunTimings] = None
+    ) -> Tuple[str, Dict[str, Any]]:
+        """Queue ``prompt`` and wait for it; if cancelled, the prompt is withdrawn from the server.
+
+        ``timings`` receives the queue wait, execution and history fetch times
+        and the per-node execution times, also when the prompt fails.
+        """
+        # Connect before queueing so no event for the new prompt can be missed.
+        events = await self._event_stream()
+        submitted_at = time.monotonic()
+        queued = asyncio.ensure_future(self._queue_prompt(prompt))
+        try:
+            prompt_id = await asyncio.shield(queued)
+        except asyncio.CancelledError:
+            # The request may already have reached the server; take the prompt back once it has an id.
+            with suppress(Exception):
+                await self.cancel_prompt(await queued)
+            raise
+        try:
+            await self._wait_for_completion(prompt_id)
+        except asyncio.CancelledError:
+            PROMPTS.inc(server=self.base_url, status="cancelled")
+            await self.cancel_prompt(prompt_id)
+            raise
+        except Exception:
+            PROMPTS.inc(server=self.base_url, status="failed")
+            raise
+        finally:
+            timeline = events.take_timeline(prompt_id)
+            if timings is not None:
+                timings.record_prompt(submitted_at, time.monotonic(), timeline, prompt)
+        PROMPTS.inc(server=self.base_url, status="success")
+        fetch_started = time.monotonic()
+        history = await self._get_history(prompt_id)
+        if timings is not None:
+            timings.add("history_fetch", time.monotonic() - fetch_started)
         return prompt_id, history
 
-    def _queue_prompt(self, prompt: Dict[str, Any]) -> str:
+    async def cancel_prompt(self, prompt_id: str) -> None:
+        """Drop ``prompt_id`` from the server queue, interrupting it if it already runs.
+
+        Only this prompt is interrupted; a prompt someone else is running is left alone.
+        Failures are logged, since cancellation is best effort.
+        """
+        request_timeout = aiohttp.ClientTimeout(total=self.timeout)
+        try:
+            async with self.session.post(
+                f"{self.base_url}/queue", json={"delete": [prompt_id]}, timeout=request_timeout
+            ) as response:
+                await self._ensure_success(response, "Queue delete failed")
+            queue = await self._get_json("/queue", "Queue status fetch failed")
+            running = {item[1] for item in queue.get("queue_running") or [] if len(item) > 1}
+            if prompt_id in running:
+                async with self.session.post(
+                    f"{self.base_url}/interrupt", json={"prompt_id": prompt_id}, timeout=request_timeout
+                ) as response:
+                    await self._ensure_success(response, "Interrupt failed")
+                LOG.info("Interrupted running prompt %s on %s", prompt_id, self.base_url)
+            else:
+                LOG.info("Removed prompt %s from the %s queue", prompt_id, self.base_url)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ComfyAPIError) as exc:
+            LOG.warning("Could not cancel prompt %s on %s: %s", prompt_id, self.base_url, exc)
+
+    async def _queue_prompt(self, prompt: Dict[str, Any]) -> str:
         endpoint = f"{self.base_url}/prompt"
-        # print(prompt)
         payload = {"prompt": prompt, "client_id": self.client_id}
-        response = self.session.post(endpoint, json=payload, timeout=self.timeout)
-        self._ensure_success(response, "Queue prompt failed")
-        data = response.json()
+        with self._track("prompt"):
+            async with self.session.post(endpoint, json=payload, timeout=aiohttp.ClientTimeout(total=self.timeout)) as response:
+                await self._ensure_success(response, "Queue prompt failed")
+                data = await response.json(content_type=None)
         prompt_id = data.get("prompt_id")
         if not prompt_id:
             raise ComfyAPIError("Prompt response missing prompt_id")
         return prompt_id
 
-    def _wait_for_completion(self, prompt_id: str) -> None:
-        ws_url = self._build_ws_url()
-        LOG.debug("Opening websocket %s", ws_url)
-        ws = websocket.WebSocket()
-        ws.settimeout(self.timeout)
-        ws.connect(ws_url)
-        try:
-            while True:
-                try:
-                    raw_message = ws.recv()
-                except websocket.WebSocketTimeoutException as exc:
-                    raise ComfyAPIError(f"Timed out waiting for prompt {prompt_id}") from exc
-                if isinstance(raw_message, bytes):
-                    continue
-                message = json.loads(raw_message)
-                message_type = message.get("type")
-                data = message.get("data", {})
-                if message_type == "progress":
-                    node_label = data.get("node") or "pipeline"
-                    LOG.debug("Progress %s: %s/%s", node_label, data.get("value"), data.get("max"))
-                if message_type == "execution_error":
-                    raise ComfyAPIError(f"Execution error: {data}")
-                if message_type == "execution_interrupted":
-                    raise ComfyAPIError("Execution interrupted by server")
-                if message_type == "executing":
-                    if data.get("node") is None and data.get("prompt_id") == prompt_id:
-                        break
-        finally:
-            ws.close()
+    async def _wait_for_completion(self, prompt_id: str) -> None:
+        events = await self._event_stream()
+        await events.wait(prompt_id, events.register(prompt_id))
+
+    async def _event_stream(self) -> PromptEventStream:
+        async with self._events_lock:
+            if self._events is None:
+                events = PromptEventStream(
+                    self.session,
+                    self._build_ws_url(),
+                    timeout=self.timeout,
+                    on_reconnect=self._reconcile_prompts,
+                )
+                await events.start()
+                self._events = events
+            return self._events
+
+    async def _reconcile_prompts(self, prompt_ids: Sequence[str]) -> None:
+        """Resolve prompts whose completion events were lost while disconnected."""
+        events = self._events
+        if events is None:
+            return
+        for prompt_id in prompt_ids:
+            try:
+                entry = await self._get_history(prompt_id)
+            except ComfyAPIError:
+                continue
+            status_info = entry.get("status") or {}
+            if status_info.get("status_str") == "error":
+                events.resolve(prompt_id, ComfyAPIError(f"Execution error: {status_info}"))
+            else:
+                events.resolve(prompt_id)
 
-    def _get_history(self, prompt_id: str) -> Dict[str, Any]:
-        endpoint = f"{self.base_url}/history/{prompt_id}"
-        response = self.session.get(endpoint, timeout=self.timeout)
-        self._ensure_success(response, "History fetch failed")
-        wrapper = response.json()
+    async def _get_history(self, prompt_id: str) -> Dict[str, Any]:
+        wrapper = await self._get_json(f"/history/{prompt_id}", "History fetch failed")
         if prompt_id not in wrapper:
             raise ComfyAPIError(f"History for prompt {prompt_id} missing in response")
         return wrapper[prompt_id]
@@ -163,69 +722,303 @@ class ComfyAPIClient:
         return f"{scheme}{remainder}/ws?clientId={self.client_id}"
 
     # -------------------------------------------------------------- downloads
-    def collect_outputs(self, history: Mapping[str, Any]) -> List["OutputAsset"]:
-        outputs: List[OutputAsset] = []
-        node_outputs: Mapping[str, Any] = history.get("outputs", {})
-        for node_id, node_data in _iter_dict_items(node_outputs):
-            for bucket in ("images", "files", "gifs", "videos", "audio"):
-                items = node_data.get(bucket)
-                if not items:
-                    continue
-                for index, item in enumerate(items):
-                    data = self._download_item(item)
-                    outputs.append(
-                        OutputAsset(
-                            node_id=node_id,
-                            bucket=bucket,
-                            original_filename=os.path.basename(item.get("filename", f"{bucket}_{index}")),
-                            index=index,
-                            data=data,
-                        )
-                    )
-        return outputs
-
-    def _download_item(self, descriptor: Mapping[str, Any]) -> bytes:
+    async def collect_outputs(
+        self,
+        history: Mapping[str, Any],
+        output_folder: Path,
+        *,
+        compute_sha256: bool = False,
+        concurrency: int = DOWNLOAD_CONCURRENCY,
+        attempts: int = DOWNLOAD_ATTEMPTS,
+    ) -> List["OutputAsset"]:
+        """Stream every output listed in ``history`` into ``output_folder``.
+
+        Up to ``concurrency`` outputs download at once over the shared session;
+        the result keeps the order of ``list_outputs`` regardless.
+        """
+        limit = asyncio.Semaphore(max(1, concurrency))
+
+        async def _fetch(asset: OutputAsset) -> OutputAsset:
+            async with limit:
+                return await self._download_with_retry(asset, output_folder / asset.filename, compute_sha256, attempts)
+
+        tasks = [asyncio.ensure_future(_fetch(asset)) for asset in list_outputs(history)]
+        try:
+            return list(await asyncio.gather(*tasks))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    async def _download_with_retry(
+        self,
+        asset: "OutputAsset",
+        target_path: Path,
+        compute_sha256: bool,
+        attempts: int,
+    ) -> "OutputAsset":
+        attempt = 1
+        while True:
+            try:
+                return await self.download_output(asset, target_path, compute_sha256=compute_sha256)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ComfyHTTPError) as exc:
+                # A 4xx answer will not change on retry.
+                if attempt >= attempts or (isinstance(exc, ComfyHTTPError) and exc.status < 500):
+                    raise
+                delay = 0.5 * 2 ** (attempt - 1)
+                LOG.warning("Download of %s failed (%s), retrying in %.1fs", asset.filename, exc, delay)
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    async def download_output(
+        self,
+        asset: "OutputAsset",
+        target_path: Path,
+        *,
+        compute_sha256: bool = False,
+    ) -> "OutputAsset":
+        """Write one output to ``target_path`` chunk by chunk and return it with ``path`` set."""
         params = {
-            "filename": descriptor.get("filename"),
-            "subfolder": descriptor.get("subfolder", ""),
-            "type": descriptor.get("type", "output"),
+            "filename": asset.remote.get("filename"),
+            "subfolder": asset.remote.get("subfolder", ""),
+            "type": asset.remote.get("type", "output"),
         }
-        response = self.session.get(f"{self.base_url}/view", params=params, timeout=self.timeout)
-        self._ensure_success(response, f"Download failed for {params.get('filename')}")
-        return response.content
-
-    def _ensure_success(self, response: requests.Response, context: str) -> None:
-        try:
-            response.raise_for_status()
-        except requests.HTTPError as exc:
-            detail = self._extract_error_detail(response)
-            message = f"{context}: {exc}"
-            if detail:
-                message = f"{message} | details: {detail}"
-            raise ComfyAPIError(message) from exc
+        digest = hashlib.sha256() if compute_sha256 else None
+        size = 0
+        partial_path = target_path.with_name(f"{target_path.name}.part")
+        # Large videos may take longer than ``timeout`` overall; only a stalled read fails.
+        request_timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.timeout, sock_read=self.timeout)
+        with self._track("download"):
+            async with self.session.get(f"{self.base_url}/view", params=params, timeout=request_timeout) as response:
+                await self._ensure_success(response, f"Download failed for {params.get('filename')}")
+                try:
+                    with partial_path.open("wb") as handle:
+                        async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                            handle.write(chunk)
+                            size += len(chunk)
+                            if digest is not None:
+                                digest.update(chunk)
+                except BaseException:
+                    partial_path.unlink(missing_ok=True)
+                    raise
+        DOWNLOAD_BYTES.inc(size, server=self.base_url)
+        partial_path.replace(target_path)
+        return replace(asset, path=target_path, size=size, sha256=digest.hexdigest() if digest else None)
+
+    async def _ensure_success(self, response: aiohttp.ClientResponse, context: str) -> None:
+        if response.status < 400:
+            return
+        detail = await self._extract_error_detail(response)
+        message = f"{context}: {response.status} {response.reason} for url: {response.url}"
+        if detail:
+            message = f"{message} | details: {detail}"
+        raise ComfyHTTPError(message, response.status)
 
     @staticmethod
-    def _extract_error_detail(response: requests.Response) -> str:
+    async def _extract_error_detail(response: aiohttp.ClientResponse) -> str:
         content_type = (response.headers.get("content-type") or "").lower()
-        text = (response.text or "").strip()
+        text = (await response.text(errors="replace")).strip()
         if not text:
             return ""
         if "application/json" in content_type:
             try:
-                parsed = response.json()
-            except Exception:  # pylint: disable=broad-except
+                parsed = json.loads(text)
+            except ValueError:
                 return text[:500]
             return json.dumps(parsed, ensure_ascii=False, indent=2)[:1000]
         return text[:500]
 
 
+@dataclass
+class ServerState:
+    """Last known load of one backend in an :class:`AsyncServerPool`."""
+
+    client: AsyncComfyAPIClient
+    healthy: bool = True
+    queue_depth: int = 0
+    vram_free: Optional[int] = None
+    in_flight: int = 0
+    last_polled: float = 0.0
+    last_error: Optional[str] = None
+
+    @property
+    def url(self) -> str:
+        return self.client.base_url
+
+    @property
+    def load(self) -> int:
+        # Remote queue depth covers other users; in_flight covers our cases that
+        # are still uploading or were queued after the last poll.
+        return self.queue_depth + self.in_flight
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "queue_depth": self.queue_depth,
+            "in_flight": self.in_flight,
+            "vram_free": self.vram_free,
+            "last_error": self.last_error,
+        }
+
+
+class AsyncServerPool:
+    """Dispatches work across several ComfyUI servers by current load.
+
+    Each backend is polled through ``/queue`` and ``/system_stats`` at most
+    once per ``poll_interval``. :meth:`lease` hands out the healthy backend
+    with the lowest load (free VRAM breaks ties). A backend that fails a poll
+    or drops a connection is skipped until a later poll succeeds.
+    """
+
+    def __init__(
+        self,
+        server_urls: Sequence[str],
+        *,
+        timeout: float = 120.0,
+        poll_interval: float = 2.0,
+        probe_timeout: float = 5.0,
+        upload_cache: Optional[UploadCache] = None,
+    ):
+        urls = list(dict.fromkeys(url.rstrip("/") for url in server_urls if url and url.strip()))
+        if not urls:
+            raise ValueError("AsyncServerPool requires at least one server URL")
+        self.poll_interval = poll_interval
+        self.probe_timeout = probe_timeout
+        self.servers: List[ServerState] = [
+            ServerState(AsyncComfyAPIClient(url, timeout=timeout, upload_cache=upload_cache)) for url in urls
+        ]
+        self._refresh_lock = asyncio.Lock()
+        self._last_refresh = 0.0
+
+    @property
+    def clients(self) -> List[AsyncComfyAPIClient]:
+        return [state.client for state in self.servers]
+
+    async def close(self) -> None:
+        await asyncio.gather(*(state.client.close() for state in self.servers))
+
+    async def __aenter__(self) -> "AsyncServerPool":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    # --------------------------------------------------------------- polling
+    async def refresh(self, *, force: bool = False) -> None:
+        if not force and time.monotonic() - self._last_refresh < self.poll_interval:
+            return
+        # Until the first poll lands every backend looks healthy, so callers
+        # wait for it; afterwards a poll already in progress is not repeated.
+        if self._refresh_lock.locked() and self._last_refresh:
+            return
+        async with self._refresh_lock:
+            if not force and time.monotonic() - self._last_refresh < self.poll_interval:
+                return
+            await asyncio.gather(*(self._probe(state) for state in self.servers))
+            self._last_refresh = time.monotonic()
+
+    async def _probe(self, state: ServerState) -> None:
+        try:
+            depth = await state.client.get_queue_depth(timeout=self.probe_timeout)
+            stats = await state.client.get_system_stats(timeout=self.probe_timeout)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ComfyAPIError, ValueError) as exc:
+            if state.healthy:
+                LOG.warning("ComfyUI server %s unavailable: %s", state.url, exc or type(exc).__name__)
+            SERVER_UP.set(0, server=state.url)
+            state.healthy = False
+            state.last_error = str(exc) or type(exc).__name__
+            state.last_polled = time.monotonic()
+            return
+        devices = stats.get("devices") or []
+        vram_free = sum(int(device.get("vram_free") or 0) for device in devices) if devices else None
+        if not state.healthy:
+            LOG.info("ComfyUI server %s is back online", state.url)
+        state.healthy = True
+        state.queue_depth = depth
+        state.vram_free = vram_free
+        SERVER_QUEUE_DEPTH.set(depth, server=state.url)
+        if vram_free is not None:
+            SERVER_VRAM_FREE.set(vram_free, server=state.url)
+        state.last_error = None
+        state.last_polled = time.monotonic()
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [state.to_dict() for state in self.servers]
+
+    # -------------------------------------------------------------- dispatch
+    async def acquire(self) -> AsyncComfyAPIClient:
+        await self.refresh()
+        candidates = [state for state in self.servers if state.healthy]
+        if not candidates:
+            details = "; ".join(f"{state.url}: {state.last_error}" for state in self.servers)
+            raise ComfyAPIError(f"No healthy ComfyUI server available ({details})")
+        chosen = min(candidates, key=lambda state: (state.load, -(state.vram_free or 0)))
+        chosen.in_flight += 1
+        return chosen.client
+
+    def release(self, client: AsyncComfyAPIClient, *, failed: bool = False) -> None:
+        for state in self.servers:
+            if state.client is client:
+                state.in_flight = max(0, state.in_flight - 1)
+                if failed:
+                    state.healthy = False
+                    state.last_error = "connection lost"
+                return
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator[AsyncComfyAPIClient]:
+        client = await self.acquire()
+        failed = False
+        try:
+            yield client
+        except CONNECTION_ERRORS:
+            failed = True
+            raise
+        finally:
+            self.release(client, failed=failed)
+
+
+AsyncClientProvider = Union[AsyncComfyAPIClient, AsyncServerPool]
+
+
 @dataclass
 class OutputAsset:
     node_id: str
     bucket: str
     original_filename: str
     index: int
-    data: bytes
+    remote: Mapping[str, Any] = field(default_factory=dict, repr=False)
+    path: Optional[Path] = None
+    size: int = 0
+    sha256: Optional[str] = None
+
+    @property
+    def filename(self) -> str:
+        return f"{self.node_id}_{self.bucket}_{self.index}_{self.original_filename}"
+
+
+def list_outputs(history: Mapping[str, Any]) -> List[OutputAsset]:
+    """Describe the outputs in a prompt history entry without downloading them."""
+    outputs: List[OutputAsset] = []
+    node_outputs: Mapping[str, Any] = history.get("outputs", {})
+    for node_id, node_data in _iter_dict_items(node_outputs):
+        for bucket in OUTPUT_BUCKETS:
+            items = node_data.get(bucket)
+            if not items:
+                continue
+            for index, item in enumerate(items):
+                outputs.append(
+                    OutputAsset(
+                        node_id=node_id,
+                        bucket=bucket,
+                        original_filename=os.path.basename(item.get("filename", f"{bucket}_{index}")),
+                        index=index,
+                        remote=item,
+                    )
+                )
+    return outputs
 
 
 @dataclass
@@ -236,88 +1029,272 @@ class WorkflowTestCase:
     text_inputs: Mapping[str, Any] = field(default_factory=dict)
     overrides: Mapping[str, Any] = field(default_factory=dict)
     output_dir: Optional[Path] = None
-
-
-class BatchWorkflowTester:
-    """Coordinates reading configuration, running workflows, and persisting outputs."""
-
-    def __init__(self, client: ComfyAPIClient, *, output_root: Path):
+    # Precompiled workflow (e.g. from the web app's WorkflowStore); loaded from workflow_path otherwise.
+    template: Optional["WorkflowTemplate"] = field(default=None, repr=False, compare=False)
+
+
+CaseCallback = Callable[[int, WorkflowTestCase], None]
+ResultCallback = Callable[[int, WorkflowTestCase, Dict[str, Any]], None]
+
+
+class AsyncBatchWorkflowTester:
+    """Coordinates running workflows and persisting outputs on one event loop.
+
+    ``run_all`` keeps up to ``max_in_flight`` cases in progress at once: while
+    earlier prompts execute on the GPU, later cases are uploaded and queued,
+    and each result is downloaded as soon as its prompt completes. ``client``
+    may also be an :class:`AsyncServerPool`, in which case every case runs on
+    the least-loaded server at the time it starts.
+
+    With a ``result_cache``, a case whose patched prompt and input contents
+    match an earlier successful run reuses that run's saved artifacts instead
+    of being sent to ComfyUI. ``refresh_results`` skips the lookup but still
+    records the new run.
+    """
+
+    def __init__(
+        self,
+        client: AsyncClientProvider,
+        *,
+        output_root: Path,
+        max_in_flight: int = 1,
+        hash_outputs: bool = False,
+        result_cache: Optional[ResultCache] = None,
+        refresh_results: bool = False,
+    ):
         self.client = client
         self.output_root = output_root
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.hash_outputs = hash_outputs
+        self.result_cache = result_cache
+        self.refresh_results = refresh_results
         self.results: List[Dict[str, Any]] = []
+        # Remote names are per server, so uploads are remembered per (server, file).
+        # Cases that need a file already being uploaded await the same task.
+        self._uploaded: Dict[Tuple[str, Path], "asyncio.Task[str]"] = {}
+        # Workflow files parsed off the loop, by (mtime, size); cases sharing a file await one load.
+        self._templates: Dict[Path, Tuple[Tuple[int, int], "asyncio.Task[WorkflowTemplate]"]] = {}
 
     # ----------------------------------------------------------- public entry
-    def run_all(self, cases: Sequence[WorkflowTestCase]) -> None:
-        for case in cases:
-            self.run_case(case)
+    async def run_all(
+        self,
+        cases: Iterable[WorkflowTestCase],
+        *,
+        on_start: Optional[CaseCallback] = None,
+        on_result: Optional[ResultCallback] = None,
+    ) -> None:
+        """Run every case; callbacks receive the 1-based position of the case.
+
+        ``cases`` is consumed lazily: the next case is taken only once one of
+        the ``max_in_flight`` slots is free, so a generated sweep is never held
+        in memory as a whole.
+        """
+        window = asyncio.Semaphore(self.max_in_flight)
+        running: set["asyncio.Future[Dict[str, Any]]"] = set()
+        errors: List[BaseException] = []
+
+        async def _bounded(index: int, case: WorkflowTestCase) -> Dict[str, Any]:
+            try:
+                return await self._run_indexed(index, case, on_start, on_result)
+            finally:
+                window.release()
 
-    def run_case(self, case: WorkflowTestCase) -> Dict[str, Any]:
+        def _finished(task: "asyncio.Future[Dict[str, Any]]") -> None:
+            running.discard(task)
+            if not task.cancelled() and task.exception() is not None:
+                errors.append(task.exception())  # type: ignore[arg-type]
+
+        pending_cases = iter(cases)
+        try:
+            for index in itertools.count(1):
+                await window.acquire()
+                case = None if errors else next(pending_cases, None)
+                if case is None:
+                    window.release()
+                    break
+                task = asyncio.ensure_future(_bounded(index, case))
+                running.add(task)
+                task.add_done_callback(_finished)
+            if running:
+                await asyncio.wait(set(running))
+        except asyncio.CancelledError:
+            # Let every started case withdraw its prompt before the caller closes the client.
+            pending = set(running)
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.wait(pending)
+            raise
+        except Exception:
+            # A case that fails to generate stops the batch after the ones already started.
+            if running:
+                await asyncio.wait(set(running))
+            raise
+        if errors:
+            raise errors[0]
+
+    async def run_case(self, case: WorkflowTestCase) -> Dict[str, Any]:
         LOG.info("==== Running workflow: %s ====", case.name)
+        result_key = await self._result_key(case)
+        if result_key is not None and not self.refresh_results:
+            # get checks every saved file and put sizes the outputs: keep that disk I/O off the loop
+            cached = await asyncio.to_thread(self.result_cache.get, result_key)
+            if cached is not None:
+                LOG.info("Workflow %s matches an earlier run; reusing %s", case.name, cached.output_dir)
+                RUNS.inc(status="cached")
+                result = {"name": case.name, "status": "success", "cached": True, **cached.to_result()}
+                self.results.append(result)
+                return result
+        server: Optional[str] = None
+        timings = RunTimings()
         try:
-            run_info = self._run_case(case)
+            async with self.client.lease() as client:
+                server = client.base_url
+                run_info = await self._run_case(case, client, timings)
         except Exception as exc:  # pylint: disable=broad-except
             LOG.exception("Workflow %s failed: %s", case.name, exc)
-            result = {"name": case.name, "status": "failed", "error": str(exc)}
+            self._observe_run("failed", server, timings)
+            result = {"name": case.name, "status": "failed", "error": str(exc), "server": server}
+            if timings.stages:
+                result["timings"] = timings.to_dict()
             self.results.append(result)
             return result
-        LOG.info("Workflow %s finished successfully", case.name)
-        result = {"name": case.name, "status": "success", **run_info}
+        LOG.info("Workflow %s finished successfully on %s", case.name, server)
+        self._observe_run("success", server, timings)
+        result = {"name": case.name, "status": "success", "server": server, **run_info, "timings": timings.to_dict()}
+        if result_key is not None:
+            await asyncio.to_thread(self.result_cache.put, result_key, result)
         self.results.append(result)
         return result
 
+    @staticmethod
+    def _observe_run(status: str, server: Optional[str], timings: RunTimings) -> None:
+        RUNS.inc(status=status)
+        for stage, seconds in timings.stages.items():
+            RUN_STAGE_SECONDS.observe(seconds, server=server or "", stage=stage)
+
+    async def _result_key(self, case: WorkflowTestCase) -> Optional[str]:
+        """Key of the prompt this case would submit, with uploads replaced by content digests."""
+        cache = self.result_cache
+        if cache is None:
+            return None
+        try:
+            mapping: Dict[str, str] = {}
+            for placeholder, raw in case.inputs.items():
+                path, _, remote_name = self._parse_input(placeholder, raw)
+                if remote_name is None:
+                    remote_name = "sha256:" + await asyncio.to_thread(cache.digest, path)
+                for key in self._placeholder_aliases(placeholder):
+                    mapping[key] = remote_name
+            workflow = (await self._template_for(case)).render(mapping, text_inputs=case.text_inputs, overrides=case.overrides)
+        except Exception as exc:  # pylint: disable=broad-except
+            LOG.warning("Cannot compute result key for %s, running it normally: %s", case.name, exc)
+            return None
+        return prompt_key(workflow)
+
+    async def _run_indexed(
+        self,
+        index: int,
+        case: WorkflowTestCase,
+        on_start: Optional[CaseCallback],
+        on_result: Optional[ResultCallback],
+    ) -> Dict[str, Any]:
+        if on_start:
+            on_start(index, case)
+        result = await self.run_case(case)
+        if on_result:
+            on_result(index, case, result)
+        return result
+
     # ---------------------------------------------------------- case handling
-    def _run_case(self, case: WorkflowTestCase) -> Dict[str, Any]:
-        workflow = self._load_workflow(case.workflow_path)
-        upload_mappings = self._prepare_inputs(case.inputs)
-        _replace_placeholders(workflow, upload_mappings)
-        _apply_text_inputs(workflow, case.text_inputs)
-        _apply_overrides(workflow, case.overrides)
-
-        prompt_id, history = self.client.execute_prompt(workflow)
+    async def _run_case(self, case: WorkflowTestCase, client: AsyncComfyAPIClient, timings: RunTimings) -> Dict[str, Any]:
+        template = await self._template_for(case)
+        with timings.stage("upload"):
+            upload_mappings = await self._prepare_inputs(client, case.inputs)
+        workflow = template.render(upload_mappings, text_inputs=case.text_inputs, overrides=case.overrides)
+
+        prompt_id, history = await client.execute_prompt(workflow, timings=timings)
         status_info = history.get("status", {})
         if status_info.get("status") not in (None, "success"):
             raise ComfyAPIError(f"Workflow reported non-success status: {status_info}")
 
-        outputs = self.client.collect_outputs(history)
         output_folder = self._resolve_output_dir(case)
-        saved_paths = self._persist_outputs(outputs, output_folder)
-        metadata_path = self._write_metadata(output_folder, case, prompt_id, status_info, saved_paths)
+        with timings.stage("download"):
+            outputs = await client.collect_outputs(history, output_folder, compute_sha256=self.hash_outputs)
+        saved_paths = [str(asset.path) for asset in outputs]
+        # The file cannot contain the time it takes to write itself; ``persist`` is only in the result.
+        with timings.stage("persist"):
+            metadata_path = self._write_metadata(
+                output_folder, case, client.base_url, prompt_id, status_info, outputs, timings
+            )
 
         return {
             "prompt_id": prompt_id,
+            "workflow_hash": template.content_hash,
+            "uploads": {placeholder: upload_mappings[placeholder] for placeholder in case.inputs if placeholder in upload_mappings},
             "output_dir": str(output_folder),
             "saved_files": saved_paths,
             "metadata_file": str(metadata_path),
         }
 
-    @staticmethod
-    def _load_workflow(path: Path) -> Dict[str, Any]:
-        with path.open("r", encoding="utf-8") as handle:
-            return json.load(handle)
-
-    def _prepare_inputs(self, inputs: Mapping[str, Any]) -> Dict[str, str]:
+    async def _template_for(self, case: WorkflowTestCase) -> WorkflowTemplate:
+        if case.template is not None:
+            return case.template
+        # Many cases usually share one workflow file; parse it once while it is unchanged.
+        path = case.workflow_path.resolve()
+        stat = await asyncio.to_thread(path.stat)
+        version = (stat.st_mtime_ns, stat.st_size)
+        cached = self._templates.get(path)
+        if cached is None or cached[0] != version:
+            cached = (version, asyncio.ensure_future(asyncio.to_thread(_compile_template, path)))
+            self._templates[path] = cached
+        task = cached[1]
+        try:
+            # Shielded like uploads: a cancelled case must not abort a load other cases wait on.
+            return await asyncio.shield(task)
+        except Exception:
+            if self._templates.get(path, (None, None))[1] is task:
+                del self._templates[path]
+            raise
+
+    async def _prepare_inputs(self, client: AsyncComfyAPIClient, inputs: Mapping[str, Any]) -> Dict[str, str]:
         mapping: Dict[str, str] = {}
         for placeholder, raw in inputs.items():
-            if isinstance(raw, str):
-                path = Path(raw)
-                upload_type = None
-            elif isinstance(raw, Mapping):
-                path = Path(raw.get("path", ""))
-                upload_type = raw.get("upload_type")
-                if raw.get("upload", True) is False:
-                    # Use the provided name directly without uploading.
-                    remote_name = raw.get("name") or raw.get("path", "")
-                    for key in self._placeholder_aliases(placeholder):
-                        mapping[key] = remote_name
-                    LOG.debug("Using existing server asset %s -> %s", placeholder, remote_name)
-                    continue
+            path, upload_type, remote_name = self._parse_input(placeholder, raw)
+            if remote_name is not None:
+                LOG.debug("Using existing server asset %s -> %s", placeholder, remote_name)
             else:
-                raise ValueError(f"Unsupported input definition for {placeholder}: {raw}")
-            uploaded_name = self.client.upload_file(path, upload_type=upload_type)
+                remote_name = await self._upload(client, path, upload_type)
             for key in self._placeholder_aliases(placeholder):
-                mapping[key] = uploaded_name
+                mapping[key] = remote_name
         return mapping
 
+    @staticmethod
+    def _parse_input(placeholder: str, raw: Any) -> Tuple[Path, Optional[str], Optional[str]]:
+        """Return (local path, upload type, remote name); the name is set only for inputs not uploaded."""
+        if isinstance(raw, str):
+            return Path(raw), None, None
+        if isinstance(raw, Mapping):
+            if raw.get("upload", True) is False:
+                # Use the provided name directly without uploading.
+                return Path(raw.get("path", "")), None, raw.get("name") or raw.get("path", "")
+            return Path(raw.get("path", "")), raw.get("upload_type"), None
+        raise ValueError(f"Unsupported input definition for {placeholder}: {raw}")
+
+    async def _upload(self, client: AsyncComfyAPIClient, path: Path, upload_type: Optional[str]) -> str:
+        key = (client.base_url, path.resolve())
+        task = self._uploaded.get(key)
+        if task is None:
+            task = asyncio.ensure_future(client.upload_file(path, upload_type=upload_type))
+            self._uploaded[key] = task
+        try:
+            # Shielded so one cancelled case does not abort an upload others wait on.
+            return await asyncio.shield(task)
+        except Exception:
+            if self._uploaded.get(key) is task:
+                del self._uploaded[key]
+            raise
+
     @staticmethod
     def _placeholder_aliases(placeholder: str) -> List[str]:
         normalized = placeholder.strip("{}")
@@ -331,53 +1308,253 @@ class BatchWorkflowTester:
         target = case.output_dir or self.output_root / _sanitize_for_fs(case.name)
         timestamp = time.strftime("%Y%m%d-%H%M%S")
         final_dir = Path(target) / timestamp
-        final_dir.mkdir(parents=True, exist_ok=True)
-        return final_dir
-
-    @staticmethod
-    def _persist_outputs(outputs: Sequence[OutputAsset], output_folder: Path) -> List[str]:
-        saved: List[str] = []
-        for asset in outputs:
-            filename = f"{asset.node_id}_{asset.bucket}_{asset.index}_{asset.original_filename}"
-            target_path = output_folder / filename
-            target_path.write_bytes(asset.data)
-            saved.append(str(target_path))
-        return saved
+        suffix = 1
+        # Cases running side by side may share a name and a timestamp.
+        while True:
+            try:
+                final_dir.mkdir(parents=True, exist_ok=False)
+                return final_dir
+            except FileExistsError:
+                final_dir = Path(target) / f"{timestamp}_{suffix}"
+                suffix += 1
 
     @staticmethod
     def _write_metadata(
         output_folder: Path,
         case: WorkflowTestCase,
+        server: str,
         prompt_id: str,
         status_info: Mapping[str, Any],
-        saved_paths: Sequence[str],
+        outputs: Sequence[OutputAsset],
+        timings: Optional[RunTimings] = None,
     ) -> Path:
-        metadata = {
+        metadata: Dict[str, Any] = {
             "case_name": case.name,
             "workflow_path": str(case.workflow_path),
+            "server": server,
             "prompt_id": prompt_id,
             "status": status_info,
-            "saved_files": list(saved_paths),
+            "saved_files": [str(asset.path) for asset in outputs],
         }
+        if timings is not None:
+            metadata["timings"] = timings.to_dict()
+        checksums = {asset.filename: asset.sha256 for asset in outputs if asset.sha256}
+        if checksums:
+            metadata["sha256"] = checksums
         metadata_path = output_folder / "run_metadata.json"
         with metadata_path.open("w", encoding="utf-8") as handle:
             json.dump(metadata, handle, ensure_ascii=False, indent=2)
         return metadata_path
 
 
-def _replace_placeholders(workflow: MutableMapping[str, Any], mapping: Mapping[str, str]) -> None:
-    def _replace(value: Any) -> Any:
-        if isinstance(value, str) and value in mapping:
-            return mapping[value]
-        if isinstance(value, list):
-            return [_replace(item) for item in value]
-        if isinstance(value, dict):
-            return {key: _replace(val) for key, val in value.items()}
-        return value
+# ------------------------------------------------------------- blocking API
+_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_LOOP_LOCK = threading.Lock()
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """Event loop on a daemon thread that serves every blocking wrapper."""
+    global _LOOP  # pylint: disable=global-statement
+    with _LOOP_LOCK:
+        if _LOOP is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="comfy-loop", daemon=True).start()
+            _LOOP = loop
+        return _LOOP
+
+
+def _run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    loop = _background_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coro.close()
+        raise RuntimeError("Blocking ComfyUI API called from its own event loop; await the async API instead")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+
+class ComfyAPIClient:
+    """Blocking wrapper around :class:`AsyncComfyAPIClient` for scripts and the CLI.
+
+    Calls run on a shared background event loop, so any number of threads may
+    use one client concurrently.
+    """
+
+    def __init__(self, base_url: str, *, timeout: float = 120.0, upload_cache: Optional[UploadCache] = None):
+        self.async_client = AsyncComfyAPIClient(base_url, timeout=timeout, upload_cache=upload_cache)
+
+    @classmethod
+    def wrap(cls, async_client: AsyncComfyAPIClient) -> "ComfyAPIClient":
+        client = cls.__new__(cls)
+        client.async_client = async_client
+        return client
+
+    @property
+    def base_url(self) -> str:
+        return self.async_client.base_url
+
+    @property
+    def client_id(self) -> str:
+        return self.async_client.client_id
+
+    @property
+    def timeout(self) -> float:
+        return self.async_client.timeout
+
+    def close(self) -> None:
+        _run_sync(self.async_client.close())
+
+    def __enter__(self) -> "ComfyAPIClient":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    @contextmanager
+    def lease(self) -> Iterator["ComfyAPIClient"]:
+        """Counterpart of :meth:`ComfyServerPool.lease` for a single server."""
+        yield self
+
+    def get_queue_depth(self, *, timeout: Optional[float] = None) -> int:
+        return _run_sync(self.async_client.get_queue_depth(timeout=timeout))
+
+    def get_system_stats(self, *, timeout: Optional[float] = None) -> Dict[str, Any]:
+        return _run_sync(self.async_client.get_system_stats(timeout=timeout))
+
+    def upload_file(self, path: Path, *, upload_type: Optional[str] = None) -> str:
+        return _run_sync(self.async_client.upload_file(path, upload_type=upload_type))
+
+    def execute_prompt(self, prompt: Dict[str, Any], *, timings: Optional[RunTimings] = None) -> Tuple[str, Dict[str, Any]]:
+        return _run_sync(self.async_client.execute_prompt(prompt, timings=timings))
+
+    def cancel_prompt(self, prompt_id: str) -> None:
+        _run_sync(self.async_client.cancel_prompt(prompt_id))
+
+    def collect_outputs(
+        self,
+        history: Mapping[str, Any],
+        output_folder: Path,
+        *,
+        compute_sha256: bool = False,
+    ) -> List[OutputAsset]:
+        return _run_sync(self.async_client.collect_outputs(history, output_folder, compute_sha256=compute_sha256))
+
+    def download_output(self, asset: OutputAsset, target_path: Path, *, compute_sha256: bool = False) -> OutputAsset:
+        return _run_sync(self.async_client.download_output(asset, target_path, compute_sha256=compute_sha256))
+
+
+class ComfyServerPool:
+    """Blocking wrapper around :class:`AsyncServerPool`."""
+
+    def __init__(
+        self,
+        server_urls: Sequence[str],
+        *,
+        timeout: float = 120.0,
+        poll_interval: float = 2.0,
+        probe_timeout: float = 5.0,
+        upload_cache: Optional[UploadCache] = None,
+    ):
+        self.async_pool = AsyncServerPool(
+            server_urls,
+            timeout=timeout,
+            poll_interval=poll_interval,
+            probe_timeout=probe_timeout,
+            upload_cache=upload_cache,
+        )
+        self._clients = {client.base_url: ComfyAPIClient.wrap(client) for client in self.async_pool.clients}
+
+    @property
+    def clients(self) -> List[ComfyAPIClient]:
+        return list(self._clients.values())
+
+    def close(self) -> None:
+        _run_sync(self.async_pool.close())
+
+    def __enter__(self) -> "ComfyServerPool":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def refresh(self, *, force: bool = False) -> None:
+        _run_sync(self.async_pool.refresh(force=force))
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return self.async_pool.snapshot()
+
+    @contextmanager
+    def lease(self) -> Iterator[ComfyAPIClient]:
+        client = _run_sync(self.async_pool.acquire())
+        failed = False
+        try:
+            yield self._clients[client.base_url]
+        except CONNECTION_ERRORS:
+            failed = True
+            raise
+        finally:
+            # Pool state belongs to the loop thread.
+            _background_loop().call_soon_threadsafe(partial(self.async_pool.release, client, failed=failed))
+
+
+ClientProvider = Union[ComfyAPIClient, ComfyServerPool]
+
+
+class BatchWorkflowTester:
+    """Blocking wrapper around :class:`AsyncBatchWorkflowTester`.
+
+    ``on_start``/``on_result`` callbacks are invoked on the background event
+    loop thread and should return quickly.
+    """
+
+    def __init__(
+        self,
+        client: ClientProvider,
+        *,
+        output_root: Path,
+        max_in_flight: int = 1,
+        hash_outputs: bool = False,
+        result_cache: Optional[ResultCache] = None,
+        refresh_results: bool = False,
+    ):
+        self.client = client
+        provider: AsyncClientProvider = (
+            client.async_client if isinstance(client, ComfyAPIClient) else client.async_pool
+        )
+        self.engine = AsyncBatchWorkflowTester(
+            provider,
+            output_root=output_root,
+            max_in_flight=max_in_flight,
+            hash_outputs=hash_outputs,
+            result_cache=result_cache,
+            refresh_results=refresh_results,
+        )
 
-    for node_id, node in list(workflow.items()):
-        if isinstance(node, MutableMapping):
-            workflow[node_id] = _replace(node)  # type: ignore[assignment]
+    @property
+    def output_root(self) -> Path:
+        return self.engine.output_root
+
+    @property
+    def max_in_flight(self) -> int:
+        return self.engine.max_in_flight
+
+    @property
+    def results(self) -> List[Dict[str, Any]]:
+        return self.engine.results
+
+    def run_all(
+        self,
+        cases: Iterable[WorkflowTestCase],
+        *,
+        on_start: Optional[CaseCallback] = None,
+        on_result: Optional[ResultCallback] = None,
+    ) -> None:
+        _run_sync(self.engine.run_all(cases, on_start=on_start, on_result=on_result))
+
+    def run_case(self, case: WorkflowTestCase) -> Dict[str, Any]:
+        return _run_sync(self.engine.run_case(case))
 
 
 def _apply_text_inputs(workflow: MutableMapping[str, Any], text_inputs: Mapping[str, Any]) -> None:
@@ -447,13 +1624,387 @@ def _apply_overrides(workflow: MutableMapping[str, Any], overrides: Mapping[str,
                     LOG.warning("Override for %s should be a mapping", key)
 
 
-def load_config(path: Path, *, overrides: Optional[argparse.Namespace] = None) -> Tuple[str, Path, List[WorkflowTestCase]]:
+# Path of a value inside one node: dict keys and list indices.
+SlotPath = Tuple[Union[str, int], ...]
+
+
+class WorkflowTemplate:
+    """A workflow parsed once, with the location of every string it contains.
+
+    :meth:`render` copies only the nodes a run actually changes and patches
+    the recorded slots directly, instead of re-reading the JSON and rebuilding
+    the whole graph for every case. Nodes that are not patched are shared
+    with the template, so rendered workflows must be treated as read-only
+    beyond what :meth:`render` itself changes.
+    """
+
+    def __init__(
+        self,
+        graph: Mapping[str, Any],
+        *,
+        slots: Optional[Dict[str, List[Tuple[str, SlotPath]]]] = None,
+        titles: Optional[Dict[str, List[str]]] = None,
+        content_hash: Optional[str] = None,
+    ):
+        """``slots``, ``titles`` and ``content_hash`` may be passed in when the caller already
+        walked the graph (e.g. the web app's workflow analyzer); they must describe ``graph``."""
+        self.graph: Dict[str, Any] = dict(graph)
+        self._content_hash = content_hash
+        self.slots: Dict[str, List[Tuple[str, SlotPath]]] = {}
+        self.titles: Dict[str, List[str]] = {}
+        if slots is not None and titles is not None:
+            self.slots, self.titles = slots, titles
+            return
+        for node_id, node in self.graph.items():
+            if not isinstance(node, Mapping):
+                continue
+            meta = node.get("_meta")
+            title = meta.get("title") if isinstance(meta, Mapping) else None
+            if title:
+                self.titles.setdefault(title, []).append(node_id)
+            for slot_path, value in _iter_slots(node):
+                if isinstance(value, str):
+                    self.slots.setdefault(value, []).append((node_id, slot_path))
+
+    @classmethod
+    def load(cls, path: Path) -> "WorkflowTemplate":
+        with path.open("r", encoding="utf-8") as handle:
+            return cls(json.load(handle))
+
+    @property
+    def content_hash(self) -> str:
+        """Short canonical hash of the graph; identifies a version of the workflow."""
+        if self._content_hash is None:
+            self._content_hash = prompt_key(self.graph)[:16]
+        return self._content_hash
+
+    def render(
+        self,
+        replacements: Mapping[str, str],
+        *,
+        text_inputs: Optional[Mapping[str, Any]] = None,
+        overrides: Optional[Mapping[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """A fresh copy of the graph with placeholders, text inputs and overrides applied.
+
+        Every string value equal to a ``replacements`` key becomes its value;
+        only the nodes that change are copied, the rest are shared with the template.
+        """
+        targets = [(node_id, slot_path, value) for key, value in replacements.items() for node_id, slot_path in self.slots.get(key, ())]
+        touched = {node_id for node_id, _, _ in targets}
+        touched.update(self._nodes_for(text_inputs))
+        touched.update(self._nodes_for(overrides))
+
+        workflow = dict(self.graph)
+        for node_id in touched:
+            workflow[node_id] = _copy_tree(self.graph[node_id])
+        for node_id, slot_path, value in targets:
+            container = workflow[node_id]
+            for part in slot_path[:-1]:
+                container = container[part]
+            container[slot_path[-1]] = value
+        if text_inputs:
+            _apply_text_inputs(workflow, text_inputs)
+        if overrides:
+            _apply_overrides(workflow, overrides)
+        return workflow
+
+    def _nodes_for(self, patches: Optional[Mapping[str, Any]]) -> List[str]:
+        nodes: List[str] = []
+        for key in patches or {}:
+            if key.startswith("id:"):
+                nodes.append(key[3:])
+            elif "." in key:
+                nodes.append(key.split(".", 1)[0])
+            nodes.extend(self.titles.get(key, ()))
+        return [node_id for node_id in nodes if isinstance(self.graph.get(node_id), Mapping)]
+
+
+def _compile_template(path: Path) -> WorkflowTemplate:
+    """Load a workflow file and hash it up front; meant to run in a worker thread."""
+    with path.open("r", encoding="utf-8") as handle:
+        graph = json.load(handle)
+    return WorkflowTemplate(graph, content_hash=prompt_key(graph)[:16])
+
+
+def _iter_slots(value: Any, prefix: SlotPath = ()) -> Iterator[Tuple[SlotPath, Any]]:
+    if isinstance(value, Mapping):
+        for key, item in value.items():
+            yield from _iter_slots(item, prefix + (key,))
+    elif isinstance(value, list):
+        for index, item in enumerate(value):
+            yield from _iter_slots(item, prefix + (index,))
+    elif prefix:
+        yield prefix, value
+
+
+def _copy_tree(value: Any) -> Any:
+    # JSON graphs only hold dicts, lists and immutable scalars.
+    if isinstance(value, dict):
+        return {key: _copy_tree(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy_tree(item) for item in value]
+    return value
+
+
+# ------------------------------------------------------------ case sources
+CASE_SETTING_SECTIONS = ("inputs", "text_inputs", "overrides")
+
+
+def _check_case_setting(path: str, what: str) -> None:
+    """Validate a setting path: ``inputs.<placeholder>``, ``text_inputs.<node>.<field>`` or ``overrides.<key>``."""
+    section, _, key = path.partition(".")
+    if section not in CASE_SETTING_SECTIONS or not key:
+        raise ValueError(f"{what} '{path}' must start with one of {', '.join(s + '.' for s in CASE_SETTING_SECTIONS)}")
+    if section == "text_inputs" and "." not in key:
+        raise ValueError(f"{what} '{path}' must name a node and a field: text_inputs.<node>.<field>")
+
+
+def _set_case_setting(
+    path: str, value: Any, inputs: Dict[str, Any], text_inputs: Dict[str, Any], overrides: Dict[str, Any]
+) -> None:
+    section, key = path.split(".", 1)
+    if section == "inputs":
+        inputs[key] = value
+    elif section == "text_inputs":
+        identifier, name = key.rsplit(".", 1)
+        text_inputs[identifier] = {**text_inputs.get(identifier, {}), name: value}
+    else:
+        overrides[key] = value
+
+
+@dataclass
+class SweepAxis:
+    """One swept setting of a config entry and the values it takes, in order.
+
+    ``path`` is ``inputs.<placeholder>``, ``text_inputs.<node>.<field>`` or
+    ``overrides.<override key>`` (e.g. ``overrides.3.inputs.cfg``); ``label``
+    names the current value in the case name template.
+    """
+
+    path: str
+    values: List[Any]
+    label: str
+
+    @property
+    def section(self) -> str:
+        return self.path.split(".", 1)[0]
+
+    @classmethod
+    def parse(cls, path: str, spec: Any) -> "SweepAxis":
+        _check_case_setting(path, "Sweep axis")
+        label = path.rsplit(".", 1)[-1]
+        if isinstance(spec, Mapping) and "label" in spec:
+            label = str(spec["label"])
+        values = _sweep_values(path, spec)
+        if not values:
+            raise ValueError(f"Sweep axis '{path}' has no values")
+        return cls(path=path, values=values, label=label)
+
+    def describe(self, value: Any) -> Any:
+        """Value as shown in case names: input files by their stem."""
+        if self.section == "inputs":
+            raw = value.get("path") if isinstance(value, Mapping) else value
+            if isinstance(raw, str):
+                return Path(raw).stem
+        return value
+
+
+def _sweep_values(path: str, spec: Any) -> List[Any]:
+    if isinstance(spec, list):
+        return list(spec)
+    if not isinstance(spec, Mapping):
+        raise ValueError(f"Sweep axis '{path}' must be a list or an object with values, range, glob or lines")
+    if "values" in spec:
+        return list(spec["values"])
+    if "range" in spec:
+        start, stop, *rest = spec["range"]
+        step = rest[0] if rest else 1
+        if not step:
+            raise ValueError(f"Sweep axis '{path}' has a zero range step")
+        if all(isinstance(bound, int) for bound in (start, stop, step)):
+            return list(range(start, stop, step))
+        count = max(0, math.ceil((stop - start) / step - 1e-9))
+        # Rounded so 0.1 steps give 0.3 rather than 0.30000000000000004 in prompts and names.
+        return [round(start + position * step, 10) for position in range(count)]
+    if "glob" in spec:
+        return sorted(glob.glob(str(spec["glob"]), recursive=True))
+    if "lines" in spec:
+        with Path(spec["lines"]).open("r", encoding="utf-8") as handle:
+            return [line.strip() for line in handle if line.strip()]
+    raise ValueError(f"Sweep axis '{path}' must define values, range, glob or lines")
+
+
+class CaseSweep:
+    """Cases generated from a config entry with a ``sweep`` section.
+
+    Axes under ``product`` are combined as a cartesian product. Each group
+    under ``zip`` advances its axes together (they must have the same length)
+    and counts as one more dimension of the product. Cases are built one at a
+    time while iterating, so a sweep only keeps its axis values in memory,
+    however many cases it produces.
+    """
+
+    def __init__(self, base: WorkflowTestCase, spec: Mapping[str, Any]):
+        if not isinstance(spec, Mapping):
+            raise ValueError(f"Sweep of {base.name} must be an object")
+        self.base = base
+        self.dimensions: List[List[SweepAxis]] = [
+            [SweepAxis.parse(path, values)] for path, values in (spec.get("product") or {}).items()
+        ]
+        groups = spec.get("zip") or []
+        for group in [groups] if isinstance(groups, Mapping) else groups:
+            axes = [SweepAxis.parse(path, values) for path, values in group.items()]
+            if len({len(axis.values) for axis in axes}) > 1:
+                lengths = ", ".join(f"{axis.path}={len(axis.values)}" for axis in axes)
+                raise ValueError(f"Zipped sweep axes of {base.name} must have the same length: {lengths}")
+            if axes:
+                self.dimensions.append(axes)
+        if not self.dimensions:
+            raise ValueError(f"Sweep of {base.name} must define 'product' or 'zip' axes")
+        self.name_template: Optional[str] = spec.get("name")
+        self._width = len(str(len(self)))
+        try:
+            self._case(1, (0,) * len(self.dimensions))
+        except (KeyError, IndexError, ValueError) as exc:
+            raise ValueError(f"Invalid sweep name template for {base.name}: {exc}") from exc
+
+    def __len__(self) -> int:
+        return math.prod(len(axes[0].values) for axes in self.dimensions)
+
+    def __iter__(self) -> Iterator[WorkflowTestCase]:
+        positions = itertools.product(*(range(len(axes[0].values)) for axes in self.dimensions))
+        for index, choice in enumerate(positions, start=1):
+            yield self._case(index, choice)
+
+    def _case(self, index: int, choice: Sequence[int]) -> WorkflowTestCase:
+        inputs = dict(self.base.inputs)
+        text_inputs = dict(self.base.text_inputs)
+        overrides = dict(self.base.overrides)
+        labels: Dict[str, Any] = {"name": self.base.name, "index": index}
+        for axes, position in zip(self.dimensions, choice):
+            for axis in axes:
+                value = axis.values[position]
+                _set_case_setting(axis.path, value, inputs, text_inputs, overrides)
+                labels[axis.label] = axis.describe(value)
+        if self.name_template:
+            name = self.name_template.format_map(labels)
+        else:
+            name = f"{self.base.name}_{index:0{self._width}d}"
+        return replace(self.base, name=name, inputs=inputs, text_inputs=text_inputs, overrides=overrides)
+
+
+_DEFAULT_COLUMN_TYPES = {"inputs": "str", "text_inputs": "raw", "overrides": "auto"}
+
+
+class CaseTable:
+    """Cases read from a CSV/TSV or XLSX file, one per data row, while iterating.
+
+    ``columns`` maps a column header to a setting path as used by sweep axes,
+    or to ``{"to": path, "type": kind}`` with a kind from
+    :data:`case_table.COLUMN_TYPES`. By default input columns are read as
+    ``str``, text input columns ``raw`` (so a numeric prompt stays text) and
+    override columns ``auto``. Empty cells keep the entry's own value. Only the
+    header is read up front; ``len()`` streams through the file to count rows.
+    """
+
+    def __init__(self, base: WorkflowTestCase, spec: Mapping[str, Any]):
+        if not isinstance(spec, Mapping) or not spec.get("path"):
+            raise ValueError(f"Table of {base.name} must be an object with a 'path'")
+        self.base = base
+        self.path = Path(spec["path"])
+        self.sheet: Optional[str] = spec.get("sheet")
+        self.columns: List[Tuple[str, str, str]] = []
+        for header, target in (spec.get("columns") or {}).items():
+            setting, kind = (target.get("to"), target.get("type")) if isinstance(target, Mapping) else (target, None)
+            if not isinstance(setting, str):
+                raise ValueError(f"Column '{header}' of {base.name} must map to a setting path")
+            _check_case_setting(setting, f"Column '{header}' target")
+            kind = kind or _DEFAULT_COLUMN_TYPES[setting.split(".", 1)[0]]
+            if kind not in case_table.COLUMN_TYPES:
+                raise ValueError(f"Column '{header}' has unknown type '{kind}' (expected {', '.join(case_table.COLUMN_TYPES)})")
+            self.columns.append((header, setting, kind))
+        if not self.columns:
+            raise ValueError(f"Table of {base.name} must map at least one column")
+        available = set(case_table.read_header(self.path, sheet=self.sheet))
+        missing = [header for header, _, _ in self.columns if header not in available]
+        if missing:
+            raise ValueError(f"Columns not found in {self.path}: {', '.join(missing)}")
+        self.name_template: Optional[str] = spec.get("name")
+
+    def __len__(self) -> int:
+        return case_table.count_rows(self.path, sheet=self.sheet)
+
+    def __iter__(self) -> Iterator[WorkflowTestCase]:
+        for number, row in case_table.iter_rows(self.path, sheet=self.sheet):
+            yield self._case(number, row)
+
+    def _case(self, number: int, row: Mapping[str, Any]) -> WorkflowTestCase:
+        inputs = dict(self.base.inputs)
+        text_inputs = dict(self.base.text_inputs)
+        overrides = dict(self.base.overrides)
+        for header, setting, kind in self.columns:
+            value = row.get(header)
+            if value is None:
+                continue
+            try:
+                value = case_table.convert(value, kind)
+            except ValueError as exc:
+                raise ValueError(f"{self.path} row {number}, column '{header}': {exc}") from exc
+            _set_case_setting(setting, value, inputs, text_inputs, overrides)
+        if self.name_template:
+            labels = {key: "" if value is None else value for key, value in row.items()}
+            try:
+                name = self.name_template.format_map({**labels, "name": self.base.name, "row": number})
+            except (KeyError, IndexError, ValueError) as exc:
+                raise ValueError(f"Invalid table name template for {self.base.name}: {exc}") from exc
+        else:
+            name = f"{self.base.name}_{number:04d}"
+        return replace(self.base, name=name, inputs=inputs, text_inputs=text_inputs, overrides=overrides)
+
+
+CaseSource = Union[WorkflowTestCase, CaseSweep, CaseTable]
+
+
+class CaseStream:
+    """Cases of a configuration, produced on demand.
+
+    ``len()`` counts them without building any, but has to read every table
+    file to do so; :meth:`count_known` counts only what is free to count.
+    """
+
+    def __init__(self, sources: Sequence[CaseSource]):
+        self.sources = list(sources)
+
+    def __len__(self) -> int:
+        return sum(1 if isinstance(source, WorkflowTestCase) else len(source) for source in self.sources)
+
+    def count_known(self) -> Tuple[int, int]:
+        """Cases of plain entries and sweeps, and the number of table sources left uncounted."""
+        tables = sum(1 for source in self.sources if isinstance(source, CaseTable))
+        counted = sum(
+            1 if isinstance(source, WorkflowTestCase) else len(source) for source in self.sources if not isinstance(source, CaseTable)
+        )
+        return counted, tables
+
+    def __iter__(self) -> Iterator[WorkflowTestCase]:
+        for source in self.sources:
+            if isinstance(source, WorkflowTestCase):
+                yield source
+            else:
+                yield from source
+
+
+def load_config(path: Path, *, overrides: Optional[argparse.Namespace] = None) -> Tuple[List[str], Path, CaseStream]:
+    """Read a batch configuration; ``sweep`` and ``table`` entries expand lazily while the stream is iterated."""
     with path.open("r", encoding="utf-8") as handle:
         config = json.load(handle)
 
-    server = config.get("server") or "http://127.0.0.1:8189"
-    if overrides and overrides.server:
-        server = overrides.server
+    servers: List[str] = list(config.get("servers") or [])
+    if not servers:
+        servers = [config.get("server") or "http://127.0.0.1:8189"]
+    if overrides and overrides.servers:
+        servers = list(overrides.servers)
 
     output_root = Path(overrides.output_dir if overrides and overrides.output_dir else config.get("output_dir", DEFAULT_OUTPUT_ROOT))
 
@@ -465,7 +2016,7 @@ def load_config(path: Path, *, overrides: Optional[argparse.Namespace] = None) -
     if overrides and overrides.workflows:
         allowed_names = {name for name in overrides.workflows}
 
-    cases: List[WorkflowTestCase] = []
+    cases: List[CaseSource] = []
     for raw in raw_cases:
         name = raw.get("name")
         if not name:
@@ -481,20 +2032,70 @@ def load_config(path: Path, *, overrides: Optional[argparse.Namespace] = None) -
             overrides=raw.get("overrides", {}),
             output_dir=Path(raw["output_dir"]) if raw.get("output_dir") else None,
         )
-        cases.append(case)
+        if raw.get("sweep") and raw.get("table"):
+            raise ValueError(f"Workflow entry {name} cannot define both 'sweep' and 'table'")
+        if raw.get("sweep"):
+            cases.append(CaseSweep(case, raw["sweep"]))
+        elif raw.get("table"):
+            cases.append(CaseTable(case, raw["table"]))
+        else:
+            cases.append(case)
 
     if allowed_names and not cases:
         raise ValueError("No workflows matched the provided filters")
 
-    return server, output_root, cases
+    return servers, output_root, CaseStream(cases)
 
 
 def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Batch tester for ComfyUI workflows")
     parser.add_argument("--config", default=DEFAULT_CONFIG_PATH, help="Path to the workflow batch configuration JSON file")
-    parser.add_argument("--server", help="Override the ComfyUI server base URL (e.g. http://127.0.0.1:8189)")
+    parser.add_argument(
+        "--server",
+        action="append",
+        dest="servers",
+        help="Override the ComfyUI server base URL (e.g. http://127.0.0.1:8189); repeat to spread cases across servers",
+    )
     parser.add_argument("--workflow", "-w", action="append", dest="workflows", help="Only run workflows matching this name (repeatable)")
     parser.add_argument("--output-dir", help="Override the directory used for saving outputs")
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=DEFAULT_MAX_IN_FLIGHT,
+        help="Number of workflows kept queued per server at once (1 runs them strictly in sequence)",
+    )
+    parser.add_argument(
+        "--upload-cache",
+        default=DEFAULT_UPLOAD_CACHE,
+        help="File remembering which inputs each server already has, so they are not uploaded again",
+    )
+    parser.add_argument("--no-upload-cache", action="store_true", help="Upload every input even if the server already has it")
+    parser.add_argument(
+        "--sha256",
+        action="store_true",
+        help="Hash every output while it downloads and record the digests in run_metadata.json",
+    )
+    parser.add_argument(
+        "--result-cache",
+        metavar="PATH",
+        help="Remember finished runs in PATH and reuse their outputs when the same workflow and inputs run again",
+    )
+    parser.add_argument(
+        "--rerun",
+        action="store_true",
+        help="With --result-cache, run every workflow anyway and record the fresh results",
+    )
+    parser.add_argument(
+        "--latency-history",
+        default=DEFAULT_LATENCY_HISTORY,
+        help="File collecting per-workflow run latencies; a regression report is printed after the run",
+    )
+    parser.add_argument("--no-latency-history", action="store_true", help="Do not record or report run latencies")
+    parser.add_argument(
+        "--fail-on-regression",
+        action="store_true",
+        help="Exit with status 3 when a workflow that ran is significantly slower than its baseline",
+    )
     parser.add_argument("--log-level", default="INFO", help="Logging verbosity (DEBUG, INFO, WARNING, ...)")
     return parser.parse_args(argv)
 
@@ -513,22 +2114,69 @@ def main(argv: Optional[Sequence[str]] = None) -> int:
         return 2
 
     try:
-        server, output_root, cases = load_config(config_path, overrides=args)
+        servers, output_root, cases = load_config(config_path, overrides=args)
     except Exception as exc:  # pylint: disable=broad-except
         LOG.error("Failed to load configuration: %s", exc)
         return 2
-
-    client = ComfyAPIClient(server)
-    tester = BatchWorkflowTester(client, output_root=output_root)
-    tester.run_all(cases)
+    counted, tables = cases.count_known()
+    if tables:
+        # Counting table rows would read every table once more before the run reads it again.
+        LOG.info("Loaded %s cases and %s table(s) from %s; table rows are read as they run", counted, tables, config_path)
+    else:
+        LOG.info("Loaded %s cases from %s", counted, config_path)
+
+    upload_cache = None if args.no_upload_cache else UploadCache(Path(args.upload_cache))
+    result_cache = ResultCache(Path(args.result_cache)) if args.result_cache else None
+    provider: ClientProvider = (
+        ComfyServerPool(servers, upload_cache=upload_cache)
+        if len(servers) > 1
+        else ComfyAPIClient(servers[0], upload_cache=upload_cache)
+    )
+    with provider:
+        tester = BatchWorkflowTester(
+            provider,
+            output_root=output_root,
+            max_in_flight=args.max_in_flight * len(servers),
+            hash_outputs=args.sha256,
+            result_cache=result_cache,
+            refresh_results=args.rerun,
+        )
+        tester.run_all(cases)
+    if result_cache is not None:
+        result_cache.flush()
 
     succeeded = [result for result in tester.results if result.get("status") == "success"]
     failed = [result for result in tester.results if result.get("status") == "failed"]
+    reused = [result for result in succeeded if result.get("cached")]
+
+    LOG.info("Run complete: %s succeeded (%s reused), %s failed", len(succeeded), len(reused), len(failed))
+
+    regressions = []
+    if not args.no_latency_history:
+        history = LatencyHistory(Path(args.latency_history))
+        history.record_results(tester.results)
+        history.flush()
+        # The case stream is not iterated again: a sweep would rebuild every case.
+        reports = history.report(workflows=sorted({result["name"] for result in tester.results}))
+        LOG.info("Latency report:\n%s", format_report(reports))
+        regressions = [report for report in reports if report.regression]
+        for report in regressions:
+            LOG.warning(
+                "Workflow %s on %s is slower than its %s: p50 %.2fs vs %.2fs (%+.0f%%, p=%.3f)",
+                report.workflow,
+                report.server,
+                "previous version" if report.baseline == "previous_version" else "earlier runs",
+                report.p50,
+                report.baseline_p50,
+                (report.change or 0) * 100,
+                report.p_value,
+            )
 
-    LOG.info("Run complete: %s succeeded, %s failed", len(succeeded), len(failed))
     if failed:
         LOG.info("Failed workflows: %s", ", ".join(item["name"] for item in failed))
         return 1
+    if regressions and args.fail_on_regression:
+        return 3
     return 0
 
 
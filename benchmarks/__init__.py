@@ -0,0 +1 @@
+"""Throughput benchmarks that run the platform against local fake ComfyUI servers."""
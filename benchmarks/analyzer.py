@@ -0,0 +1,215 @@
+"""Microbenchmark for the workflow analyzer used by the web app's workflow index.
+
+Compares :func:`webapp.workflow_store.analyze_workflow`, which walks each node
+once, with a copy of the previous multi-pass analysis (placeholders, prompt
+fields and output types collected separately, then a second walk inside
+:class:`batch_workflow_tester.WorkflowTemplate`). Both run on synthetic
+ComfyUI-style graphs of the requested sizes; the results are checked to be
+identical before anything is timed.
+
+The template's content hash is one canonical serialization of the whole graph
+in either version, so it is left out of both timings and reported on its own
+(``hash ms``); indexing a workflow costs the analysis plus the hash.
+
+Example::
+
+    python -m benchmarks.analyzer --nodes 100 600 2000 --repeat 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import statistics
+import time
+from typing import Any, Callable, Dict, Iterable, List, Mapping, MutableMapping, Optional, Sequence, Tuple
+
+from batch_workflow_tester import WorkflowTemplate
+from webapp.workflow_store import PromptFieldInfo, _normalize_placeholder, analyze_workflow
+
+
+CLASS_TYPES = (
+    "KSampler",
+    "CLIPTextEncode",
+    "VAEDecode",
+    "LoadImage",
+    "LoraLoader",
+    "ControlNetApplyAdvanced",
+    "ImageScale",
+    "SaveImage",
+    "VHS_VideoCombine",
+    "LoadAudio",
+)
+
+# (placeholders, prompt fields, output types, template slots, template titles)
+Analysis = Tuple[Any, ...]
+
+
+def make_graph(nodes: int, seed: int = 0) -> Dict[str, Any]:
+    """A graph shaped like exported ComfyUI API workflows: links, scalars, prompts and placeholders."""
+    rng = random.Random(seed)
+    graph: Dict[str, Any] = {}
+    for index in range(1, nodes + 1):
+        class_type = rng.choice(CLASS_TYPES)
+        inputs: Dict[str, Any] = {
+            "seed": rng.randrange(2**32),
+            "steps": rng.randint(10, 40),
+            "cfg": round(rng.uniform(1, 12), 2),
+            "sampler_name": rng.choice(("euler", "dpmpp_2m", "uni_pc")),
+            "model": [str(rng.randint(1, max(1, index - 1))), 0],
+            "positive": [str(rng.randint(1, max(1, index - 1))), 1],
+            "options": {"tile": {"size": [512, 512], "overlap": 64}, "mode": "auto"},
+        }
+        if class_type == "CLIPTextEncode":
+            inputs["text"] = f"a photo of subject {index}, highly detailed"
+        if class_type == "LoadImage":
+            inputs["image"] = rng.choice(("{input_image_l}", "{input_image_r}", "input_mask", "example.png"))
+        if class_type == "LoadAudio":
+            inputs["audio"] = "{input_audio_a}"
+        if class_type in ("SaveImage", "VHS_VideoCombine"):
+            inputs["filename_prefix"] = f"out/{index}"
+        graph[str(index)] = {"inputs": inputs, "class_type": class_type, "_meta": {"title": f"{class_type} #{index}"}}
+    return graph
+
+
+def multi_pass(workflow: MutableMapping[str, Any]) -> Analysis:
+    """The analysis as it was done before the single-pass analyzer, kept here as the baseline."""
+    template = WorkflowTemplate(workflow)
+    return (
+        _collect_placeholders(workflow),
+        _collect_prompt_fields(workflow),
+        _infer_output_types(workflow),
+        template.slots,
+        template.titles,
+    )
+
+
+def single_pass(workflow: MutableMapping[str, Any]) -> Analysis:
+    analysis = analyze_workflow(workflow)
+    template = WorkflowTemplate(workflow, slots=analysis.slots, titles=analysis.titles)
+    return (
+        analysis.placeholders,
+        analysis.prompt_fields,
+        analysis.output_types,
+        template.slots,
+        template.titles,
+    )
+
+
+def content_hash(workflow: MutableMapping[str, Any]) -> str:
+    return WorkflowTemplate(workflow, slots={}, titles={}).content_hash
+
+
+def measure(func: Callable[[MutableMapping[str, Any]], Any], graph: MutableMapping[str, Any], repeat: int) -> List[float]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(graph)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, nargs="+", default=[100, 600, 2000], help="graph sizes to measure")
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per graph and implementation")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    print(f"{'nodes':>7} {'multi-pass ms':>14} {'single-pass ms':>15} {'speedup':>8} {'hash ms':>8}")
+    for nodes in args.nodes:
+        # Round-trip through JSON so the graph has exactly the types json.load produces.
+        graph = json.loads(json.dumps(make_graph(nodes, args.seed)))
+        if multi_pass(graph) != single_pass(graph):
+            raise SystemExit(f"single-pass analysis differs from the baseline on a {nodes}-node graph")
+        before = statistics.median(measure(multi_pass, graph, args.repeat))
+        after = statistics.median(measure(single_pass, graph, args.repeat))
+        hashing = statistics.median(measure(content_hash, graph, args.repeat))
+        print(f"{nodes:>7} {before * 1000:>14.2f} {after * 1000:>15.2f} {before / after:>7.2f}x {hashing * 1000:>8.2f}")
+    return 0
+
+
+# ------------------------------------------------------------- baseline copy
+def _collect_placeholders(workflow: MutableMapping[str, Any]) -> Dict[str, List[Tuple[str, Tuple[str, ...]]]]:
+    collected: Dict[str, List[Tuple[str, Tuple[str, ...]]]] = {}
+    placeholder_pattern = re.compile(r"^\{?(input_[^{}]+)\}?$")
+    for raw_node in workflow.values():
+        if not isinstance(raw_node, MutableMapping):
+            continue
+        class_type = str(raw_node.get("class_type", ""))
+        for path_keys, value in _iter_paths(raw_node):
+            if isinstance(value, str):
+                match = placeholder_pattern.match(value)
+                if match:
+                    collected.setdefault(_normalize_placeholder(match.group(1)), []).append((class_type, path_keys))
+    return collected
+
+
+def _collect_prompt_fields(workflow: MutableMapping[str, Any]) -> List[PromptFieldInfo]:
+    fields: List[PromptFieldInfo] = []
+    for node_id, node in workflow.items():
+        if not isinstance(node, MutableMapping):
+            continue
+        inputs = node.get("inputs")
+        if not isinstance(inputs, Mapping):
+            continue
+        for key, value in inputs.items():
+            if key.lower() in {"prompt", "text"} and isinstance(value, str):
+                fields.append(
+                    PromptFieldInfo(node_id=str(node_id), field=str(key), label=_compose_prompt_label(node, key), default_value=value)
+                )
+    return fields
+
+
+def _compose_prompt_label(node: Mapping[str, Any], field: str) -> str:
+    meta = node.get("_meta") if isinstance(node.get("_meta"), Mapping) else {}
+    title = meta.get("title") if isinstance(meta, Mapping) else None
+    class_type = node.get("class_type", "")
+    if title:
+        return f"{title} · {field}"
+    if class_type:
+        return f"{class_type} · {field}"
+    return field
+
+
+def _iter_paths(obj: Any, prefix: Tuple[str, ...] = ()) -> Iterable[Tuple[Tuple[str, ...], Any]]:
+    if isinstance(obj, MutableMapping):
+        for key, value in obj.items():
+            yield from _iter_paths(value, prefix + (str(key),))
+    elif isinstance(obj, list):
+        for index, value in enumerate(obj):
+            yield from _iter_paths(value, prefix + (str(index),))
+    else:
+        yield prefix, obj
+
+
+def _infer_output_types(workflow: MutableMapping[str, Any]) -> List[str]:
+    detected: set[str] = set()
+    for raw_node in workflow.values():
+        if not isinstance(raw_node, MutableMapping):
+            continue
+        inputs = raw_node.get("inputs")
+        if not isinstance(inputs, Mapping):
+            continue
+        if "filename_prefix" not in inputs and not inputs.get("save_output"):
+            continue
+        media_type = _output_type_from_class(str(raw_node.get("class_type", "")), inputs)
+        if media_type:
+            detected.add(media_type)
+    return sorted(detected)
+
+
+def _output_type_from_class(class_type: str, inputs: Mapping[str, Any]) -> Optional[str]:
+    lowered = class_type.lower()
+    if "video" in lowered or "video" in json.dumps(inputs, ensure_ascii=False).lower():
+        return "video"
+    for media_type in ("image", "audio", "gif", "text"):
+        if media_type in lowered:
+            return media_type
+    return None
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,349 @@
+"""Stand-in ComfyUI server for measuring the platform's own overhead.
+
+Implements the parts of the ComfyUI API the engine talks to (``/upload/image``,
+``/prompt``, ``/ws``, ``/history``, ``/view``, ``/queue``, ``/system_stats``
+and ``/interrupt``). Prompts "execute" by sleeping for a configurable latency on
+a fixed number of workers and then report outputs of a configurable size, so
+everything left in a benchmark's wall time is spent in our own code.
+
+The server timestamps every stage of every prompt; ``GET /bench/stats``
+returns those records and ``POST /bench/reset`` clears them. Run it with
+``python -m benchmarks.fake_comfy --port 8199``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import json
+import logging
+import math
+import os
+import random
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+from aiohttp import web
+from PIL import Image
+
+
+LOG = logging.getLogger("fake_comfy")
+
+STREAM_CHUNK_SIZE = 256 * 1024
+# Progress messages sent by the last node of every prompt.
+SAMPLER_STEPS = 4
+
+
+def noise_png(size: int) -> bytes:
+    """A valid PNG of random pixels, roughly ``size`` bytes (noise does not compress)."""
+    side = max(8, int(math.sqrt(max(size, 1) / 3)))
+    image = Image.frombytes("RGB", (side, side), os.urandom(side * side * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", compress_level=1)
+    return buffer.getvalue()
+
+
+@dataclass
+class FakeSettings:
+    latency: float = 0.5
+    jitter: float = 0.0
+    workers: int = 1
+    outputs: int = 1
+    output_size: int = 256 * 1024
+    output_kind: str = "image"
+    fail_rate: float = 0.0
+
+
+@dataclass
+class PromptRecord:
+    prompt_id: str
+    client_id: Optional[str]
+    nodes: List[str]
+    submitted: float
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    collected: Optional[float] = None
+    status: str = "pending"
+    filenames: List[str] = field(default_factory=list)
+
+
+class FakeComfyServer:
+    """aiohttp application that imitates one ComfyUI instance."""
+
+    def __init__(self, settings: FakeSettings):
+        self.settings = settings
+        self.sockets: Dict[str, web.WebSocketResponse] = {}
+        self.prompts: Dict[str, PromptRecord] = {}
+        self.inputs: Dict[str, int] = {}
+        self.uploads: List[Dict[str, float]] = []
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue()
+        self.pending: List[str] = []
+        self.running: List[str] = []
+        self.interrupted: Set[str] = set()
+        # Every output serves the same bytes. Images are real PNGs so dataset runs can convert them;
+        # videos repeat one random chunk up to the requested size.
+        if settings.output_kind == "image":
+            self.payload = noise_png(settings.output_size)
+            self.output_size = len(self.payload)
+        else:
+            self.payload = os.urandom(min(settings.output_size, STREAM_CHUNK_SIZE)) or b"\0"
+            self.output_size = settings.output_size
+        self._workers: List["asyncio.Task[None]"] = []
+
+    def build_app(self) -> web.Application:
+        app = web.Application(client_max_size=1024 ** 3)
+        app.add_routes(
+            [
+                web.get("/", self.system_stats),
+                web.get("/ws", self.websocket),
+                web.post("/prompt", self.submit_prompt),
+                web.post("/upload/{kind}", self.upload),
+                web.get("/history/{prompt_id}", self.history),
+                web.get("/view", self.view),
+                web.get("/queue", self.get_queue),
+                web.post("/queue", self.edit_queue),
+                web.post("/interrupt", self.interrupt),
+                web.get("/system_stats", self.system_stats),
+                web.get("/bench/stats", self.bench_stats),
+                web.post("/bench/reset", self.bench_reset),
+            ]
+        )
+        app.on_startup.append(self._start_workers)
+        app.on_cleanup.append(self._stop_workers)
+        return app
+
+    # ------------------------------------------------------------- execution
+    async def _start_workers(self, _app: web.Application) -> None:
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(max(1, self.settings.workers))]
+
+    async def _stop_workers(self, _app: web.Application) -> None:
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+
+    async def _worker(self) -> None:
+        while True:
+            prompt_id = await self.queue.get()
+            record = self.prompts.get(prompt_id)
+            if record is None or prompt_id not in self.pending:
+                continue
+            self.pending.remove(prompt_id)
+            self.running.append(prompt_id)
+            record.started = time.time()
+            record.status = "running"
+            await self._send(record.client_id, "execution_start", {"prompt_id": prompt_id})
+            delay = max(0.0, self.settings.latency + random.uniform(-self.settings.jitter, self.settings.jitter))
+            steps = record.nodes[:3] or ["1"]
+            for node_id in steps:
+                if prompt_id in self.interrupted:
+                    break
+                await self._send(record.client_id, "executing", {"node": node_id, "prompt_id": prompt_id})
+                if node_id != steps[-1]:
+                    await asyncio.sleep(delay / len(steps))
+                    continue
+                # The last node behaves like a sampler and reports its steps.
+                for step in range(1, SAMPLER_STEPS + 1):
+                    await asyncio.sleep(delay / len(steps) / SAMPLER_STEPS)
+                    await self._send(
+                        record.client_id,
+                        "progress",
+                        {"value": step, "max": SAMPLER_STEPS, "node": node_id, "prompt_id": prompt_id},
+                    )
+            self.running.remove(prompt_id)
+            record.finished = time.time()
+            if prompt_id in self.interrupted:
+                self.interrupted.discard(prompt_id)
+                record.status = "interrupted"
+                await self._send(record.client_id, "execution_interrupted", {"prompt_id": prompt_id, "node_id": node_id})
+                continue
+            if random.random() < self.settings.fail_rate:
+                record.status = "error"
+                await self._send(
+                    record.client_id,
+                    "execution_error",
+                    {"prompt_id": prompt_id, "node_id": steps[-1], "exception_message": "simulated failure"},
+                )
+                continue
+            extension = "mp4" if self.settings.output_kind == "video" else "png"
+            record.filenames = [f"{prompt_id}_{index:02d}.{extension}" for index in range(self.settings.outputs)]
+            record.status = "success"
+            if not record.filenames:
+                record.collected = record.finished
+            await self._send(record.client_id, "executing", {"node": None, "prompt_id": prompt_id})
+
+    async def _send(self, client_id: Optional[str], message_type: str, data: Dict[str, Any]) -> None:
+        socket = self.sockets.get(client_id or "")
+        if socket is None or socket.closed:
+            return
+        try:
+            await socket.send_str(json.dumps({"type": message_type, "data": data}))
+        except ConnectionError:
+            pass
+
+    # ---------------------------------------------------------------- routes
+    async def websocket(self, request: web.Request) -> web.WebSocketResponse:
+        socket = web.WebSocketResponse(heartbeat=30.0)
+        await socket.prepare(request)
+        client_id = request.query.get("clientId") or uuid.uuid4().hex
+        self.sockets[client_id] = socket
+        await socket.send_str(json.dumps({"type": "status", "data": {"sid": client_id}}))
+        async for _ in socket:
+            pass
+        if self.sockets.get(client_id) is socket:
+            del self.sockets[client_id]
+        return socket
+
+    async def submit_prompt(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        prompt = body.get("prompt")
+        if not isinstance(prompt, dict) or not prompt:
+            return web.json_response({"error": "invalid prompt", "node_errors": {}}, status=400)
+        prompt_id = str(uuid.uuid4())
+        self.prompts[prompt_id] = PromptRecord(
+            prompt_id=prompt_id, client_id=body.get("client_id"), nodes=list(prompt), submitted=time.time()
+        )
+        self.pending.append(prompt_id)
+        self.queue.put_nowait(prompt_id)
+        return web.json_response({"prompt_id": prompt_id, "number": len(self.prompts), "node_errors": {}})
+
+    async def upload(self, request: web.Request) -> web.Response:
+        started = time.time()
+        size = 0
+        name = f"upload_{uuid.uuid4().hex}"
+        reader = await request.multipart()
+        async for part in reader:
+            if part.name != "image":
+                await part.release()
+                continue
+            name = part.filename or name
+            while chunk := await part.read_chunk(STREAM_CHUNK_SIZE):
+                size += len(chunk)
+        self.inputs[name] = size
+        self.uploads.append({"started": started, "finished": time.time(), "size": size})
+        return web.json_response({"name": name, "subfolder": "", "type": "input"})
+
+    async def history(self, request: web.Request) -> web.Response:
+        record = self.prompts.get(request.match_info["prompt_id"])
+        if record is None or record.status in ("pending", "running"):
+            return web.json_response({})
+        bucket = "videos" if self.settings.output_kind == "video" else "images"
+        outputs = {}
+        if record.filenames:
+            outputs["9"] = {bucket: [{"filename": name, "subfolder": "", "type": "output"} for name in record.filenames]}
+        completed = record.status == "success"
+        return web.json_response(
+            {
+                record.prompt_id: {
+                    "prompt": [],
+                    "outputs": outputs,
+                    "status": {"status_str": "success" if completed else "error", "completed": completed, "messages": []},
+                }
+            }
+        )
+
+    async def view(self, request: web.Request) -> web.StreamResponse:
+        name = request.query.get("filename", "")
+        if request.query.get("type") == "input":
+            if name not in self.inputs:
+                raise web.HTTPNotFound()
+            size = self.inputs[name]
+        else:
+            record = self.prompts.get(name.split("_", 1)[0])
+            if record is None or name not in record.filenames:
+                raise web.HTTPNotFound()
+            size = self.output_size
+        response = web.StreamResponse(headers={"Content-Type": "application/octet-stream"})
+        response.content_length = size
+        await response.prepare(request)
+        if request.method != "HEAD":
+            payload = memoryview(self.payload)
+            remaining = size
+            while remaining > 0:
+                offset = (size - remaining) % len(payload)
+                chunk = payload[offset : offset + min(remaining, STREAM_CHUNK_SIZE)]
+                await response.write(chunk)
+                remaining -= len(chunk)
+            if request.query.get("type") != "input":
+                # Clients may fetch only some outputs (dataset runs take the first one).
+                record.collected = time.time()
+        await response.write_eof()
+        return response
+
+    async def get_queue(self, _request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "queue_running": [[index, prompt_id] for index, prompt_id in enumerate(self.running)],
+                "queue_pending": [[index, prompt_id] for index, prompt_id in enumerate(self.pending)],
+            }
+        )
+
+    async def edit_queue(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        for prompt_id in body.get("delete") or []:
+            if prompt_id in self.pending:
+                self.pending.remove(prompt_id)
+                self.prompts[prompt_id].status = "cancelled"
+        return web.json_response({})
+
+    async def interrupt(self, request: web.Request) -> web.Response:
+        # Like ComfyUI, a prompt_id limits the interrupt to that prompt; without one every running prompt stops.
+        body = await request.json() if request.can_read_body else {}
+        target = body.get("prompt_id")
+        self.interrupted.update(prompt_id for prompt_id in self.running if target in (None, prompt_id))
+        return web.json_response({})
+
+    async def system_stats(self, _request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "system": {"os": "fake", "comfyui_version": "fake"},
+                "devices": [{"name": "fake", "type": "cuda", "vram_total": 24 * 1024 ** 3, "vram_free": 20 * 1024 ** 3}],
+            }
+        )
+
+    async def bench_stats(self, _request: web.Request) -> web.Response:
+        prompts = [asdict(record) for record in self.prompts.values()]
+        return web.json_response(
+            {"settings": asdict(self.settings), "output_size": self.output_size, "prompts": prompts, "uploads": self.uploads}
+        )
+
+    async def bench_reset(self, _request: web.Request) -> web.Response:
+        self.prompts = {prompt_id: record for prompt_id, record in self.prompts.items() if record.status in ("pending", "running")}
+        self.uploads = []
+        self.inputs = {}
+        return web.json_response({})
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Fake ComfyUI server for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8199)
+    parser.add_argument("--latency", type=float, default=FakeSettings.latency, help="Seconds each prompt executes")
+    parser.add_argument("--jitter", type=float, default=FakeSettings.jitter, help="Uniform +/- seconds added to the latency")
+    parser.add_argument("--workers", type=int, default=FakeSettings.workers, help="Prompts executed at the same time (GPUs)")
+    parser.add_argument("--outputs", type=int, default=FakeSettings.outputs, help="Output files per prompt")
+    parser.add_argument("--output-size", type=int, default=FakeSettings.output_size, help="Bytes per output file")
+    parser.add_argument("--output-kind", choices=("image", "video"), default=FakeSettings.output_kind)
+    parser.add_argument("--fail-rate", type=float, default=FakeSettings.fail_rate, help="Share of prompts that report an error")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    settings = FakeSettings(
+        latency=args.latency,
+        jitter=args.jitter,
+        workers=args.workers,
+        outputs=args.outputs,
+        output_size=args.output_size,
+        output_kind=args.output_kind,
+        fail_rate=args.fail_rate,
+    )
+    web.run_app(FakeComfyServer(settings).build_app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,496 @@
+"""End-to-end throughput benchmarks against local fake ComfyUI servers.
+
+Every scenario runs the real system under test in its own process against
+one or more :mod:`benchmarks.fake_comfy` servers:
+
+``tester``
+    ``batch_workflow_tester.py`` CLI with a generated config of ``--cases``
+    workflows.
+``web-batch``
+    the FastAPI app under uvicorn; ``POST /api/run-batch`` over a group of
+    ``--cases`` workflows, polled through ``/api/jobs/{id}``.
+``web-dataset``
+    the same app; ``POST /api/datasets/run`` with ``--cases`` input images,
+    polled through ``/api/dataset-jobs/{id}``.
+
+Per-stage latencies come from the timestamps the fake servers record
+(upload, queue wait, execute, collect = completion until the last requested
+output byte was served). Throughput is measured over the span from the first
+request a server saw to the last output served, so interpreter start-up and
+job polling do not count. Peak RSS is the maximum resident set size of the
+process under test, as reported by the kernel when it exits.
+
+Example::
+
+    python -m benchmarks.run --cases 200 --latency 0.05 --max-in-flight 4 --json before.json
+    python -m benchmarks.run --cases 200 --latency 0.05 --max-in-flight 4 --compare before.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from benchmarks.fake_comfy import FakeSettings, noise_png
+
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SCENARIOS = ("tester", "web-batch", "web-dataset")
+STAGES = ("upload", "queue_wait", "execute", "collect", "prompt_total")
+POLL_INTERVAL = 0.05
+STARTUP_TIMEOUT = 30.0
+
+
+@dataclass
+class BenchConfig:
+    cases: int = 50
+    servers: int = 1
+    max_in_flight: int = 2
+    inputs: int = 4
+    input_size: int = 256 * 1024
+    convert_jpg: bool = False
+    timeout: float = 600.0
+    fake: FakeSettings = field(default_factory=FakeSettings)
+
+
+@dataclass
+class ScenarioResult:
+    scenario: str
+    cases: int
+    succeeded: int
+    wall_time: float
+    span: float
+    throughput: float
+    peak_rss_mb: Optional[float]
+    idle_rss_mb: Optional[float]
+    stages: Dict[str, Dict[str, float]]
+
+
+# ----------------------------------------------------------------- statistics
+def summarize(values: Sequence[float]) -> Dict[str, float]:
+    """Count, mean and p50/p90/p99/max of ``values`` in milliseconds."""
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def _pick(fraction: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+    return {
+        "count": len(ordered),
+        "mean": round(statistics.fmean(ordered) * 1000, 2),
+        "p50": round(_pick(0.50) * 1000, 2),
+        "p90": round(_pick(0.90) * 1000, 2),
+        "p99": round(_pick(0.99) * 1000, 2),
+        "max": round(ordered[-1] * 1000, 2),
+    }
+
+
+def stage_samples(stats: Sequence[Mapping[str, Any]]) -> Tuple[Dict[str, List[float]], float, int]:
+    """Per-stage durations, the active span and the number of collected prompts."""
+    samples: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+    starts: List[float] = []
+    ends: List[float] = []
+    collected = 0
+    for server in stats:
+        for upload in server.get("uploads") or []:
+            samples["upload"].append(upload["finished"] - upload["started"])
+            starts.append(upload["started"])
+        for prompt in server.get("prompts") or []:
+            starts.append(prompt["submitted"])
+            if prompt.get("started") is not None:
+                samples["queue_wait"].append(prompt["started"] - prompt["submitted"])
+            if prompt.get("finished") is not None and prompt.get("started") is not None:
+                samples["execute"].append(prompt["finished"] - prompt["started"])
+            if prompt.get("collected") is not None and prompt.get("finished") is not None:
+                samples["collect"].append(prompt["collected"] - prompt["finished"])
+                samples["prompt_total"].append(prompt["collected"] - prompt["submitted"])
+                ends.append(prompt["collected"])
+                collected += 1
+    span = (max(ends) - min(starts)) if starts and ends else 0.0
+    return samples, span, collected
+
+
+# -------------------------------------------------------------- processes
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _http_json(url: str, payload: Optional[Mapping[str, Any]] = None, *, timeout: float = 30.0) -> Any:
+    data = None
+    headers = {}
+    if payload is not None:
+        data = json.dumps(payload).encode("utf-8")
+        headers["Content-Type"] = "application/json"
+    request = urllib.request.Request(url, data=data, headers=headers, method="POST" if data is not None else "GET")
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read() or b"null")
+    except urllib.error.HTTPError as exc:
+        raise RuntimeError(f"{url} -> HTTP {exc.code}: {exc.read().decode('utf-8', 'replace')}") from exc
+
+
+def _wait_until_up(url: str, process: subprocess.Popen) -> None:
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{' '.join(process.args)} exited with {process.returncode}")
+        try:
+            _http_json(url, timeout=1.0)
+            return
+        except (OSError, RuntimeError):
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up within {STARTUP_TIMEOUT}s")
+
+
+def _reap(process: subprocess.Popen) -> Optional[float]:
+    """Wait for ``process`` and return its peak RSS in MiB (Linux/macOS only)."""
+    if not hasattr(os, "wait4"):
+        process.wait()
+        return None
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is KiB on Linux and bytes on macOS.
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(usage.ru_maxrss / divisor, 1)
+
+
+def _current_rss_mb(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/status", "r", encoding="ascii") as handle:
+            for line in handle:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        return None
+    return None
+
+
+@contextmanager
+def fake_servers(config: BenchConfig) -> Iterator[List[str]]:
+    settings = config.fake
+    processes: List[subprocess.Popen] = []
+    urls: List[str] = []
+    try:
+        for _ in range(max(1, config.servers)):
+            port = _free_port()
+            command = [
+                sys.executable, "-m", "benchmarks.fake_comfy",
+                "--port", str(port),
+                "--latency", str(settings.latency),
+                "--jitter", str(settings.jitter),
+                "--workers", str(settings.workers),
+                "--outputs", str(settings.outputs),
+                "--output-size", str(settings.output_size),
+                "--output-kind", settings.output_kind,
+                "--fail-rate", str(settings.fail_rate),
+            ]  # fmt: skip
+            process = subprocess.Popen(command, cwd=REPO_ROOT)
+            processes.append(process)
+            url = f"http://127.0.0.1:{port}"
+            _wait_until_up(f"{url}/system_stats", process)
+            urls.append(url)
+        yield urls
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+def _reset(urls: Sequence[str]) -> None:
+    for url in urls:
+        _http_json(f"{url}/bench/reset", {})
+
+
+def _collect(urls: Sequence[str]) -> List[Dict[str, Any]]:
+    return [_http_json(f"{url}/bench/stats") for url in urls]
+
+
+# ------------------------------------------------------------------ fixtures
+def _write_workflow(path: Path, label: str) -> None:
+    workflow = {
+        "1": {"class_type": "LoadImage", "inputs": {"image": "{input_image}"}, "_meta": {"title": "Load Image"}},
+        "2": {"class_type": "CLIPTextEncode", "inputs": {"text": f"benchmark {label}"}, "_meta": {"title": "Prompt"}},
+        "3": {"class_type": "KSampler", "inputs": {"seed": 1, "steps": 4, "positive": ["2", 0], "latent_image": ["1", 0]}},
+        "9": {"class_type": "SaveImage", "inputs": {"filename_prefix": "bench", "images": ["3", 0]}},
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(workflow, ensure_ascii=False), encoding="utf-8")
+
+
+def _write_inputs(folder: Path, count: int, size: int) -> List[Path]:
+    folder.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for index in range(max(1, count)):
+        path = folder / f"input_{index:04d}.png"
+        path.write_bytes(noise_png(size))
+        paths.append(path)
+    return paths
+
+
+# ----------------------------------------------------------------- scenarios
+def run_tester(config: BenchConfig, urls: Sequence[str], workdir: Path) -> Tuple[int, float, Optional[float], Optional[float]]:
+    workflow_path = workdir / "workflow" / "bench.json"
+    _write_workflow(workflow_path, "tester")
+    inputs = _write_inputs(workdir / "media", config.inputs, config.input_size)
+    cases = [
+        {
+            "name": f"case_{index:05d}",
+            "workflow_path": str(workflow_path),
+            "inputs": {"input_image": {"path": str(inputs[index % len(inputs)])}},
+            # Distinct prompts keep every case a separate run.
+            "text_inputs": {"Prompt": {"text": f"case {index}"}},
+        }
+        for index in range(config.cases)
+    ]
+    config_path = workdir / "bench_config.json"
+    config_path.write_text(json.dumps({"servers": list(urls), "output_dir": str(workdir / "output"), "workflows": cases}))
+    command = [
+        sys.executable, str(REPO_ROOT / "batch_workflow_tester.py"),
+        "--config", str(config_path),
+        "--max-in-flight", str(config.max_in_flight),
+        "--upload-cache", str(workdir / "upload_cache.json"),
+        # Keep fake-server samples out of the project's own latency baselines.
+        "--latency-history", str(workdir / "latency_history.jsonl"),
+        "--log-level", "WARNING",
+    ]  # fmt: skip
+    process = subprocess.Popen(command, cwd=REPO_ROOT)
+    peak = _reap(process)
+    succeeded = config.cases if process.returncode == 0 else -1
+    return succeeded, 0.0, peak, None
+
+
+@contextmanager
+def web_app(workdir: Path) -> Iterator[Tuple[str, subprocess.Popen, Dict[str, Optional[float]]]]:
+    port = _free_port()
+    env = dict(os.environ, COMFY_BATCH_DATA_DIR=str(workdir))
+    command = [sys.executable, "-m", "uvicorn", "webapp.app:app", "--port", str(port), "--log-level", "warning"]
+    process = subprocess.Popen(command, cwd=REPO_ROOT, env=env)
+    usage: Dict[str, Optional[float]] = {"peak_rss_mb": None}
+    try:
+        url = f"http://127.0.0.1:{port}"
+        _wait_until_up(f"{url}/api/jobs", process)
+        yield url, process, usage
+    finally:
+        if process.poll() is None:
+            process.send_signal(signal.SIGINT)
+        usage["peak_rss_mb"] = _reap(process)
+
+
+def _poll(url: str, timeout: float) -> Dict[str, Any]:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = _http_json(url)
+        if job.get("status") in ("finished", "failed", "cancelled"):
+            return job
+        time.sleep(POLL_INTERVAL)
+    raise RuntimeError(f"{url} did not finish within {timeout}s")
+
+
+def run_web_batch(config: BenchConfig, urls: Sequence[str], workdir: Path) -> Tuple[int, float, Optional[float], Optional[float]]:
+    for index in range(config.cases):
+        _write_workflow(workdir / "workflow" / "bench" / f"wf_{index:05d}.json", str(index))
+    inputs = _write_inputs(workdir / "media" / "bench", 1, config.input_size)
+    with web_app(workdir) as (base, process, usage):
+        groups = _http_json(f"{base}/api/workflow-groups")["groups"]
+        group = next(item for item in groups if len(item["workflows"]) == config.cases)
+        idle = _current_rss_mb(process.pid)
+        started = time.monotonic()
+        job_id = _http_json(
+            f"{base}/api/run-batch",
+            {
+                "group_id": group["id"],
+                "workflow_ids": [workflow["id"] for workflow in group["workflows"]],
+                "placeholders": {"{input_image}": inputs[0].relative_to(workdir / "media").as_posix()},
+                "server_url": urls[0],
+                "server_urls": list(urls),
+                "output_dir": str(workdir / "output"),
+                "max_in_flight": config.max_in_flight,
+            },
+        )["job_id"]
+        job = _poll(f"{base}/api/jobs/{job_id}", config.timeout)
+        wall = time.monotonic() - started
+        if job["status"] != "finished":
+            raise RuntimeError(f"run-batch job failed: {job.get('error')}")
+        succeeded = sum(1 for result in job.get("results") or [] if result.get("status") == "success")
+    return succeeded, wall, usage["peak_rss_mb"], idle
+
+
+def run_web_dataset(config: BenchConfig, urls: Sequence[str], workdir: Path) -> Tuple[int, float, Optional[float], Optional[float]]:
+    workflow_path = workdir / "workflow" / "dataset" / "bench.json"
+    _write_workflow(workflow_path, "dataset")
+    inputs = _write_inputs(workdir / "media" / "bench", config.cases, config.input_size)
+    with web_app(workdir) as (base, process, usage):
+        _http_json(f"{base}/api/workflow-groups")
+        idle = _current_rss_mb(process.pid)
+        started = time.monotonic()
+        job_id = _http_json(
+            f"{base}/api/datasets/run",
+            {
+                "dataset_name": f"bench_{int(time.time())}",
+                "workflow_id": workflow_path.relative_to(workdir / "workflow").as_posix(),
+                "placeholders": {"{input_image}": [path.relative_to(workdir / "media").as_posix() for path in inputs]},
+                "options": {
+                    "server_urls": list(urls),
+                    "max_in_flight": config.max_in_flight,
+                    "convert_images_to_jpg": config.convert_jpg,
+                },
+            },
+        )["job_id"]
+        job = _poll(f"{base}/api/dataset-jobs/{job_id}", config.timeout)
+        wall = time.monotonic() - started
+        if job["status"] != "finished":
+            raise RuntimeError(f"dataset job failed: {job.get('error')}")
+        succeeded = int(job.get("completed") or 0)
+    return succeeded, wall, usage["peak_rss_mb"], idle
+
+
+RUNNERS = {"tester": run_tester, "web-batch": run_web_batch, "web-dataset": run_web_dataset}
+
+
+def run_scenario(name: str, config: BenchConfig, urls: Sequence[str], workdir: Path) -> ScenarioResult:
+    _reset(urls)
+    scenario_dir = workdir / name
+    scenario_dir.mkdir(parents=True, exist_ok=True)
+    started = time.monotonic()
+    succeeded, wall, peak, idle = RUNNERS[name](config, urls, scenario_dir)
+    wall = wall or (time.monotonic() - started)
+    samples, span, collected = stage_samples(_collect(urls))
+    if succeeded < 0:
+        succeeded = collected
+    return ScenarioResult(
+        scenario=name,
+        cases=config.cases,
+        succeeded=succeeded,
+        wall_time=round(wall, 3),
+        span=round(span, 3),
+        throughput=round(collected / span, 2) if span else 0.0,
+        peak_rss_mb=peak,
+        idle_rss_mb=idle,
+        stages={stage: summarize(values) for stage, values in samples.items()},
+    )
+
+
+# ----------------------------------------------------------------- reporting
+def format_report(results: Sequence[ScenarioResult], baseline: Optional[Mapping[str, Any]] = None) -> str:
+    previous = {item["scenario"]: item for item in (baseline or {}).get("results", [])}
+    lines: List[str] = []
+    for result in results:
+        old = previous.get(result.scenario)
+        lines.append(f"== {result.scenario}: {result.succeeded}/{result.cases} ok")
+        lines.append(
+            f"   throughput {result.throughput:.2f} prompts/s{_delta(result.throughput, old and old['throughput'])}"
+            f" | span {result.span:.2f}s | wall {result.wall_time:.2f}s"
+        )
+        rss = f"   peak RSS {result.peak_rss_mb if result.peak_rss_mb is not None else '-'} MiB"
+        rss += _delta(result.peak_rss_mb, old and old.get("peak_rss_mb"), lower_is_better=True)
+        if result.idle_rss_mb is not None:
+            rss += f" (idle {result.idle_rss_mb} MiB)"
+        lines.append(rss)
+        lines.append(f"   {'stage':<13}{'count':>7}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}  (ms)")
+        for stage, summary in result.stages.items():
+            if not summary.get("count"):
+                continue
+            old_p50 = old and old["stages"].get(stage, {}).get("p50")
+            lines.append(
+                f"   {stage:<13}{summary['count']:>7}{summary['p50']:>10.1f}{summary['p90']:>10.1f}"
+                f"{summary['p99']:>10.1f}{summary['max']:>10.1f}{_delta(summary['p50'], old_p50, lower_is_better=True)}"
+            )
+    return "\n".join(lines)
+
+
+def _delta(current: Optional[float], previous: Optional[float], *, lower_is_better: bool = False) -> str:
+    if current is None or not previous:
+        return ""
+    change = (current - previous) / previous * 100
+    better = change < 0 if lower_is_better else change > 0
+    return f"  [{change:+.1f}% {'better' if better else 'worse'} vs baseline]" if abs(change) >= 0.05 else ""
+
+
+# ----------------------------------------------------------------------- CLI
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    defaults = BenchConfig()
+    fake = defaults.fake
+    parser = argparse.ArgumentParser(description="Throughput benchmarks against fake ComfyUI servers")
+    parser.add_argument("--scenario", "-s", action="append", choices=SCENARIOS, help="Scenario to run (repeatable, default: all)")
+    parser.add_argument("--cases", type=int, default=defaults.cases, help="Prompts per scenario")
+    parser.add_argument("--servers", type=int, default=defaults.servers, help="Fake ComfyUI servers to start")
+    parser.add_argument("--max-in-flight", type=int, default=defaults.max_in_flight, help="Prompts queued per server")
+    parser.add_argument("--inputs", type=int, default=defaults.inputs, help="Distinct input images for the tester scenario")
+    parser.add_argument("--input-size", type=int, default=defaults.input_size, help="Approximate bytes per input image")
+    parser.add_argument("--convert-jpg", action="store_true", help="Let dataset runs convert inputs and outputs to JPEG")
+    parser.add_argument("--latency", type=float, default=fake.latency, help="Seconds each fake prompt executes")
+    parser.add_argument("--jitter", type=float, default=fake.jitter, help="Uniform +/- seconds added to the latency")
+    parser.add_argument("--workers", type=int, default=fake.workers, help="Prompts each fake server executes at once")
+    parser.add_argument("--outputs", type=int, default=fake.outputs, help="Output files per prompt")
+    parser.add_argument("--output-size", type=int, default=fake.output_size, help="Approximate bytes per output file")
+    parser.add_argument("--output-kind", choices=("image", "video"), default=fake.output_kind)
+    parser.add_argument("--timeout", type=float, default=defaults.timeout, help="Seconds to wait for one scenario")
+    parser.add_argument("--workdir", help="Keep inputs and outputs here instead of a temporary directory")
+    parser.add_argument("--json", dest="json_path", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Show changes against results saved earlier with --json")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    config = BenchConfig(
+        cases=args.cases,
+        servers=args.servers,
+        max_in_flight=args.max_in_flight,
+        inputs=args.inputs,
+        input_size=args.input_size,
+        convert_jpg=args.convert_jpg,
+        timeout=args.timeout,
+        fake=FakeSettings(
+            latency=args.latency,
+            jitter=args.jitter,
+            workers=args.workers,
+            outputs=args.outputs,
+            output_size=args.output_size,
+            output_kind=args.output_kind,
+        ),
+    )
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as handle:
+            baseline = json.load(handle)
+
+    workdir = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix="comfy-bench-"))
+    results: List[ScenarioResult] = []
+    try:
+        with fake_servers(config) as urls:
+            for name in args.scenario or SCENARIOS:
+                results.append(run_scenario(name, config, urls, workdir))
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(format_report(results, baseline))
+    if args.json_path:
+        report = {"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "config": asdict(config), "results": [asdict(item) for item in results]}
+        with open(args.json_path, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, ensure_ascii=False, indent=2)
+    return 0 if all(result.succeeded == result.cases for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""Row-by-row readers for spreadsheets that describe batch cases.
+
+CSV/TSV files are read with the standard library. ``.xlsx`` workbooks need
+the optional ``openpyxl`` package, which is imported only when such a file
+is opened, so importing this module (and starting the CLI) stays cheap when
+no spreadsheet is used. Both readers stream: only the current row is held in
+memory, however large the sheet is.
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+CSV_SUFFIXES = {".csv": ",", ".tsv": "\t"}
+XLSX_SUFFIXES = (".xlsx", ".xlsm")
+TABLE_SUFFIXES = tuple(CSV_SUFFIXES) + XLSX_SUFFIXES
+COLUMN_TYPES = ("raw", "str", "int", "float", "json", "auto")
+
+# Row number (1-based, counting data rows only) and the row's cells by column header.
+TableRow = Tuple[int, Dict[str, Any]]
+
+
+def read_header(path: Path, *, sheet: Optional[str] = None) -> List[str]:
+    """Column headers of the table: the first non-empty row, stripped."""
+    with _open_rows(path, sheet) as rows:
+        for cells in rows:
+            if _has_values(cells):
+                return _header(cells)
+    raise ValueError(f"Table {path} is empty")
+
+
+def iter_rows(path: Path, *, sheet: Optional[str] = None) -> Iterator[TableRow]:
+    """Yield the data rows of the table; blank rows are skipped and do not count."""
+    with _open_rows(path, sheet) as rows:
+        header: Optional[List[str]] = None
+        number = 0
+        for cells in rows:
+            if not _has_values(cells):
+                continue
+            if header is None:
+                header = _header(cells)
+                continue
+            number += 1
+            yield number, {name: _cell(value) for name, value in zip(header, cells) if name}
+
+
+def count_rows(path: Path, *, sheet: Optional[str] = None) -> int:
+    return sum(1 for _ in iter_rows(path, sheet=sheet))
+
+
+def convert(value: Any, kind: str) -> Any:
+    """Convert a cell to the column's declared type, one of :data:`COLUMN_TYPES`.
+
+    ``raw`` keeps the cell as read: typed in workbooks, text in CSV files.
+    ``auto`` also parses text that is a JSON number, boolean, list or object;
+    anything else stays text.
+    """
+    if kind == "raw":
+        return value
+    if kind == "str":
+        return value if isinstance(value, str) else _text(value)
+    if kind == "int":
+        return int(float(value)) if isinstance(value, str) else int(value)
+    if kind == "float":
+        return float(value)
+    if kind == "json":
+        return json.loads(value) if isinstance(value, str) else value
+    if kind == "auto":
+        if not isinstance(value, str):
+            return value
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+    raise ValueError(f"Unknown column type '{kind}' (expected {', '.join(COLUMN_TYPES)})")
+
+
+# ------------------------------------------------------------------ readers
+@contextmanager
+def _open_rows(path: Path, sheet: Optional[str]) -> Iterator[Iterator[Tuple[Any, ...]]]:
+    """Raw row tuples of the table; the file is closed when the block exits."""
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix in CSV_SUFFIXES:
+        # utf-8-sig drops the BOM Excel writes in front of exported CSV files.
+        with path.open("r", encoding="utf-8-sig", newline="") as handle:
+            yield (tuple(row) for row in csv.reader(handle, delimiter=CSV_SUFFIXES[suffix]))
+        return
+    if suffix not in XLSX_SUFFIXES:
+        raise ValueError(f"Unsupported table format {path.suffix or path.name} (expected {', '.join(TABLE_SUFFIXES)})")
+    try:
+        import openpyxl  # pylint: disable=import-outside-toplevel
+    except ImportError as exc:
+        raise RuntimeError(f"Reading {path.name} requires openpyxl (pip install openpyxl)") from exc
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        if sheet is not None and sheet not in workbook.sheetnames:
+            raise ValueError(f"Sheet '{sheet}' not found in {path}; available: {', '.join(workbook.sheetnames)}")
+        worksheet = workbook[sheet] if sheet is not None else workbook.worksheets[0]
+        yield worksheet.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def _header(cells: Tuple[Any, ...]) -> List[str]:
+    return [_text(cell).strip() if cell is not None else "" for cell in cells]
+
+
+def _has_values(cells: Tuple[Any, ...]) -> bool:
+    return any(_cell(cell) is not None for cell in cells)
+
+
+def _cell(value: Any) -> Any:
+    """Empty cells (``None`` or blank text) become ``None``; text is stripped."""
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    return value
+
+
+def _text(value: Any) -> str:
+    # Spreadsheets store whole numbers as floats; 3.0 in a prompt column should read "3".
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
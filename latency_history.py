@@ -0,0 +1,375 @@
+"""Per-workflow latency history and regression report.
+
+Every successful run that went to ComfyUI (results reused from the result
+cache are skipped) is appended to a JSON-lines file. A sample records the
+workflow name, a hash of the workflow template, the server, and the stage
+timings of the run. Samples are grouped by workflow and server. The samples
+of the current template version are compared with a baseline:
+
+* the previous version of the template, so an edit that slows the workflow
+  down is flagged on its next runs, or
+* without an earlier version, the runs before the most recent ``window``, so
+  a server or tunnel that became slower is flagged as well.
+
+A regression is reported when the median grew by at least ``min_slowdown``
+and a one-sided Mann-Whitney U test says the current samples are slower
+with ``p < alpha``. Run ``python latency_history.py`` for a report.
+
+New samples are appended by a :class:`~upload_cache.DeferredWriter` timer,
+at most once per ``flush_delay`` seconds and on :meth:`LatencyHistory.flush`,
+so recording a run does no file I/O on the caller's thread (in the web app,
+the event loop).
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from upload_cache import DEFAULT_FLUSH_DELAY, DeferredWriter
+
+
+LOG = logging.getLogger("latency_history")
+
+DEFAULT_LATENCY_HISTORY = ".comfy_latency_history.jsonl"
+DEFAULT_METRIC = "execution"
+# Samples kept per (workflow, template version, server).
+MAX_SAMPLES = 200
+
+
+@dataclass
+class LatencySample:
+    workflow: str
+    workflow_hash: str
+    server: str
+    recorded_at: float
+    total: float
+    stages: Dict[str, float] = field(default_factory=dict)
+    prompt_id: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def value(self, metric: str) -> Optional[float]:
+        if metric == "total":
+            return self.total
+        return self.stages.get(metric)
+
+    @classmethod
+    def from_result(cls, result: Mapping[str, Any], *, now: Optional[float] = None) -> Optional["LatencySample"]:
+        """Sample for a run result of :class:`~batch_workflow_tester.AsyncBatchWorkflowTester`, if it has one."""
+        timings = result.get("timings")
+        if result.get("status") != "success" or result.get("cached") or not isinstance(timings, Mapping):
+            return None
+        if not result.get("workflow_hash") or not result.get("server"):
+            return None
+        return cls(
+            workflow=str(result.get("name") or ""),
+            workflow_hash=str(result["workflow_hash"]),
+            server=str(result["server"]),
+            recorded_at=now if now is not None else time.time(),
+            total=float(timings.get("total") or 0.0),
+            stages={str(stage): float(seconds) for stage, seconds in (timings.get("stages") or {}).items()},
+            prompt_id=result.get("prompt_id"),
+        )
+
+
+@dataclass
+class LatencyReport:
+    workflow: str
+    server: str
+    metric: str
+    workflow_hash: str
+    count: int
+    p50: float
+    p95: float
+    last_run: float
+    baseline: Optional[str] = None
+    baseline_hash: Optional[str] = None
+    baseline_count: int = 0
+    baseline_p50: Optional[float] = None
+    baseline_p95: Optional[float] = None
+    change: Optional[float] = None
+    p_value: Optional[float] = None
+    regression: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class LatencyHistory:
+    """Append-only latency history in a JSON-lines file. Thread safe."""
+
+    def __init__(self, path: Optional[Path], *, max_samples: int = MAX_SAMPLES, flush_delay: float = DEFAULT_FLUSH_DELAY):
+        self.path = Path(path) if path else None
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        # (workflow, server) -> workflow_hash -> samples, oldest first; versions in order of first use.
+        self._series: Dict[Tuple[str, str], "OrderedDict[str, List[LatencySample]]"] = {}
+        # Samples recorded but not yet appended to the file.
+        self._pending: List[LatencySample] = []
+        self._writer = _HistoryAppender(self.path, self._drain, delay=flush_delay) if self.path else None
+        self._load()
+
+    # ---------------------------------------------------------------- writes
+    def record(self, sample: LatencySample) -> None:
+        with self._lock:
+            self._add(sample)
+            if self._writer is None:
+                return
+            self._pending.append(sample)
+        self._writer.schedule()
+
+    def record_result(self, result: Mapping[str, Any]) -> bool:
+        sample = LatencySample.from_result(result)
+        if sample is None:
+            return False
+        self.record(sample)
+        return True
+
+    def record_results(self, results: Iterable[Mapping[str, Any]]) -> int:
+        return sum(1 for result in results if self.record_result(result))
+
+    def flush(self) -> None:
+        """Append the samples still waiting for the timer now."""
+        if self._writer is not None:
+            self._writer.flush()
+
+    # ----------------------------------------------------------------- reads
+    def samples(self, *, workflow: Optional[str] = None, server: Optional[str] = None, limit: Optional[int] = None) -> List[LatencySample]:
+        """Recorded samples, oldest first."""
+        with self._lock:
+            selected = [
+                sample
+                for (name, url), versions in self._series.items()
+                if (workflow is None or name == workflow) and (server is None or url == server)
+                for samples in versions.values()
+                for sample in samples
+            ]
+        selected.sort(key=lambda sample: sample.recorded_at)
+        return selected[-limit:] if limit else selected
+
+    def report(
+        self,
+        *,
+        workflows: Optional[Sequence[str]] = None,
+        server: Optional[str] = None,
+        metric: str = DEFAULT_METRIC,
+        window: int = 10,
+        min_samples: int = 3,
+        min_slowdown: float = 0.1,
+        alpha: float = 0.05,
+    ) -> List[LatencyReport]:
+        """One entry per (workflow, server) describing the current template version."""
+        with self._lock:
+            series = {
+                key: [(digest, list(samples)) for digest, samples in versions.items()]
+                for key, versions in self._series.items()
+                if (workflows is None or key[0] in workflows) and (server is None or key[1] == server)
+            }
+        reports: List[LatencyReport] = []
+        for (name, url), versions in sorted(series.items()):
+            # The current version is the one that ran most recently.
+            versions.sort(key=lambda item: item[1][-1].recorded_at)
+            digest, samples = versions[-1]
+            current = _values(samples, metric)
+            if not current:
+                continue
+            baseline_kind: Optional[str] = None
+            baseline_hash: Optional[str] = None
+            baseline: List[float] = []
+            if len(versions) > 1:
+                baseline_kind, baseline_hash = "previous_version", versions[-2][0]
+                baseline = _values(versions[-2][1], metric)
+            elif len(current) > window:
+                baseline_kind, baseline_hash = "earlier_runs", digest
+                current, baseline = current[-window:], current[:-window]
+            report = LatencyReport(
+                workflow=name,
+                server=url,
+                metric=metric,
+                workflow_hash=digest,
+                count=len(current),
+                p50=percentile(current, 50),
+                p95=percentile(current, 95),
+                last_run=samples[-1].recorded_at,
+            )
+            if baseline:
+                report.baseline = baseline_kind
+                report.baseline_hash = baseline_hash
+                report.baseline_count = len(baseline)
+                report.baseline_p50 = percentile(baseline, 50)
+                report.baseline_p95 = percentile(baseline, 95)
+                if report.baseline_p50 > 0:
+                    report.change = round(report.p50 / report.baseline_p50 - 1.0, 4)
+                if len(current) >= min_samples and len(baseline) >= min_samples:
+                    report.p_value = mann_whitney_greater(current, baseline)
+                    report.regression = (
+                        report.change is not None and report.change >= min_slowdown and report.p_value < alpha
+                    )
+            reports.append(report)
+        return reports
+
+    # --------------------------------------------------------------- internal
+    def _drain(self) -> Optional[List[LatencySample]]:
+        with self._lock:
+            pending, self._pending = self._pending, []
+        return pending or None
+
+    def _add(self, sample: LatencySample) -> None:
+        versions = self._series.setdefault((sample.workflow, sample.server), OrderedDict())
+        samples = versions.setdefault(sample.workflow_hash, [])
+        samples.append(sample)
+        if len(samples) > self.max_samples:
+            del samples[: len(samples) - self.max_samples]
+
+    def _load(self) -> None:
+        if self.path is None or not self.path.exists():
+            return
+        lines = 0
+        try:
+            with self.path.open("r", encoding="utf-8") as handle:
+                for line in handle:
+                    lines += 1
+                    try:
+                        self._add(LatencySample(**json.loads(line)))
+                    except (TypeError, ValueError):
+                        continue
+        except OSError as exc:
+            LOG.warning("Could not read latency history %s: %s", self.path, exc)
+            return
+        kept = sum(len(samples) for versions in self._series.values() for samples in versions.values())
+        if lines > 2 * kept:
+            self._compact()
+
+    def _compact(self) -> None:
+        """Rewrite the file with only the samples still kept in memory."""
+        assert self.path is not None
+        samples = sorted(
+            (sample for versions in self._series.values() for series in versions.values() for sample in series),
+            key=lambda sample: sample.recorded_at,
+        )
+        temporary = self.path.with_name(f"{self.path.name}.tmp")
+        try:
+            with temporary.open("w", encoding="utf-8") as handle:
+                for sample in samples:
+                    handle.write(json.dumps(sample.to_dict(), ensure_ascii=False) + "\n")
+            temporary.replace(self.path)
+        except OSError as exc:
+            LOG.warning("Could not compact latency history %s: %s", self.path, exc)
+
+
+class _HistoryAppender(DeferredWriter):
+    """Appends the pending samples as JSON lines instead of rewriting the file."""
+
+    def _store(self, payload: List[LatencySample]) -> None:
+        with self.path.open("a", encoding="utf-8") as handle:
+            handle.writelines(json.dumps(sample.to_dict(), ensure_ascii=False) + "\n" for sample in payload)
+
+
+# ------------------------------------------------------------------ statistics
+def percentile(values: Sequence[float], q: float) -> float:
+    """Linearly interpolated percentile (``q`` in 0..100) of a non-empty sequence."""
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100.0
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    value = ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+    return round(value, 4)
+
+
+def mann_whitney_greater(current: Sequence[float], baseline: Sequence[float]) -> float:
+    """One-sided p-value that ``current`` tends to be larger than ``baseline``.
+
+    Mann-Whitney U with the normal approximation, continuity and tie
+    correction; no assumption about the shape of the latency distribution.
+    """
+    combined = sorted([(value, 0) for value in current] + [(value, 1) for value in baseline])
+    ranks = [0.0] * len(combined)
+    tie_term = 0.0
+    start = 0
+    while start < len(combined):
+        end = start
+        while end + 1 < len(combined) and combined[end + 1][0] == combined[start][0]:
+            end += 1
+        for index in range(start, end + 1):
+            ranks[index] = (start + end) / 2.0 + 1.0
+        tied = end - start + 1
+        tie_term += tied ** 3 - tied
+        start = end + 1
+    n1, n2 = len(current), len(baseline)
+    rank_sum = sum(rank for rank, (_, group) in zip(ranks, combined) if group == 0)
+    u_statistic = rank_sum - n1 * (n1 + 1) / 2.0
+    total = n1 + n2
+    variance = n1 * n2 / 12.0 * ((total + 1) - tie_term / (total * (total - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (u_statistic - n1 * n2 / 2.0 - 0.5) / math.sqrt(variance)
+    return round(0.5 * math.erfc(z / math.sqrt(2.0)), 6)
+
+
+def _values(samples: Sequence[LatencySample], metric: str) -> List[float]:
+    return [value for value in (sample.value(metric) for sample in samples) if value is not None]
+
+
+# ------------------------------------------------------------------- report
+def format_report(reports: Sequence[LatencyReport]) -> str:
+    if not reports:
+        return "No latency history recorded yet."
+    header = f"{'workflow':<32} {'server':<28} {'runs':>4} {'p50':>8} {'p95':>8} {'base p50':>9} {'change':>8} {'p':>7}"
+    lines = [f"metric: {reports[0].metric} (seconds)", header, "-" * len(header)]
+    for report in reports:
+        base = f"{report.baseline_p50:.2f}" if report.baseline_p50 is not None else "-"
+        change = f"{report.change:+.0%}" if report.change is not None else "-"
+        p_value = f"{report.p_value:.3f}" if report.p_value is not None else "-"
+        flag = "  REGRESSION" if report.regression else ""
+        lines.append(
+            f"{report.workflow[:32]:<32} {report.server[:28]:<28} {report.count:>4} "
+            f"{report.p50:>8.2f} {report.p95:>8.2f} {base:>9} {change:>8} {p_value:>7}{flag}"
+        )
+    return "\n".join(lines)
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Report workflow latency and regressions recorded by batch_workflow_tester")
+    parser.add_argument("--history", default=DEFAULT_LATENCY_HISTORY, help="Latency history file")
+    parser.add_argument("--workflow", "-w", action="append", dest="workflows", help="Only report this workflow (repeatable)")
+    parser.add_argument("--server", help="Only report this server")
+    parser.add_argument(
+        "--metric", default=DEFAULT_METRIC, help="Stage to compare (execution, queue_wait, upload, download, ...) or 'total'"
+    )
+    parser.add_argument("--window", type=int, default=10, help="Recent runs compared with earlier runs of an unchanged workflow")
+    parser.add_argument("--min-slowdown", type=float, default=0.1, help="Smallest median slowdown reported (0.1 = 10%%)")
+    parser.add_argument("--alpha", type=float, default=0.05, help="Significance level of the regression test")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    history = LatencyHistory(Path(args.history))
+    reports = history.report(
+        workflows=args.workflows,
+        server=args.server,
+        metric=args.metric,
+        window=args.window,
+        min_slowdown=args.min_slowdown,
+        alpha=args.alpha,
+    )
+    if args.json:
+        print(json.dumps([report.to_dict() for report in reports], ensure_ascii=False, indent=2))
+    else:
+        print(format_report(reports))
+    return 1 if any(report.regression for report in reports) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,205 @@
+"""Minimal in-process metrics in the Prometheus text exposition format.
+
+Counters, gauges and histograms with labels, registered in a
+:class:`Registry` that renders them for a ``/metrics`` scrape. Metrics are
+module-level objects updated from hooks in the engine and the web app; the
+default :data:`REGISTRY` collects them all. Only the subset of the format
+that Prometheus and compatible scrapers need is implemented, so no client
+library is required.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Stages of a ComfyUI run range from milliseconds to many minutes.
+LONG_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+
+LabelValues = Tuple[str, ...]
+
+
+class Registry:
+    """Set of metrics rendered together; ``collectors`` refresh gauges right before a scrape."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, "Metric"] = {}
+        self._collectors: Dict[str, Callable[[], None]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: "Metric") -> None:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+
+    def set_collector(self, key: str, collector: Optional[Callable[[], None]]) -> None:
+        """Install (or with ``None`` remove) the collector stored under ``key``."""
+        with self._lock:
+            if collector is None:
+                self._collectors.pop(key, None)
+            else:
+                self._collectors[key] = collector
+
+    def render(self) -> str:
+        with self._lock:
+            collectors = list(self._collectors.values())
+            metrics = list(self._metrics.values())
+        for collector in collectors:
+            collector()
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class Metric(ABC):
+    """Base of the metric types; subclasses keep the values and render their sample lines."""
+
+    TYPE = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), *, registry: Optional[Registry] = REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def clear(self) -> None:
+        """Forget every label combination, e.g. servers that are gone."""
+        with self._lock:
+            self._clear()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {_escape_help(self.documentation)}", f"# TYPE {self.name} {self.TYPE}"]
+        with self._lock:
+            lines.extend(self._samples())
+        return lines
+
+    def _key(self, labels: Dict[str, object]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _format(self, suffix: str, key: LabelValues, value: float, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        rendered = "{" + ",".join(f'{name}="{_escape_label(value)}"' for name, value in pairs) + "}" if pairs else ""
+        return f"{self.name}{suffix}{rendered} {_format_value(value)}"
+
+    @abstractmethod
+    def _clear(self) -> None:
+        """Drop all values; called with ``_lock`` held."""
+
+    @abstractmethod
+    def _samples(self) -> Iterator[str]:
+        """Sample lines in exposition format; called with ``_lock`` held."""
+
+
+class Counter(Metric):
+    TYPE = "counter"
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: object) -> None:
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: object) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _clear(self) -> None:
+        self._values.clear()
+
+    def _samples(self) -> Iterator[str]:
+        for key, value in sorted(self._values.items()):
+            yield self._format("", key, value)
+
+
+class Gauge(Counter):
+    TYPE = "gauge"
+
+    def inc(self, amount: float = 1.0, **labels: object) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: object) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: object) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+
+class Histogram(Metric):
+    TYPE = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(float(bound) for bound in buckets))
+        # Per label set: observations per bucket (the last one is +Inf), sum.
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: object) -> None:
+        key = self._key(labels)
+        index = next((position for position, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            counts[index] += 1
+            self._sums[key] += value
+
+    def count(self, **labels: object) -> int:
+        with self._lock:
+            return sum(self._counts.get(self._key(labels), ()))
+
+    def _clear(self) -> None:
+        self._counts.clear()
+        self._sums.clear()
+
+    def _samples(self) -> Iterator[str]:
+        for key, counts in sorted(self._counts.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield self._format("_bucket", key, cumulative, (("le", _format_value(bound)),))
+            yield self._format("_sum", key, self._sums[key])
+            yield self._format("_count", key, cumulative)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _escape_help(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n")
@@ -0,0 +1,188 @@
+"""Opt-in memo of finished runs, so identical submissions skip ComfyUI.
+
+A run is identified by a canonical SHA-256 of its fully patched prompt in
+which every uploaded input is replaced by the digest of its content. The key
+therefore does not depend on local paths, remote upload names or the server
+that ran it. An entry points at the artifacts and ``run_metadata.json`` the
+original run saved; it is only reused while all of those files still exist.
+Entries are evicted by age, count and the total size of the outputs they
+reference. Eviction only forgets entries; saved outputs are never deleted.
+Like the upload cache, the file is rewritten by a timer thread shortly after
+changes (or on :meth:`ResultCache.flush`), not once per finished run.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional
+
+from upload_cache import DEFAULT_FLUSH_DELAY, DeferredWriter, DigestMemo
+
+
+LOG = logging.getLogger("result_cache")
+
+KEY_VERSION = "1"
+
+
+def prompt_key(prompt: Mapping[str, Any]) -> str:
+    """Canonical hash of a patched prompt (key order and whitespace do not matter)."""
+    blob = json.dumps(prompt, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(f"{KEY_VERSION}:{blob}".encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CachedRun:
+    prompt_id: str
+    server: Optional[str]
+    output_dir: str
+    metadata_file: str
+    saved_files: List[str] = field(default_factory=list)
+    size: int = 0
+    created_at: float = 0.0
+    last_used: float = 0.0
+
+    def files_exist(self) -> bool:
+        return Path(self.metadata_file).is_file() and all(Path(path).is_file() for path in self.saved_files)
+
+    def to_result(self) -> Dict[str, Any]:
+        return {
+            "prompt_id": self.prompt_id,
+            "server": self.server,
+            "output_dir": self.output_dir,
+            "saved_files": list(self.saved_files),
+            "metadata_file": self.metadata_file,
+        }
+
+
+class ResultCache:
+    """JSON-backed map of run key -> saved artifacts. Thread safe."""
+
+    VERSION = 1
+
+    def __init__(
+        self,
+        path: Optional[Path],
+        *,
+        max_entries: int = 5000,
+        max_bytes: int = 50 * 1024 ** 3,
+        max_age: float = 14 * 24 * 3600,
+        flush_delay: float = DEFAULT_FLUSH_DELAY,
+    ):
+        self.path = Path(path) if path else None
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._entries: Dict[str, CachedRun] = {}
+        self._digests = DigestMemo()
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._writer = DeferredWriter(self.path, self._snapshot, delay=flush_delay) if self.path else None
+        self._load()
+
+    def digest(self, path: Path) -> str:
+        """Content hash of an input, reused while its size and mtime are unchanged."""
+        return self._digests.lookup(path)[0]
+
+    def get(self, key: str) -> Optional[CachedRun]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if now - entry.created_at > self.max_age or not entry.files_exist():
+                del self._entries[key]
+                entry = None
+            else:
+                entry.last_used = now
+            self._dirty = True
+        self._schedule()
+        return entry
+
+    def put(self, key: str, result: Mapping[str, Any]) -> None:
+        saved_files = [str(path) for path in result.get("saved_files") or []]
+        size = 0
+        for path in saved_files:
+            try:
+                size += os.path.getsize(path)
+            except OSError:
+                pass
+        now = time.time()
+        entry = CachedRun(
+            prompt_id=str(result.get("prompt_id") or ""),
+            server=result.get("server"),
+            output_dir=str(result.get("output_dir") or ""),
+            metadata_file=str(result.get("metadata_file") or ""),
+            saved_files=saved_files,
+            size=size,
+            created_at=now,
+            last_used=now,
+        )
+        with self._lock:
+            self._entries[key] = entry
+            self._evict()
+            self._dirty = True
+        self._schedule()
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            if self._entries.pop(key, None) is None:
+                return
+            self._dirty = True
+        self._schedule()
+
+    def flush(self) -> None:
+        """Write pending changes now instead of waiting for the timer."""
+        if self._writer is not None:
+            self._writer.flush()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    # ----------------------------------------------------------- persistence
+    def _evict(self) -> None:
+        cutoff = time.time() - self.max_age
+        for key in [key for key, entry in self._entries.items() if entry.created_at < cutoff]:
+            del self._entries[key]
+        total = sum(entry.size for entry in self._entries.values())
+        if len(self._entries) <= self.max_entries and total <= self.max_bytes:
+            return
+        for key, entry in sorted(self._entries.items(), key=lambda item: item[1].last_used):
+            if len(self._entries) <= self.max_entries and total <= self.max_bytes:
+                break
+            del self._entries[key]
+            total -= entry.size
+
+    def _schedule(self) -> None:
+        if self._writer is not None:
+            self._writer.schedule()
+
+    def _snapshot(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if not self._dirty:
+                return None
+            self._dirty = False
+            return {"version": self.VERSION, "entries": {key: asdict(entry) for key, entry in self._entries.items()}}
+
+    def _load(self) -> None:
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            with self.path.open("r", encoding="utf-8") as handle:
+                payload = json.load(handle)
+            if payload.get("version") != self.VERSION:
+                raise ValueError(f"unsupported version {payload.get('version')}")
+            self._entries = {key: CachedRun(**value) for key, value in (payload.get("entries") or {}).items()}
+        except (OSError, ValueError, TypeError) as exc:
+            LOG.warning("Ignoring unreadable result cache %s: %s", self.path, exc)
+            self._entries = {}
+            return
+        with self._lock:
+            self._evict()
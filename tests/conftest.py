@@ -0,0 +1,55 @@
+from contextlib import asynccontextmanager
+
+import pytest
+from aiohttp import web
+
+from benchmarks.fake_comfy import FakeComfyServer, FakeSettings
+from webapp.job_store import JobStore
+from webapp.jobs import JobManager
+
+
+@pytest.fixture
+def job_store(tmp_path):
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def job_manager(job_store):
+    return JobManager(job_store)
+
+
+def create_batch_job(manager, workflow_ids=("group/a.json",)):
+    return manager.create_job(
+        group_id="group",
+        workflow_ids=list(workflow_ids),
+        placeholders={},
+        uploaded_names=None,
+        server_url="http://127.0.0.1:8189",
+        output_dir=None,
+    )
+
+
+@pytest.fixture
+def make_job():
+    return create_batch_job
+
+
+@asynccontextmanager
+async def serve_fake_comfy(settings=None, server_class=FakeComfyServer):
+    """Run a fake ComfyUI server on the current loop; yields (server, base URL)."""
+    server = server_class(settings or FakeSettings(latency=0.05))
+    runner = web.AppRunner(server.build_app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    try:
+        yield server, f"http://127.0.0.1:{runner.addresses[0][1]}"
+    finally:
+        await runner.cleanup()
+
+
+@pytest.fixture
+def fake_comfy():
+    return serve_fake_comfy
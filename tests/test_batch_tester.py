@@ -0,0 +1,241 @@
+import asyncio
+import json
+import os
+import socket
+
+import pytest
+
+from batch_workflow_tester import (
+    AsyncBatchWorkflowTester,
+    AsyncComfyAPIClient,
+    AsyncServerPool,
+    BatchWorkflowTester,
+    ComfyAPIClient,
+    WorkflowTestCase,
+    _run_sync,
+)
+from benchmarks.fake_comfy import FakeComfyServer, FakeSettings
+from result_cache import ResultCache
+
+
+WORKFLOW = {
+    "1": {"class_type": "LoadImage", "inputs": {"image": "{input_image}"}},
+    "2": {"class_type": "CLIPTextEncode", "inputs": {"text": "a cat"}, "_meta": {"title": "positive"}},
+    "9": {"class_type": "SaveImage", "inputs": {"images": ["1", 0]}},
+}
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def wait_for(condition, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not reached in time"
+        await asyncio.sleep(0.01)
+
+
+class RecordingServer(FakeComfyServer):
+    """Keeps the graph of every submitted prompt."""
+
+    def __init__(self, settings):
+        super().__init__(settings)
+        self.graphs = []
+
+    async def submit_prompt(self, request):
+        self.graphs.append((await request.json())["prompt"])
+        return await super().submit_prompt(request)
+
+
+@pytest.fixture
+def make_cases(tmp_path):
+    workflow_path = tmp_path / "workflow.json"
+    workflow_path.write_text(json.dumps(WORKFLOW), encoding="utf-8")
+    image = tmp_path / "input.png"
+    image.write_bytes(b"pixels" * 100)
+
+    def make(count):
+        return [
+            WorkflowTestCase(
+                name=f"case-{index}",
+                workflow_path=workflow_path,
+                inputs={"{input_image}": str(image)},
+                text_inputs={"positive": {"text": f"prompt {index}"}},
+            )
+            for index in range(count)
+        ]
+
+    return make
+
+
+def max_overlap(server):
+    """Largest number of prompts that were queued or running at the same time."""
+    events = []
+    for record in server.prompts.values():
+        events.append((record.submitted, 1))
+        events.append((record.finished, -1))
+    current = peak = 0
+    for _, delta in sorted(events):
+        current += delta
+        peak = max(peak, current)
+    return peak
+
+
+def test_run_all_uploads_renders_and_saves_every_case(fake_comfy, make_cases, tmp_path):
+    started, finished = [], []
+
+    async def scenario():
+        async with fake_comfy(FakeSettings(latency=0.05, outputs=2, output_size=1024), RecordingServer) as (server, url):
+            async with AsyncComfyAPIClient(url, timeout=10) as client:
+                tester = AsyncBatchWorkflowTester(client, output_root=tmp_path / "out", hash_outputs=True)
+                await tester.run_all(
+                    make_cases(3),
+                    on_start=lambda index, case: started.append(index),
+                    on_result=lambda index, case, result: finished.append((index, result["status"])),
+                )
+            return server, tester.results
+
+    server, results = run(scenario())
+    assert started == [1, 2, 3]
+    assert finished == [(1, "success"), (2, "success"), (3, "success")]
+    assert len(server.uploads) == 1
+    assert [graph["1"]["inputs"]["image"] for graph in server.graphs] == ["input.png"] * 3
+    assert [graph["2"]["inputs"]["text"] for graph in server.graphs] == ["prompt 0", "prompt 1", "prompt 2"]
+    for result in results:
+        assert len(result["saved_files"]) == 2
+        metadata = json.loads(open(result["metadata_file"], encoding="utf-8").read())
+        assert metadata["prompt_id"] == result["prompt_id"]
+        assert metadata["server"] == result["server"]
+        assert set(metadata["sha256"]) == {path.rsplit("/", 1)[-1] for path in result["saved_files"]}
+
+
+@pytest.mark.parametrize("max_in_flight", [1, 2])
+def test_in_flight_window_bounds_queued_prompts(fake_comfy, make_cases, tmp_path, max_in_flight):
+    async def scenario():
+        async with fake_comfy(FakeSettings(latency=0.1, workers=4)) as (server, url):
+            async with AsyncComfyAPIClient(url, timeout=10) as client:
+                tester = AsyncBatchWorkflowTester(client, output_root=tmp_path / "out", max_in_flight=max_in_flight)
+                await tester.run_all(make_cases(4))
+            return server, tester.results
+
+    server, results = run(scenario())
+    assert [result["status"] for result in results] == ["success"] * 4
+    assert max_overlap(server) == max_in_flight
+
+
+def test_run_all_takes_cases_only_when_a_slot_is_free(fake_comfy, make_cases, tmp_path):
+    taken = []
+    seen_when_started = []
+
+    def generate():
+        for case in make_cases(5):
+            taken.append(case.name)
+            yield case
+
+    async def scenario():
+        async with fake_comfy() as (_, url):
+            async with AsyncComfyAPIClient(url, timeout=10) as client:
+                tester = AsyncBatchWorkflowTester(client, output_root=tmp_path / "out", max_in_flight=2)
+                await tester.run_all(generate(), on_start=lambda index, case: seen_when_started.append(len(taken)))
+
+    run(scenario())
+    assert len(taken) == 5
+    # Case n starts before case n + 2 is drawn from the generator.
+    assert all(count <= index + 1 for index, count in enumerate(seen_when_started, start=1))
+
+
+def test_pool_spreads_cases_and_skips_unreachable_servers(fake_comfy, make_cases, tmp_path):
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        dead_url = f"http://127.0.0.1:{probe.getsockname()[1]}"
+
+    async def scenario():
+        async with fake_comfy(FakeSettings(latency=0.2)) as (first, first_url):
+            async with fake_comfy(FakeSettings(latency=0.2)) as (second, second_url):
+                async with AsyncServerPool([first_url, second_url, dead_url], timeout=10, probe_timeout=1) as pool:
+                    tester = AsyncBatchWorkflowTester(pool, output_root=tmp_path / "out", max_in_flight=4)
+                    await tester.run_all(make_cases(4))
+                    snapshot = {state["url"]: state for state in pool.snapshot()}
+                return first, second, first_url, second_url, tester.results, snapshot
+
+    first, second, first_url, second_url, results, snapshot = run(scenario())
+    assert [result["status"] for result in results] == ["success"] * 4
+    assert len(first.prompts) == len(second.prompts) == 2
+    assert sorted(result["server"] for result in results) == sorted([first_url, first_url, second_url, second_url])
+    assert snapshot[dead_url]["healthy"] is False
+    assert all(state["in_flight"] == 0 for state in snapshot.values())
+
+
+def test_cancelling_run_all_withdraws_started_prompts(fake_comfy, make_cases, tmp_path):
+    async def scenario():
+        async with fake_comfy(FakeSettings(latency=10.0, workers=1)) as (server, url):
+            async with AsyncComfyAPIClient(url, timeout=10) as client:
+                tester = AsyncBatchWorkflowTester(client, output_root=tmp_path / "out", max_in_flight=2)
+                task = asyncio.ensure_future(tester.run_all(make_cases(4)))
+                await wait_for(lambda: server.running and server.pending)
+                running, pending = server.running[0], server.pending[0]
+                task.cancel()
+                with pytest.raises(asyncio.CancelledError):
+                    await task
+                assert server.interrupted == {running}
+                assert server.prompts[pending].status == "cancelled"
+                assert len(server.prompts) == 2
+
+    run(scenario())
+
+
+def test_result_cache_reuses_matching_runs_unless_refreshed(fake_comfy, make_cases, tmp_path):
+    cache = ResultCache(tmp_path / "results.json", flush_delay=0)
+
+    async def run_once(url, cases, **options):
+        async with AsyncComfyAPIClient(url, timeout=10) as client:
+            tester = AsyncBatchWorkflowTester(client, output_root=tmp_path / "out", result_cache=cache, **options)
+            await tester.run_all(cases)
+            return tester.results
+
+    async def scenario():
+        async with fake_comfy() as (server, url):
+            first = await run_once(url, make_cases(1))
+            cached = await run_once(url, make_cases(1))
+            assert len(server.prompts) == 1
+            assert cached[0]["cached"] is True
+            assert cached[0]["saved_files"] == first[0]["saved_files"]
+
+            # Another prompt text is another run.
+            await run_once(url, make_cases(2)[1:])
+            assert len(server.prompts) == 2
+
+            refreshed = await run_once(url, make_cases(1), refresh_results=True)
+            assert len(server.prompts) == 3
+            assert "cached" not in refreshed[0]
+
+            # A run whose outputs were deleted is executed again.
+            for path in refreshed[0]["saved_files"]:
+                os.remove(path)
+            again = await run_once(url, make_cases(1))
+            assert len(server.prompts) == 4
+            assert "cached" not in again[0]
+
+    run(scenario())
+
+
+def test_blocking_wrappers_drive_the_background_loop(fake_comfy, make_cases, tmp_path):
+    server_context = fake_comfy(FakeSettings(latency=0.05))
+    server, url = _run_sync(server_context.__aenter__())
+    try:
+        with ComfyAPIClient(url, timeout=10) as client:
+            assert client.get_queue_depth() == 0
+            tester = BatchWorkflowTester(client, output_root=tmp_path / "out", max_in_flight=2)
+            tester.run_all(make_cases(2))
+            assert [result["status"] for result in tester.results] == ["success", "success"]
+            assert tester.engine.client is client.async_client
+
+            async def nested():
+                return client.get_queue_depth()
+
+            with pytest.raises(RuntimeError):
+                _run_sync(nested())
+    finally:
+        _run_sync(server_context.__aexit__(None, None, None))
+    assert len(server.prompts) == 2
@@ -0,0 +1,136 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from batch_workflow_tester import CaseStream, CaseSweep, SweepAxis, WorkflowTestCase, load_config
+
+
+def make_base(**fields):
+    return WorkflowTestCase(name="portrait", workflow_path=Path("workflow/portrait.json"), **fields)
+
+
+def test_product_axes_expand_as_cartesian_product():
+    sweep = CaseSweep(
+        make_base(inputs={"{input_image}": "a.png"}, overrides={"3.inputs.steps": 20}),
+        {"product": {"overrides.3.inputs.cfg": [4, 7], "text_inputs.6.text": ["cat", "dog", "fox"]}},
+    )
+
+    cases = list(sweep)
+
+    assert len(sweep) == len(cases) == 6
+    assert [case.name for case in cases] == [f"portrait_{index}" for index in range(1, 7)]
+    assert [(case.overrides["3.inputs.cfg"], case.text_inputs["6"]["text"]) for case in cases] == [
+        (4, "cat"), (4, "dog"), (4, "fox"), (7, "cat"), (7, "dog"), (7, "fox"),
+    ]
+    # Settings that are not swept are kept from the entry.
+    assert all(case.overrides["3.inputs.steps"] == 20 for case in cases)
+    assert all(case.inputs == {"{input_image}": "a.png"} for case in cases)
+
+
+def test_zip_group_advances_together_and_multiplies_with_product():
+    sweep = CaseSweep(
+        make_base(),
+        {
+            "product": {"overrides.3.inputs.seed": {"range": [1, 3]}},
+            "zip": [{"overrides.3.inputs.cfg": [4, 7, 9], "overrides.3.inputs.steps": [10, 20, 30]}],
+        },
+    )
+
+    pairs = [(case.overrides["3.inputs.seed"], case.overrides["3.inputs.cfg"], case.overrides["3.inputs.steps"]) for case in sweep]
+
+    assert len(sweep) == 6
+    assert pairs == [(1, 4, 10), (1, 7, 20), (1, 9, 30), (2, 4, 10), (2, 7, 20), (2, 9, 30)]
+
+
+def test_zip_axes_of_different_length_are_rejected():
+    with pytest.raises(ValueError, match="same length"):
+        CaseSweep(make_base(), {"zip": {"overrides.3.inputs.cfg": [4, 7], "overrides.3.inputs.steps": [10]}})
+
+
+def test_name_template_uses_labels_and_input_stems():
+    sweep = CaseSweep(
+        make_base(),
+        {
+            "name": "{name}_{image}_cfg{guidance}_{index}",
+            "product": {
+                "inputs.{input_image}": {"values": ["media/red.png", "media/blue.png"], "label": "image"},
+                "overrides.3.inputs.cfg": {"values": [4.5], "label": "guidance"},
+            },
+        },
+    )
+
+    assert [case.name for case in sweep] == ["portrait_red_cfg4.5_1", "portrait_blue_cfg4.5_2"]
+    assert [case.inputs["{input_image}"] for case in sweep] == ["media/red.png", "media/blue.png"]
+
+
+def test_invalid_name_template_fails_when_the_sweep_is_built():
+    with pytest.raises(ValueError, match="name template"):
+        CaseSweep(make_base(), {"name": "{missing}", "product": {"overrides.3.inputs.cfg": [1]}})
+
+
+def test_float_range_is_rounded():
+    axis = SweepAxis.parse("overrides.3.inputs.denoise", {"range": [0.1, 0.4, 0.1]})
+
+    assert axis.values == [0.1, 0.2, 0.3]
+
+
+@pytest.mark.parametrize(
+    "path, spec",
+    [
+        ("seed", [1]),
+        ("text_inputs.6", ["x"]),
+        ("overrides.3.inputs.seed", []),
+        ("overrides.3.inputs.seed", {"range": [0, 5, 0]}),
+        ("overrides.3.inputs.seed", {"bogus": 1}),
+    ],
+)
+def test_invalid_axes_are_rejected(path, spec):
+    with pytest.raises(ValueError):
+        SweepAxis.parse(path, spec)
+
+
+def test_glob_and_lines_axes(tmp_path):
+    for name in ("b.png", "a.png"):
+        (tmp_path / name).write_bytes(b"")
+    prompts = tmp_path / "prompts.txt"
+    prompts.write_text("first\n\n  second  \n", encoding="utf-8")
+
+    assert SweepAxis.parse("inputs.{input_image}", {"glob": str(tmp_path / "*.png")}).values == [
+        str(tmp_path / "a.png"), str(tmp_path / "b.png"),
+    ]
+    assert SweepAxis.parse("text_inputs.6.text", {"lines": str(prompts)}).values == ["first", "second"]
+
+
+def test_large_sweep_is_counted_without_building_cases():
+    axis = {"range": [0, 1000]}
+    sweep = CaseSweep(make_base(), {"product": {"overrides.3.inputs.seed": axis, "overrides.3.inputs.steps": axis}})
+
+    assert len(sweep) == 1_000_000
+    first = next(iter(sweep))
+    assert first.name == "portrait_0000001"
+
+
+def test_load_config_streams_sweeps_next_to_plain_entries(tmp_path):
+    config = tmp_path / "config.json"
+    config.write_text(
+        json.dumps(
+            {
+                "workflows": [
+                    {"name": "plain", "workflow_path": "workflow/plain.json"},
+                    {
+                        "name": "swept",
+                        "workflow_path": "workflow/swept.json",
+                        "sweep": {"product": {"overrides.3.inputs.seed": [1, 2, 3]}},
+                    },
+                ]
+            }
+        ),
+        encoding="utf-8",
+    )
+
+    _, _, stream = load_config(config)
+
+    assert isinstance(stream, CaseStream)
+    assert len(stream) == 4
+    assert [case.name for case in stream] == ["plain", "swept_1", "swept_2", "swept_3"]
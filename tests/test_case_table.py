@@ -0,0 +1,152 @@
+from pathlib import Path
+
+import pytest
+
+import case_table
+from batch_workflow_tester import CaseStream, CaseSweep, CaseTable, WorkflowTestCase
+
+
+def make_base(**fields):
+    return WorkflowTestCase(name="portrait", workflow_path=Path("workflow/portrait.json"), **fields)
+
+
+def write_csv(path, text):
+    path.write_text(text, encoding="utf-8")
+    return path
+
+
+def test_rows_become_cases_with_default_column_types(tmp_path):
+    table = write_csv(
+        tmp_path / "cases.csv",
+        "\ufeffimage,prompt,cfg,extra\nmedia/a.png,42,7.5,x\n,,\nmedia/b.png,a cat,,y\n",
+    )
+    source = CaseTable(
+        make_base(overrides={"3.inputs.cfg": 4}),
+        {
+            "path": str(table),
+            "columns": {"image": "inputs.{input_image}", "prompt": "text_inputs.6.text", "cfg": "overrides.3.inputs.cfg"},
+        },
+    )
+
+    cases = list(source)
+
+    assert len(source) == 2
+    assert [case.name for case in cases] == ["portrait_0001", "portrait_0002"]
+    assert cases[0].inputs == {"{input_image}": "media/a.png"}
+    # text_inputs default to raw, so a numeric prompt stays text in a CSV file
+    assert cases[0].text_inputs == {"6": {"text": "42"}}
+    # overrides default to auto: JSON numbers are parsed
+    assert cases[0].overrides == {"3.inputs.cfg": 7.5}
+    # an empty cell keeps the entry's own value
+    assert cases[1].overrides == {"3.inputs.cfg": 4}
+
+
+def test_explicit_types_and_name_template(tmp_path):
+    table = write_csv(tmp_path / "cases.tsv", "id\tsteps\tlora\n7\t20.0\t[\"a\", 1]\n")
+    source = CaseTable(
+        make_base(),
+        {
+            "path": str(table),
+            "name": "{name}_{id}_row{row}",
+            "columns": {
+                "steps": {"to": "overrides.3.inputs.steps", "type": "int"},
+                "lora": {"to": "overrides.4.inputs.lora", "type": "json"},
+            },
+        },
+    )
+
+    (case,) = list(source)
+
+    assert case.name == "portrait_7_row1"
+    assert case.overrides == {"3.inputs.steps": 20, "4.inputs.lora": ["a", 1]}
+
+
+def test_bad_cell_reports_row_and_column(tmp_path):
+    table = write_csv(tmp_path / "cases.csv", "steps\n20\nmany\n")
+    source = CaseTable(make_base(), {"path": str(table), "columns": {"steps": {"to": "overrides.3.inputs.steps", "type": "int"}}})
+
+    with pytest.raises(ValueError, match=r"row 2, column 'steps'"):
+        list(source)
+
+
+@pytest.mark.parametrize(
+    "columns, message",
+    [
+        ({}, "at least one column"),
+        ({"missing": "overrides.3.inputs.seed"}, "Columns not found"),
+        ({"steps": "seed"}, "must start with"),
+        ({"steps": {"to": "overrides.3.inputs.steps", "type": "decimal"}}, "unknown type"),
+    ],
+)
+def test_invalid_column_mappings_are_rejected(tmp_path, columns, message):
+    table = write_csv(tmp_path / "cases.csv", "steps\n20\n")
+
+    with pytest.raises(ValueError, match=message):
+        CaseTable(make_base(), {"path": str(table), "columns": columns})
+
+
+def test_unsupported_format_is_rejected(tmp_path):
+    path = tmp_path / "cases.ods"
+    path.write_bytes(b"")
+
+    with pytest.raises(ValueError, match="Unsupported table format"):
+        case_table.read_header(path)
+
+
+@pytest.mark.parametrize(
+    "value, kind, expected",
+    [
+        ("3", "raw", "3"),
+        (3.0, "str", "3"),
+        ("3.0", "int", 3),
+        ("true", "auto", True),
+        ("a cat", "auto", "a cat"),
+        (5, "auto", 5),
+        ('{"a": 1}', "json", {"a": 1}),
+    ],
+)
+def test_convert(value, kind, expected):
+    assert case_table.convert(value, kind) == expected
+
+
+def test_xlsx_rows_keep_cell_types(tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "cases"
+    sheet.append(["prompt", "seed"])
+    sheet.append([None, None])
+    sheet.append([3.0, 11])
+    path = tmp_path / "cases.xlsx"
+    workbook.save(path)
+
+    rows = list(case_table.iter_rows(path, sheet="cases"))
+    source = CaseTable(
+        make_base(),
+        {"path": str(path), "sheet": "cases", "columns": {"prompt": "text_inputs.6.text", "seed": "overrides.3.inputs.seed"}},
+    )
+
+    assert rows == [(1, {"prompt": 3.0, "seed": 11})]
+    (case,) = list(source)
+    assert case.overrides == {"3.inputs.seed": 11}
+    with pytest.raises(ValueError, match="Sheet 'other' not found"):
+        case_table.read_header(path, sheet="other")
+
+
+def test_stream_counts_known_cases_without_reading_table_rows(tmp_path, monkeypatch):
+    table = write_csv(tmp_path / "cases.csv", "steps\n20\n30\n")
+    stream = CaseStream(
+        [
+            make_base(),
+            CaseSweep(make_base(), {"product": {"overrides.3.inputs.seed": [1, 2, 3]}}),
+            CaseTable(make_base(), {"path": str(table), "columns": {"steps": "overrides.3.inputs.steps"}}),
+        ]
+    )
+
+    def fail(*args, **kwargs):
+        raise AssertionError("table rows were read")
+
+    monkeypatch.setattr(case_table, "iter_rows", fail)
+    assert stream.count_known() == (4, 1)
+    monkeypatch.undo()
+    assert len(stream) == 6
@@ -0,0 +1,174 @@
+import asyncio
+import hashlib
+
+import pytest
+from aiohttp import web
+
+from batch_workflow_tester import AsyncComfyAPIClient, ComfyHTTPError, list_outputs
+from benchmarks.fake_comfy import FakeComfyServer, FakeSettings
+from upload_cache import UploadCache
+
+
+PROMPT = {
+    "1": {"class_type": "LoadImage", "inputs": {"image": "input.png"}},
+    "9": {"class_type": "SaveImage", "inputs": {"images": ["1", 0]}},
+}
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def wait_for(condition, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not reached in time"
+        await asyncio.sleep(0.01)
+
+
+class FlakyDownloads(FakeComfyServer):
+    """Answers the first request for every output with a 503."""
+
+    def __init__(self, settings):
+        super().__init__(settings)
+        self.view_attempts = {}
+
+    async def view(self, request):
+        name = request.query.get("filename", "")
+        if request.method == "GET" and request.query.get("type") != "input":
+            self.view_attempts[name] = self.view_attempts.get(name, 0) + 1
+            if self.view_attempts[name] == 1:
+                raise web.HTTPServiceUnavailable()
+        return await super().view(request)
+
+
+class UnreachableSocket(FakeComfyServer):
+    """Can refuse websocket connections to simulate a network outage."""
+
+    refuse = False
+
+    async def websocket(self, request):
+        if self.refuse:
+            raise web.HTTPServiceUnavailable()
+        return await super().websocket(request)
+
+
+def test_execute_prompt_streams_outputs_with_checksums(fake_comfy, tmp_path):
+    async def scenario():
+        async with fake_comfy(FakeSettings(latency=0.05, outputs=2, output_size=64 * 1024)) as (server, url):
+            async with AsyncComfyAPIClient(url, timeout=10) as client:
+                prompt_id, history = await client.execute_prompt(PROMPT)
+                outputs = await client.collect_outputs(history, tmp_path, compute_sha256=True)
+        assert server.prompts[prompt_id].status == "success"
+        assert [asset.filename for asset in outputs] == [asset.filename for asset in list_outputs(history)]
+        for asset in outputs:
+            data = asset.path.read_bytes()
+            assert asset.size == len(data) == server.output_size
+            assert asset.sha256 == hashlib.sha256(data).hexdigest()
+        assert not list(tmp_path.glob("*.part"))
+
+    run(scenario())
+
+
+def test_collect_outputs_retries_server_errors_and_keeps_order(fake_comfy, tmp_path):
+    async def scenario():
+        async with fake_comfy(FakeSettings(latency=0.05, outputs=5, output_size=1024), FlakyDownloads) as (server, url):
+            async with AsyncComfyAPIClient(url, timeout=10) as client:
+                _, history = await client.execute_prompt(PROMPT)
+                outputs = await client.collect_outputs(history, tmp_path, concurrency=4)
+        assert [asset.filename for asset in outputs] == [asset.filename for asset in list_outputs(history)]
+        assert all(asset.path.exists() for asset in outputs)
+        assert set(server.view_attempts.values()) == {2}
+
+    run(scenario())
+
+
+def test_collect_outputs_does_not_retry_missing_files(fake_comfy, tmp_path):
+    async def scenario():
+        async with fake_comfy() as (server, url):
+            async with AsyncComfyAPIClient(url, timeout=10) as client:
+                prompt_id, history = await client.execute_prompt(PROMPT)
+                server.prompts[prompt_id].filenames = []
+                with pytest.raises(ComfyHTTPError) as excinfo:
+                    await client.collect_outputs(history, tmp_path)
+        assert excinfo.value.status == 404
+        assert not list(tmp_path.iterdir())
+
+    run(scenario())
+
+
+def test_concurrent_prompts_share_one_websocket(fake_comfy):
+    async def scenario():
+        async with fake_comfy(FakeSettings(latency=0.1, workers=3)) as (server, url):
+            async with AsyncComfyAPIClient(url, timeout=10) as client:
+                results = await asyncio.gather(*(client.execute_prompt(PROMPT) for _ in range(3)))
+                assert list(server.sockets) == [client.client_id]
+        assert len({prompt_id for prompt_id, _ in results}) == 3
+        assert all(server.prompts[prompt_id].status == "success" for prompt_id, _ in results)
+
+    run(scenario())
+
+
+def test_prompt_finishing_while_disconnected_is_reconciled(fake_comfy):
+    async def scenario():
+        async with fake_comfy(FakeSettings(latency=0.2), UnreachableSocket) as (server, url):
+            async with AsyncComfyAPIClient(url, timeout=10) as client:
+                task = asyncio.ensure_future(client.execute_prompt(PROMPT))
+                await wait_for(lambda: server.running)
+                prompt_id = server.running[0]
+                server.refuse = True
+                await server.sockets[client.client_id].close()
+                # The completion event is sent while nobody listens; only /history can tell.
+                await wait_for(lambda: server.prompts[prompt_id].status == "success")
+                server.refuse = False
+                finished_id, history = await asyncio.wait_for(task, 10)
+        assert finished_id == prompt_id
+        assert history["status"]["completed"] is True
+
+    run(scenario())
+
+
+def test_cancel_withdraws_queued_and_running_prompts(fake_comfy):
+    async def scenario():
+        async with fake_comfy(FakeSettings(latency=10.0, workers=1)) as (server, url):
+            async with AsyncComfyAPIClient(url, timeout=10) as client:
+                tasks = [asyncio.ensure_future(client.execute_prompt(PROMPT)) for _ in range(2)]
+                await wait_for(lambda: len(server.running) == 1 and len(server.pending) == 1)
+                running, pending = server.running[0], server.pending[0]
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                assert server.interrupted == {running}
+                assert server.prompts[pending].status == "cancelled"
+                assert not server.pending
+
+    run(scenario())
+
+
+def test_upload_cache_skips_known_files_and_revalidates(fake_comfy, tmp_path):
+    source = tmp_path / "input.png"
+    source.write_bytes(b"pixels" * 100)
+    cache = UploadCache(tmp_path / "uploads.json", flush_delay=0)
+
+    async def scenario():
+        async with fake_comfy() as (server, url):
+            async with AsyncComfyAPIClient(url, timeout=10, upload_cache=cache) as client:
+                names = await asyncio.gather(*(client.upload_file(source) for _ in range(3)))
+            assert len(set(names)) == 1 and len(server.uploads) == 1
+
+            async with AsyncComfyAPIClient(url, timeout=10, upload_cache=cache) as client:
+                assert await client.upload_file(source) == names[0]
+            assert len(server.uploads) == 1
+
+            # Entries older than revalidate_after are checked with HEAD /view first.
+            cache.revalidate_after = 0
+            async with AsyncComfyAPIClient(url, timeout=10, upload_cache=cache) as client:
+                assert await client.upload_file(source) == names[0]
+                assert len(server.uploads) == 1
+                server.inputs.clear()
+                assert await client.upload_file(source) == names[0]
+            assert len(server.uploads) == 2
+
+    run(scenario())
+    reloaded = UploadCache(tmp_path / "uploads.json")
+    assert len(reloaded) == 1
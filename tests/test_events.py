@@ -0,0 +1,77 @@
+import asyncio
+import threading
+
+from webapp.events import JobEventBus, format_event, job_event, stream_events
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_subscriber_receives_hello_then_published_events():
+    async def scenario():
+        bus = JobEventBus()
+        bus.publish("job", job_event("batch", "old"))
+        async with bus.subscribe() as subscription:
+            hello = await subscription.get(1)
+            # Events are published from worker threads.
+            thread = threading.Thread(target=bus.publish, args=("job", job_event("batch", "j1", status="running")))
+            thread.start()
+            thread.join()
+            message = await subscription.get(1)
+            assert bus.subscriber_count() == 1
+        assert bus.subscriber_count() == 0
+        return hello, message
+
+    hello, message = run(scenario())
+    assert hello == format_event("hello", {"sequence": 1}, 1)
+    assert message == format_event("job", {"kind": "batch", "id": "j1", "status": "running"}, 2)
+
+
+def test_backlog_overflow_is_replaced_by_resync():
+    async def scenario():
+        bus = JobEventBus(max_pending=3)
+        async with bus.subscribe() as subscription:
+            for index in range(5):
+                bus.publish("job", job_event("batch", f"j{index}"))
+            await settle()
+            messages = []
+            while (message := await subscription.get(0.01)) is not None:
+                messages.append(message)
+        return messages
+
+    messages = run(scenario())
+    # hello + j0 + j1 fill the queue; j2 flushes it into a resync, then j3 and j4 follow.
+    assert messages[0] == format_event("resync", {"reason": "overflow"})
+    assert [message.split("\n")[0] for message in messages[1:]] == ["id: 4", "id: 5"]
+
+
+def test_stream_sends_heartbeats_and_ends_when_bus_closes():
+    async def scenario():
+        bus = JobEventBus()
+        stream = stream_events(bus, heartbeat=0.01)
+        chunks = [await stream.__anext__() for _ in range(3)]
+        bus.close()
+        rest = [chunk async for chunk in stream]
+        return bus, chunks, rest
+
+    bus, chunks, rest = run(scenario())
+    assert chunks[0] == "retry: 3000\n\n"
+    assert chunks[1].startswith("id: 0\nevent: hello")
+    assert chunks[2] == ": ping\n\n"
+    assert all(chunk == ": ping\n\n" for chunk in rest)
+    assert bus.subscriber_count() == 0
+
+
+def test_subscribing_after_close_ends_immediately():
+    async def scenario():
+        bus = JobEventBus()
+        bus.close()
+        return [chunk async for chunk in stream_events(bus, heartbeat=0.01)]
+
+    assert run(scenario()) == ["retry: 3000\n\n"]
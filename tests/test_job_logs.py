@@ -0,0 +1,120 @@
+import pytest
+
+from webapp.job_store import JobStore
+from webapp.jobs import LOG_TAIL_SIZE, JobLog, JobManager
+
+
+def test_job_log_keeps_a_tail_and_numbers_every_line():
+    log = JobLog(size=3)
+    seqs = [log.append(f"line {index}") for index in range(5)]
+
+    assert seqs == [0, 1, 2, 3, 4]
+    assert len(log) == 5
+    assert log.offset == 2
+    assert log.lines() == ["line 2", "line 3", "line 4"]
+    assert log.last == "line 4"
+    assert log.to_dict() == {"logs": ["line 2", "line 3", "line 4"], "log_count": 5, "log_offset": 2}
+
+
+def test_job_log_cursor():
+    log = JobLog(size=3)
+    for index in range(5):
+        log.append(f"line {index}")
+
+    assert log.since(3) == ["line 3", "line 4"]
+    assert log.since(5) == []
+    assert log.since(9) == []
+    # Lines before the tail are no longer in memory.
+    assert log.since(1) is None
+
+
+def test_job_log_restored_from_a_tail():
+    log = JobLog(["line 8", "line 9"], total=10)
+
+    assert log.offset == 8
+    assert log.append("line 10") == 10
+    assert log.since(8) == ["line 8", "line 9", "line 10"]
+
+
+def test_read_logs_pages_from_memory_and_falls_back_to_the_store(job_manager, make_job):
+    job = make_job(job_manager)
+    total = LOG_TAIL_SIZE + 50
+    for index in range(total):
+        job_manager.append_log(job.identifier, f"line {index}")
+
+    recent, count = job_manager.read_logs(job.identifier, since=total - 2)
+    assert (recent, count) == (["line 248", "line 249"], total)
+
+    # The first lines left the in-memory tail; they are read back from SQLite.
+    early, count = job_manager.read_logs(job.identifier, since=10, limit=3)
+    assert (early, count) == (["line 10", "line 11", "line 12"], total)
+
+    everything, _ = job_manager.read_logs(job.identifier)
+    assert everything == [f"line {index}" for index in range(total)]
+
+
+def test_read_logs_of_an_unknown_job(job_manager):
+    with pytest.raises(KeyError):
+        job_manager.read_logs("missing")
+
+
+def test_summary_stays_compact(job_manager, make_job):
+    job = make_job(job_manager)
+    for index in range(LOG_TAIL_SIZE * 2):
+        job_manager.append_log(job.identifier, f"line {index}")
+
+    summary = job_manager.get(job.identifier).to_summary()
+
+    assert summary["log_count"] == LOG_TAIL_SIZE * 2
+    assert summary["last_log"] == f"line {LOG_TAIL_SIZE * 2 - 1}"
+    assert "logs" not in summary and "results" not in summary
+
+
+def test_log_tail_is_restored_after_a_restart(tmp_path, make_job):
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    manager = JobManager(store)
+    job = make_job(manager)
+    for index in range(LOG_TAIL_SIZE + 5):
+        manager.append_log(job.identifier, f"line {index}")
+    manager.mark_finished(job.identifier, [])
+    store.close()
+
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    try:
+        restored = JobManager(store).get(job.identifier)
+        assert restored.status == "finished"
+        assert restored.logs.total == LOG_TAIL_SIZE + 5
+        assert restored.logs.offset == 5
+        assert restored.logs.last == f"line {LOG_TAIL_SIZE + 4}"
+        assert JobManager(store).read_logs(job.identifier, since=0, limit=2) == (["line 0", "line 1"], LOG_TAIL_SIZE + 5)
+    finally:
+        store.close()
+
+
+def test_listed_jobs_load_only_the_last_log_line(tmp_path, make_job):
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    manager = JobManager(store)
+    quiet = make_job(manager)
+    busy = make_job(manager)
+    for index in range(LOG_TAIL_SIZE + 5):
+        manager.append_log(busy.identifier, f"line {index}")
+    manager.mark_finished(busy.identifier, [])
+    manager.mark_finished(quiet.identifier, [])
+    store.close()
+
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    try:
+        assert store.log_summaries([busy.identifier, quiet.identifier, "missing"]) == {
+            busy.identifier: (LOG_TAIL_SIZE + 5, [f"line {LOG_TAIL_SIZE + 4}"]),
+            quiet.identifier: (0, []),
+            "missing": (0, []),
+        }
+        manager = JobManager(store)
+        summaries = {job.identifier: job.to_summary() for job in manager.query_jobs()[0]}
+        assert summaries[busy.identifier]["log_count"] == LOG_TAIL_SIZE + 5
+        assert summaries[busy.identifier]["last_log"] == f"line {LOG_TAIL_SIZE + 4}"
+        assert summaries[quiet.identifier]["last_log"] is None
+        # get still loads the full tail.
+        assert len(manager.get(busy.identifier).logs.lines()) == LOG_TAIL_SIZE
+    finally:
+        store.close()
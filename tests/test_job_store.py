@@ -0,0 +1,145 @@
+import json
+
+from webapp.job_store import JobStore
+from webapp.jobs import JobManager
+
+
+def write_run(output_root, name, workflow_path):
+    run_dir = output_root / name / "20240101-000000"
+    run_dir.mkdir(parents=True)
+    metadata = run_dir / "run_metadata.json"
+    metadata.write_text(
+        json.dumps({"case_name": name, "workflow_path": str(workflow_path), "status": {"status_str": "success"}}),
+        encoding="utf-8",
+    )
+    return metadata
+
+
+def reopen(store, path):
+    store.close()
+    return JobStore(path)
+
+
+def test_jobs_survive_a_restart(tmp_path, make_job):
+    path = tmp_path / "jobs.sqlite3"
+    store = JobStore(path)
+    manager = JobManager(store)
+    job = make_job(manager, ["group/a.json", "group/b.json"])
+    manager.mark_running(job.identifier)
+    manager.record_result(job.identifier, {"name": "a", "status": "success", "metadata_file": ""})
+    manager.mark_finished(job.identifier, [{"name": "a", "status": "success"}])
+
+    store = reopen(store, path)
+    try:
+        manager = JobManager(store)
+        restored = manager.get(job.identifier)
+        assert restored.status == "finished"
+        assert restored.workflow_ids == ["group/a.json", "group/b.json"]
+        assert [job.identifier for job in manager.query_jobs(workflow_id="group/b.json")[0]] == [job.identifier]
+        assert manager.query_jobs(workflow_id="group/c.json") == ([], 0)
+    finally:
+        store.close()
+
+
+def test_cancelled_job_keeps_its_artifacts_after_a_restart(tmp_path, make_job):
+    path = tmp_path / "jobs.sqlite3"
+    store = JobStore(path)
+    manager = JobManager(store)
+    job = make_job(manager)
+    manager.mark_running(job.identifier)
+    manager.record_result(job.identifier, {"name": "a", "status": "success", "saved_files": [str(tmp_path / "a.png")]})
+    manager.mark_cancelled(job.identifier, "用户取消")
+    artifacts = [artifact.to_dict(job.identifier) for artifact in manager.get(job.identifier).artifacts]
+
+    store = reopen(store, path)
+    try:
+        restored = JobManager(store).get(job.identifier)
+        assert restored.status == "cancelled"
+        assert [artifact.to_dict(job.identifier) for artifact in restored.artifacts] == artifacts
+        assert [artifact.filename for artifact in restored.artifacts] == ["a.png"]
+    finally:
+        store.close()
+
+
+def test_unfinished_jobs_fail_at_startup(tmp_path, make_job):
+    path = tmp_path / "jobs.sqlite3"
+    store = JobStore(path)
+    manager = JobManager(store)
+    running = make_job(manager)
+    manager.mark_running(running.identifier)
+    done = make_job(manager)
+    manager.mark_finished(done.identifier, [])
+    store.flush()
+
+    store = reopen(store, path)
+    try:
+        assert store.fail_unfinished("服务重启") == 1
+        manager = JobManager(store)
+        assert manager.get(running.identifier).status == "failed"
+        assert manager.get(running.identifier).error == "服务重启"
+        assert manager.get(done.identifier).status == "finished"
+    finally:
+        store.close()
+
+
+def test_backfill_imports_each_run_once_with_relative_workflow_ids(tmp_path, job_manager):
+    output_root = tmp_path / "output"
+    workflow_root = tmp_path / "workflow"
+    write_run(output_root, "portrait", workflow_root / "group" / "a.json")
+    write_run(output_root, "elsewhere", tmp_path / "other" / "b.json")
+
+    assert job_manager.backfill(output_root, workflow_root) == 2
+    assert job_manager.backfill(output_root, workflow_root) == 0
+
+    jobs, total = job_manager.query_jobs(workflow_id="group/a.json")
+    assert total == 1 and jobs[0].status == "finished"
+    # Workflows outside the workflow root keep their recorded path.
+    assert job_manager.query_jobs(workflow_id=str(tmp_path / "other" / "b.json"))[1] == 1
+
+
+def test_backfill_skips_runs_of_failed_and_interrupted_jobs(tmp_path, make_job):
+    path = tmp_path / "jobs.sqlite3"
+    output_root = tmp_path / "output"
+    workflow = tmp_path / "workflow" / "a.json"
+    store = JobStore(path)
+    manager = JobManager(store)
+
+    failed = make_job(manager)
+    manager.record_result(failed.identifier, {"name": "a", "status": "success", "metadata_file": str(write_run(output_root, "a", workflow))})
+    manager.mark_failed(failed.identifier, "boom")
+
+    interrupted = make_job(manager)
+    manager.mark_running(interrupted.identifier)
+    manager.record_result(
+        interrupted.identifier, {"name": "b", "status": "success", "metadata_file": str(write_run(output_root, "b", workflow))}
+    )
+
+    store = reopen(store, path)
+    try:
+        store.fail_unfinished("服务重启")
+        assert JobManager(store).backfill(output_root) == 0
+    finally:
+        store.close()
+
+
+def test_interrupted_runs_are_recorded_even_if_only_the_job_row_was_written(tmp_path, make_job):
+    path = tmp_path / "jobs.sqlite3"
+    output_root = tmp_path / "output"
+    store = JobStore(path)
+    manager = JobManager(store)
+    job = make_job(manager)
+    manager.mark_running(job.identifier)
+    manager.record_result(
+        job.identifier, {"name": "a", "status": "success", "metadata_file": str(write_run(output_root, "a", tmp_path / "a.json"))}
+    )
+    store.flush()
+    # The process stopped before the run file reached the run_files table.
+    with store._conn:
+        store._conn.execute("DELETE FROM run_files")
+
+    store = reopen(store, path)
+    try:
+        store.fail_unfinished("服务重启")
+        assert JobManager(store).backfill(output_root) == 0
+    finally:
+        store.close()
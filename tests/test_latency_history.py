@@ -0,0 +1,106 @@
+import json
+
+import pytest
+
+from latency_history import LatencyHistory, LatencySample, mann_whitney_greater, percentile
+
+
+def sample(seconds, *, workflow="portrait", digest="v1", server="http://a", at=0.0):
+    return LatencySample(
+        workflow=workflow, workflow_hash=digest, server=server, recorded_at=at, total=seconds, stages={"execution": seconds}
+    )
+
+
+def record(history, values, *, digest="v1", start=0.0):
+    for offset, seconds in enumerate(values):
+        history.record(sample(seconds, digest=digest, at=start + offset))
+
+
+def test_percentile_interpolates():
+    assert percentile([4, 1, 3, 2], 50) == 2.5
+    assert percentile([1, 2, 3, 4, 5], 95) == 4.8
+    assert percentile([7], 95) == 7
+
+
+def test_mann_whitney_detects_a_shift_and_ignores_noise():
+    assert mann_whitney_greater([20, 21, 22, 23, 24], [10, 11, 12, 13, 14]) < 0.01
+    assert mann_whitney_greater([10, 11, 12, 13, 14], [20, 21, 22, 23, 24]) > 0.99
+    assert mann_whitney_greater([5, 5, 5], [5, 5, 5]) == 1.0
+
+
+def test_slower_template_version_is_flagged():
+    history = LatencyHistory(None)
+    record(history, [10, 10.5, 9.5, 10.2, 9.8], digest="v1")
+    record(history, [15, 15.5, 14.5, 15.2, 14.8], digest="v2", start=100)
+
+    (report,) = history.report()
+
+    assert report.workflow_hash == "v2"
+    assert (report.baseline, report.baseline_hash, report.baseline_count) == ("previous_version", "v1", 5)
+    assert report.change == pytest.approx(0.5, abs=0.01)
+    assert report.p_value < 0.05
+    assert report.regression
+
+
+def test_recent_runs_are_compared_with_earlier_runs_of_the_same_version():
+    history = LatencyHistory(None)
+    record(history, [10, 10.5, 9.5, 10.2, 9.8, 15, 15.5, 14.5])
+
+    (report,) = history.report(window=3)
+
+    assert report.baseline == "earlier_runs"
+    assert (report.count, report.baseline_count) == (3, 5)
+    assert report.regression
+
+
+def test_too_few_samples_are_not_tested():
+    history = LatencyHistory(None)
+    record(history, [10, 10, 10], digest="v1")
+    record(history, [20, 20], digest="v2", start=100)
+
+    (report,) = history.report(min_samples=3)
+
+    assert report.change == 1.0
+    assert report.p_value is None
+    assert not report.regression
+
+
+def test_small_slowdowns_are_not_flagged():
+    history = LatencyHistory(None)
+    record(history, [10.0, 10.1, 10.2, 10.3, 10.4], digest="v1")
+    record(history, [10.5, 10.6, 10.7, 10.8, 10.9], digest="v2", start=100)
+
+    (strict,) = history.report(min_slowdown=0.1)
+    (loose,) = history.report(min_slowdown=0.02)
+
+    assert strict.p_value < 0.05 and not strict.regression
+    assert loose.regression
+
+
+def test_samples_are_appended_on_flush_and_reloaded(tmp_path):
+    path = tmp_path / "history.jsonl"
+    history = LatencyHistory(path, flush_delay=60)
+    assert history.record_result(
+        {"name": "portrait", "status": "success", "workflow_hash": "v1", "server": "http://a", "timings": {"total": 3.0}}
+    )
+    assert not history.record_result({"name": "portrait", "status": "success", "cached": True, "timings": {}})
+    assert not path.exists()
+
+    history.flush()
+    record(history, [4.0])
+    history.flush()
+
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 2
+    assert sorted(item.total for item in LatencyHistory(path).samples()) == [3.0, 4.0]
+
+
+def test_load_compacts_a_file_with_mostly_dropped_samples(tmp_path):
+    path = tmp_path / "history.jsonl"
+    lines = [json.dumps(sample(float(index), at=float(index)).to_dict()) for index in range(10)]
+    path.write_text("\n".join(lines + ["not json"]) + "\n", encoding="utf-8")
+
+    history = LatencyHistory(path, max_samples=4)
+
+    kept = [json.loads(line)["total"] for line in path.read_text(encoding="utf-8").splitlines()]
+    assert kept == [6.0, 7.0, 8.0, 9.0]
+    assert [item.total for item in history.samples()] == kept
@@ -0,0 +1,32 @@
+import pytest
+
+from metrics import Counter, Histogram, Metric, Registry
+
+
+def test_incomplete_metric_fails_at_construction():
+    class Incomplete(Metric):
+        def _clear(self):
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete("comfy_incomplete", "no samples", registry=None)
+
+
+def test_registry_renders_counters_and_histograms():
+    registry = Registry()
+    runs = Counter("comfy_test_runs_total", "Runs.", ["status"], registry=registry)
+    seconds = Histogram("comfy_test_seconds", "Run time.", buckets=(1.0, 5.0), registry=registry)
+    runs.inc(status="success")
+    runs.inc(2, status="failed")
+    seconds.observe(0.5)
+    seconds.observe(3.0)
+
+    text = registry.render()
+
+    assert '# TYPE comfy_test_runs_total counter' in text
+    assert 'comfy_test_runs_total{status="failed"} 2' in text
+    assert 'comfy_test_seconds_bucket{le="1"} 1' in text
+    assert 'comfy_test_seconds_bucket{le="+Inf"} 2' in text
+    assert "comfy_test_seconds_count 2" in text
+    runs.clear()
+    assert "comfy_test_runs_total{" not in registry.render()
@@ -0,0 +1,114 @@
+import json
+import shutil
+
+import pytest
+from fastapi import FastAPI, Request
+
+from webapp.payload_cache import PayloadCache, encode_payload, etag_matches, payload_response
+from webapp.workflow_store import WorkflowStore
+
+
+def test_encoded_body_and_strong_etag():
+    payload = encode_payload({"name": "工作流", "count": 2})
+
+    assert json.loads(payload.body) == {"name": "工作流", "count": 2}
+    assert payload.body == '{"name":"工作流","count":2}'.encode("utf-8")
+    assert payload.etag.startswith('"') and payload.etag.endswith('"') and not payload.etag.startswith('W/')
+    assert encode_payload({"name": "工作流", "count": 2}).etag == payload.etag
+    assert encode_payload({"name": "工作流", "count": 3}).etag != payload.etag
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (None, False),
+        ("", False),
+        ('"abc"', True),
+        ('W/"abc"', True),
+        ('"other", W/"abc"', True),
+        ("*", True),
+        ('"abcd"', False),
+        ("abc", False),
+    ],
+)
+def test_if_none_match_uses_weak_comparison(header, expected):
+    assert etag_matches(header, '"abc"') is expected
+
+
+def test_cache_rebuilds_only_when_the_key_changes():
+    cache = PayloadCache()
+    builds = []
+
+    def build():
+        builds.append(1)
+        return {"builds": len(builds)}
+
+    first = cache.get("tree", 1, build)
+    assert cache.get("tree", 1, build) is first
+    assert json.loads(cache.get("tree", 2, build).body) == {"builds": 2}
+    cache.invalidate("tree")
+    assert json.loads(cache.get("tree", 2, build).body) == {"builds": 3}
+    cache.get("groups", 2, build)
+    cache.invalidate()
+    cache.get("groups", 2, build)
+    assert len(builds) == 5
+
+
+@pytest.fixture
+def client_and_state():
+    testclient = pytest.importorskip("fastapi.testclient")
+    app = FastAPI()
+    cache = PayloadCache()
+    state = {"generation": 1}
+
+    @app.get("/payload")
+    async def get_payload(request: Request):
+        generation = state["generation"]
+        return payload_response(request, cache.get("payload", generation, lambda: {"generation": generation}))
+
+    with testclient.TestClient(app) as test_client:
+        yield test_client, state
+
+
+def test_conditional_get(client_and_state):
+    client, state = client_and_state
+    response = client.get("/payload")
+    etag = response.headers["etag"]
+
+    assert response.status_code == 200
+    assert response.json() == {"generation": 1}
+    assert response.headers["cache-control"] == "no-cache"
+
+    for header in (etag, f"W/{etag}", f'"stale", {etag}'):
+        not_modified = client.get("/payload", headers={"If-None-Match": header})
+        assert not_modified.status_code == 304
+        assert not_modified.content == b""
+        assert not_modified.headers["etag"] == etag
+
+    state["generation"] = 2
+    changed = client.get("/payload", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json() == {"generation": 2}
+    assert changed.headers["etag"] != etag
+
+
+def test_directory_changes_move_the_generation(tmp_path):
+    root = tmp_path / "workflow"
+    (root / "group").mkdir(parents=True)
+    (root / "group" / "a.json").write_text(json.dumps({"1": {"class_type": "SaveImage", "inputs": {"filename_prefix": "x"}}}))
+    store = WorkflowStore(root)
+    generation = store.generation
+
+    assert store.refresh() is False
+    (root / "empty").mkdir()
+    assert store.refresh() is True and store.generation == generation + 1
+
+    # Event-driven sync of a folder moved outside the app.
+    shutil.move(root / "empty", root / "renamed")
+    changes = store.scan([root / "empty", root / "renamed"])
+    assert changes.directories == {"empty": False, "renamed": True}
+    assert store.apply(changes) is True and store.generation == generation + 2
+
+    (root / "renamed").rmdir()
+    assert store.refresh() is True and store.generation == generation + 3
+    assert [info.identifier for info in store.list_workflows()] == ["group/a.json"]
@@ -0,0 +1,175 @@
+import asyncio
+
+import pytest
+
+from webapp.scheduler import JobScheduler
+
+
+class Recorder:
+    """Runners that log when they start and block until released."""
+
+    def __init__(self):
+        self.started = []
+        self.cancelled = {}
+        self.gates = {}
+
+    def runner(self, job_id):
+        gate = self.gates[job_id] = asyncio.Event()
+
+        async def run():
+            self.started.append(job_id)
+            await gate.wait()
+
+        return run
+
+    def on_cancel(self, job_id):
+        return lambda reason: self.cancelled.setdefault(job_id, reason)
+
+    def submit(self, scheduler, job_id, *, servers=("http://a",), priority=0):
+        return scheduler.submit(
+            job_id, self.runner(job_id), servers=servers, priority=priority, on_cancel=self.on_cancel(job_id)
+        )
+
+    async def finish(self, job_id):
+        self.gates[job_id].set()
+        await settle()
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_higher_priority_runs_first_and_ties_are_fifo():
+    async def scenario():
+        scheduler = JobScheduler(max_jobs=1)
+        recorder = Recorder()
+        assert recorder.submit(scheduler, "first") is None
+        assert recorder.submit(scheduler, "low-1") == 0
+        assert recorder.submit(scheduler, "low-2") == 1
+        assert recorder.submit(scheduler, "high", priority=5) == 0
+        assert scheduler.snapshot()["queued"] == ["high", "low-1", "low-2"]
+        await settle()
+        for job_id in ("first", "high", "low-1", "low-2"):
+            await recorder.finish(job_id)
+        assert recorder.started == ["first", "high", "low-1", "low-2"]
+        assert scheduler.snapshot()["running"] == []
+
+    run(scenario())
+
+
+def test_busy_server_lets_jobs_for_other_servers_start():
+    async def scenario():
+        scheduler = JobScheduler(max_jobs=3, max_jobs_per_server=1)
+        recorder = Recorder()
+        recorder.submit(scheduler, "a-1", servers=["http://a/"])
+        recorder.submit(scheduler, "a-2", servers=["http://a"], priority=9)
+        recorder.submit(scheduler, "b-1", servers=["http://b"])
+        await settle()
+        assert recorder.started == ["a-1", "b-1"]
+        assert scheduler.snapshot()["server_load"] == {"http://a": 1, "http://b": 1}
+        await recorder.finish("a-1")
+        assert recorder.started == ["a-1", "b-1", "a-2"]
+        await scheduler.close("测试结束")
+
+    run(scenario())
+
+
+def test_max_jobs_limits_concurrency():
+    async def scenario():
+        scheduler = JobScheduler(max_jobs=2, max_jobs_per_server=5)
+        recorder = Recorder()
+        for job_id in ("1", "2", "3"):
+            recorder.submit(scheduler, job_id)
+        await settle()
+        assert sorted(scheduler.snapshot()["running"]) == ["1", "2"]
+        assert scheduler.position("3") == 0
+        await scheduler.close("测试结束")
+
+    run(scenario())
+
+
+def test_cancel_queued_job_notifies_at_once():
+    async def scenario():
+        scheduler = JobScheduler(max_jobs=1)
+        recorder = Recorder()
+        recorder.submit(scheduler, "running")
+        recorder.submit(scheduler, "queued")
+        assert scheduler.cancel("queued", "用户取消") == "queued"
+        assert recorder.cancelled == {"queued": "用户取消"}
+        assert scheduler.position("queued") is None
+        assert scheduler.cancel("missing", "用户取消") is None
+        await recorder.finish("running")
+        assert "queued" not in recorder.started
+
+    run(scenario())
+
+
+def test_cancel_running_job_notifies_after_it_exits_and_frees_the_slot():
+    async def scenario():
+        scheduler = JobScheduler(max_jobs=1)
+        recorder = Recorder()
+        recorder.submit(scheduler, "running")
+        recorder.submit(scheduler, "next")
+        await settle()
+        assert scheduler.cancel("running", "用户取消") == "running"
+        # A second cancel keeps the first reason.
+        assert scheduler.cancel("running", "再次取消") == "running"
+        assert recorder.cancelled == {}
+        await settle()
+        assert recorder.cancelled == {"running": "用户取消"}
+        assert recorder.started == ["running", "next"]
+        await scheduler.close("测试结束")
+
+    run(scenario())
+
+
+def test_job_cancelled_before_it_starts_running_is_reported():
+    async def scenario():
+        scheduler = JobScheduler(max_jobs=1)
+        recorder = Recorder()
+        recorder.submit(scheduler, "job")
+        # The task exists but has not entered its coroutine yet.
+        assert scheduler.cancel("job", "用户取消") == "running"
+        await settle()
+        assert recorder.started == []
+        assert recorder.cancelled == {"job": "用户取消"}
+        assert scheduler.snapshot()["server_load"] == {}
+
+    run(scenario())
+
+
+def test_failed_job_frees_its_slot():
+    async def scenario():
+        scheduler = JobScheduler(max_jobs=1)
+        recorder = Recorder()
+
+        async def broken():
+            raise RuntimeError("boom")
+
+        scheduler.submit("broken", broken, servers=["http://a"])
+        recorder.submit(scheduler, "next")
+        await settle()
+        assert recorder.started == ["next"]
+        await scheduler.close("测试结束")
+
+    run(scenario())
+
+
+def test_close_cancels_queued_and_running_jobs():
+    async def scenario():
+        scheduler = JobScheduler(max_jobs=1)
+        recorder = Recorder()
+        recorder.submit(scheduler, "running")
+        recorder.submit(scheduler, "queued")
+        await settle()
+        await scheduler.close("服务关闭")
+        assert recorder.cancelled == {"queued": "服务关闭", "running": "服务关闭"}
+        with pytest.raises(RuntimeError):
+            recorder.submit(scheduler, "late")
+
+    run(scenario())
@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from batch_workflow_tester import WorkflowTemplate
+from benchmarks.analyzer import make_graph, multi_pass, single_pass
+from result_cache import prompt_key
+from webapp.workflow_store import WorkflowParser, analyze_workflow
+
+
+EDGE_CASES = {
+    "nested placeholders": {
+        "1": {
+            "class_type": "LoadImage",
+            "inputs": {"image": "{input_image_L}", "batch": [["input_mask", 0], {"deep": ["{input_audio}"]}]},
+            "_meta": {"title": "Load"},
+        },
+        "2": {"class_type": "LoadImage", "inputs": {"image": "input_image_l"}, "_meta": {"title": "Load"}},
+        "3": {"class_type": "Note", "inputs": {"text": "not {input_x} a placeholder"}},
+    },
+    "prompt fields": {
+        "6": {"class_type": "CLIPTextEncode", "inputs": {"Text": "a cat", "prompt": "a dog", "text_b": "x"}, "_meta": {"title": "Pos"}},
+        "7": {"class_type": "CLIPTextEncode", "inputs": {"text": "untitled", "prompt": 3}},
+        "8": {"inputs": {"text": "no class"}},
+    },
+    "video outputs": {
+        "9": {"class_type": "SaveAnimated", "inputs": {"filename_prefix": "a", "options": {"VIDEO_codec": "h264"}}},
+        "10": {"class_type": "SaveAnything", "inputs": {"save_output": True, "format": "Video/MP4"}},
+        "11": {"class_type": "SaveAudio", "inputs": {"filename_prefix": "b", "links": [["4", 0]]}},
+        "12": {"class_type": "PreviewImage", "inputs": {"save_output": False, "images": ["8", 0]}},
+    },
+    "malformed nodes": {
+        "1": "not a node",
+        "2": {"class_type": "SaveImage", "inputs": ["filename_prefix"]},
+        "3": {"class_type": "SaveImage", "inputs": {"filename_prefix": "x"}, "_meta": "title"},
+        "4": {"class_type": 5, "inputs": {}},
+        "5": {},
+    },
+}
+
+
+@pytest.mark.parametrize("name", sorted(EDGE_CASES))
+def test_matches_multi_pass_analysis_on_edge_cases(name):
+    graph = json.loads(json.dumps(EDGE_CASES[name]))
+
+    assert single_pass(graph) == multi_pass(graph)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_multi_pass_analysis_on_generated_graphs(seed):
+    # Round-trip through JSON so the graph holds exactly what json.load produces.
+    graph = json.loads(json.dumps(make_graph(150, seed)))
+
+    assert single_pass(graph) == multi_pass(graph)
+
+
+def test_analysis_feeds_the_template_slots_in_graph_order():
+    graph = EDGE_CASES["nested placeholders"]
+    analysis = analyze_workflow(graph)
+
+    assert analysis.slots["{input_audio}"] == [("1", ("inputs", "batch", 1, "deep", 0))]
+    assert analysis.titles == {"Load": ["1", "2"]}
+    # Bare names get braces; case is kept.
+    assert list(analysis.placeholders) == ["{input_image_L}", "{input_mask}", "{input_audio}", "{input_image_l}"]
+    assert analysis.placeholders["{input_mask}"] == [("LoadImage", ("inputs", "batch", "0", "0"))]
+
+
+def test_output_types():
+    assert analyze_workflow(EDGE_CASES["video outputs"]).output_types == ["audio", "video"]
+
+
+def test_parser_records_the_template_content_hash(tmp_path):
+    graph = make_graph(20)
+    path = tmp_path / "workflow.json"
+    path.write_text(json.dumps(graph), encoding="utf-8")
+
+    info = WorkflowParser(tmp_path).inspect(path)
+
+    assert info is not None
+    assert info.content_hash == prompt_key(graph)[:16] == WorkflowTemplate(graph).content_hash
+    assert info.template is not None and info.template.slots == WorkflowTemplate(graph).slots
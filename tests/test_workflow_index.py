@@ -0,0 +1,176 @@
+import json
+import os
+
+import pytest
+
+from webapp.workflow_store import PARALLEL_MIN_CHUNK, WorkflowParser, WorkflowStore, _info_to_record
+
+
+def workflow(image="{input_image}", steps=20):
+    return {
+        "1": {"class_type": "LoadImage", "inputs": {"image": image}},
+        "2": {"class_type": "KSampler", "inputs": {"steps": steps, "model": ["1", 0]}},
+        "3": {"class_type": "SaveImage", "inputs": {"filename_prefix": "out", "images": ["2", 0]}},
+    }
+
+
+def write(path, graph):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(graph), encoding="utf-8")
+
+
+@pytest.fixture
+def library(tmp_path):
+    root = tmp_path / "workflow"
+    write(root / "group" / "a.json", workflow())
+    write(root / "group" / "b.json", workflow(steps=30))
+    write(root / "other" / "c.json", workflow(image="{input_video}"))
+    (root / "broken.json").write_text("{not json", encoding="utf-8")
+    return root, tmp_path / "workflow_index.json"
+
+
+@pytest.fixture
+def parses(monkeypatch):
+    parsed = []
+    inspect = WorkflowParser.inspect
+
+    def counting(self, path):
+        parsed.append(path.relative_to(self.root).as_posix())
+        return inspect(self, path)
+
+    monkeypatch.setattr(WorkflowParser, "inspect", counting)
+    return parsed
+
+
+def build_index(root, index_path):
+    store = WorkflowStore(root, index_path=index_path, workers=1)
+    assert index_path.exists()
+    return store
+
+
+def test_cold_start_loads_the_index_without_parsing(library, parses):
+    root, index_path = library
+    indexed = build_index(root, index_path)
+    parses.clear()
+
+    store = WorkflowStore(root, index_path=index_path, scan=False, workers=1)
+
+    assert parses == []
+    assert store.generation == 1
+    assert [info.identifier for info in store.list_workflows()] == [info.identifier for info in indexed.list_workflows()]
+    assert sorted(group.identifier for group in store.list_groups()) == sorted(group.identifier for group in indexed.list_groups())
+    info = store.get_workflow("group/a.json")
+    assert info.template is None
+    assert info.content_hash == indexed.get_workflow("group/a.json").content_hash
+    assert [placeholder.name for placeholder in info.placeholders] == ["{input_image}"]
+
+
+def test_scan_after_loading_reparses_only_changed_files(library, parses):
+    root, index_path = library
+    build_index(root, index_path)
+    write(root / "group" / "b.json", workflow(image="{input_audio}", steps=40))
+    (root / "other" / "c.json").unlink()
+    write(root / "new" / "d.json", workflow())
+    store = WorkflowStore(root, index_path=index_path, scan=False, workers=1)
+    parses.clear()
+
+    changes = store.scan()
+
+    assert parses == ["group/b.json", "new/d.json"]
+    assert changes.removed == ["other/c.json"]
+    assert store.apply(changes) is True
+    assert [info.identifier for info in store.list_workflows()] == ["group/a.json", "group/b.json", "new/d.json"]
+    assert [placeholder.name for placeholder in store.get_workflow("group/b.json").placeholders] == ["{input_audio}"]
+
+
+def test_unparseable_files_are_remembered(library, parses):
+    root, index_path = library
+    build_index(root, index_path)
+    store = WorkflowStore(root, index_path=index_path, scan=False, workers=1)
+    parses.clear()
+
+    assert store.refresh() is False
+    assert parses == []
+    assert store.get_workflow("broken.json") is None
+
+
+def test_touched_file_with_same_content_is_reparsed_by_fingerprint(library, parses):
+    root, index_path = library
+    build_index(root, index_path)
+    path = root / "group" / "a.json"
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    store = WorkflowStore(root, index_path=index_path, scan=False, workers=1)
+    parses.clear()
+
+    store.refresh()
+
+    assert parses == ["group/a.json"]
+
+
+@pytest.mark.parametrize("content", ['{"version": 1, "entries": {}}', "{not json", '{"version": 2, "entries": {"a.json": {}}}'])
+def test_outdated_or_corrupt_index_is_ignored(library, parses, content):
+    root, index_path = library
+    index_path.write_text(content, encoding="utf-8")
+
+    store = WorkflowStore(root, index_path=index_path, scan=False, workers=1)
+    assert store.list_workflows() == []
+
+    store.refresh()
+    assert len(parses) == 4
+    assert json.loads(index_path.read_text(encoding="utf-8"))["version"] == WorkflowStore.INDEX_VERSION
+
+
+def test_templates_are_compiled_on_first_use_and_cached(library):
+    root, index_path = library
+    build_index(root, index_path)
+    store = WorkflowStore(root, index_path=index_path, scan=False, workers=1)
+    info = store.get_workflow("group/a.json")
+
+    template = store.load_template(info)
+
+    assert info.template is template
+    assert store.load_template(info) is template
+    assert template.content_hash == info.content_hash
+    assert template.slots["{input_image}"] == [("1", ("inputs", "image"))]
+
+
+def test_template_of_a_file_changed_since_indexing_is_not_cached(library):
+    root, index_path = library
+    build_index(root, index_path)
+    store = WorkflowStore(root, index_path=index_path, scan=False, workers=1)
+    info = store.get_workflow("group/a.json")
+    write(info.path, workflow(image="{input_mask}"))
+
+    template = store.load_template(info)
+
+    assert "{input_mask}" in template.slots
+    assert template.content_hash != info.content_hash
+    assert info.template is None
+    store.refresh()
+    refreshed = store.get_workflow("group/a.json")
+    assert store.load_template(refreshed) is refreshed.template
+
+
+def test_large_batches_parsed_in_the_pool_match_serial_parsing(tmp_path, parses):
+    root = tmp_path / "workflow"
+    kinds = ["{input_image}", "{input_video}", "{input_audio}", "{input_mask}"]
+    for index in range(PARALLEL_MIN_CHUNK * 2 + 5):
+        write(root / f"group{index % 3}" / f"w{index:03d}.json", workflow(image=kinds[index % 4], steps=index))
+    (root / "broken.json").write_text("{not json", encoding="utf-8")
+
+    serial = WorkflowStore(root, workers=1)
+    parses.clear()
+    parallel = WorkflowStore(root, workers=2)
+
+    # The pool's workers parse in their own processes, so nothing was parsed here.
+    assert parses == []
+    assert [info.identifier for info in parallel.list_workflows()] == [info.identifier for info in serial.list_workflows()]
+    for info in parallel.list_workflows():
+        assert info.template is None
+        assert _info_to_record(info) == _info_to_record(serial.get_workflow(info.identifier))
+        assert info.path == serial.get_workflow(info.identifier).path
+    assert parallel.get_workflow("broken.json") is None
+    assert sorted(group.identifier for group in parallel.list_groups()) == sorted(group.identifier for group in serial.list_groups())
+    info = parallel.get_workflow("group0/w000.json")
+    assert parallel.load_template(info).content_hash == info.content_hash
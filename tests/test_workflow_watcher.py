@@ -0,0 +1,90 @@
+import asyncio
+import json
+import sys
+
+import pytest
+
+from webapp.workflow_store import WorkflowStore
+from webapp.workflow_watcher import WorkflowWatcher
+
+
+def workflow(image="{input_image}"):
+    return {
+        "1": {"class_type": "LoadImage", "inputs": {"image": image}},
+        "2": {"class_type": "SaveImage", "inputs": {"filename_prefix": "out", "images": ["1", 0]}},
+    }
+
+
+def write(path, graph):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(graph), encoding="utf-8")
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def wait_for(condition, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not reached in time"
+        await asyncio.sleep(0.01)
+
+
+@pytest.fixture
+def store(tmp_path):
+    root = tmp_path / "workflow"
+    write(root / "group" / "a.json", workflow())
+    return WorkflowStore(root, workers=1)
+
+
+def test_sync_bumps_the_generation_and_notifies(store):
+    notified = []
+
+    async def scenario():
+        watcher = WorkflowWatcher(store, on_change=notified.append)
+        before = store.generation
+        path = store.root / "group" / "b.json"
+        write(path, workflow(image="{input_video}"))
+
+        assert await watcher.sync([path]) is True
+        assert store.generation == before + 1
+        assert notified == [store.generation]
+        assert store.get_workflow("group/b.json") is not None
+
+        assert await watcher.sync() is False
+        assert notified == [store.generation]
+
+    run(scenario())
+
+
+def test_failing_change_handler_does_not_fail_the_sync(store):
+    def broken(generation):
+        raise RuntimeError("listener gone")
+
+    async def scenario():
+        watcher = WorkflowWatcher(store, on_change=broken)
+        (store.root / "group" / "a.json").unlink()
+        assert await watcher.sync() is True
+        assert store.get_workflow("group/a.json") is None
+
+    run(scenario())
+
+
+def test_polls_the_directory_without_watchfiles(store, monkeypatch):
+    monkeypatch.setitem(sys.modules, "watchfiles", None)
+    notified = []
+
+    async def scenario():
+        watcher = WorkflowWatcher(store, poll_interval=0.05, on_change=notified.append)
+        watcher.start()
+        try:
+            await wait_for(lambda: watcher.mode == "polling")
+            write(store.root / "new" / "c.json", workflow())
+            await wait_for(lambda: store.get_workflow("new/c.json") is not None and notified)
+            assert notified[-1] == store.generation
+        finally:
+            await watcher.close()
+        assert watcher.mode == "stopped"
+
+    run(scenario())
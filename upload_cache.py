@@ -0,0 +1,282 @@
+"""Persistent record of files already uploaded to ComfyUI servers.
+
+Entries are keyed by server URL and the SHA-256 of the file content, so a
+file is sent to a server once no matter how many jobs, paths or copies refer
+to it. Content digests are memoised by (path, size, mtime) to avoid rehashing
+unchanged media on every run. Entries older than ``revalidate_after`` are
+checked against the server before reuse, and entries unused for ``max_age``
+or beyond ``max_entries`` are evicted least recently used first.
+
+Changes are written back by a :class:`DeferredWriter`: at most once per
+``flush_delay`` seconds from a timer thread, and on :meth:`UploadCache.flush`
+(called when the client closes), so recording an upload never rewrites the
+file on the caller's thread.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Mapping, Optional, Sequence, Tuple
+
+
+LOG = logging.getLogger("upload_cache")
+
+HASH_CHUNK_SIZE = 1024 * 1024
+# Seconds a change may wait before the cache file is rewritten.
+DEFAULT_FLUSH_DELAY = 1.0
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with Path(path).open("rb") as handle:
+        for chunk in iter(lambda: handle.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DigestMemo:
+    """SHA-256 of file contents, memoised by resolved path while size and mtime are unchanged. Thread safe."""
+
+    def __init__(self, entries: Optional[Mapping[str, Sequence[Any]]] = None):
+        # path -> (size, mtime_ns, hex digest)
+        self._entries: Dict[str, Tuple[int, int, str]] = {path: tuple(value) for path, value in (entries or {}).items()}  # type: ignore[misc]
+        self._lock = threading.Lock()
+
+    def lookup(self, path: Path) -> Tuple[str, bool]:
+        """The digest of ``path`` and whether it had to be computed (i.e. the memo changed)."""
+        resolved = str(Path(path).resolve())
+        stat = os.stat(resolved)
+        with self._lock:
+            known = self._entries.get(resolved)
+        if known is not None and known[:2] == (stat.st_size, stat.st_mtime_ns):
+            return known[2], False
+        value = file_sha256(Path(resolved))
+        with self._lock:
+            self._entries[resolved] = (stat.st_size, stat.st_mtime_ns, value)
+        return value, True
+
+    def entries(self) -> Dict[str, list]:
+        with self._lock:
+            return {path: list(value) for path, value in self._entries.items()}
+
+    def trim(self, max_entries: int) -> bool:
+        """Drop the oldest half once there are more than ``max_entries``; memos are cheap to rebuild."""
+        with self._lock:
+            if len(self._entries) <= max_entries:
+                return False
+            for path in list(self._entries)[: len(self._entries) // 2]:
+                del self._entries[path]
+            return True
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class DeferredWriter:
+    """Atomically rewrites a JSON file from ``snapshot()`` after changes settle.
+
+    :meth:`schedule` starts a daemon timer if none is pending; when it fires,
+    or on :meth:`flush`, ``snapshot`` is called and its result written unless
+    it is ``None`` (nothing changed). Writes never overlap. A failed write is
+    logged and the snapshot is lost, which a cache can afford. Subclasses may
+    override :meth:`_store` to write the snapshot differently.
+    """
+
+    def __init__(self, path: Path, snapshot: Callable[[], Optional[Any]], *, delay: float = DEFAULT_FLUSH_DELAY):
+        self.path = path
+        self.delay = delay
+        self._snapshot = snapshot
+        self._timer: Optional[threading.Timer] = None
+        self._timer_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def schedule(self) -> None:
+        if self.delay <= 0:
+            self.flush()
+            return
+        with self._timer_lock:
+            if self._timer is not None:
+                return
+            self._timer = threading.Timer(self.delay, self._fire)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self) -> None:
+        with self._timer_lock:
+            timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+        self._write()
+
+    def _fire(self) -> None:
+        with self._timer_lock:
+            self._timer = None
+        self._write()
+
+    def _write(self) -> None:
+        with self._write_lock:
+            payload = self._snapshot()
+            if payload is None:
+                return
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._store(payload)
+            except OSError as exc:
+                LOG.warning("Could not write %s: %s", self.path, exc)
+
+    def _store(self, payload: Any) -> None:
+        temp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with temp_path.open("w", encoding="utf-8") as handle:
+            json.dump(payload, handle, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+
+
+@dataclass
+class UploadEntry:
+    name: str
+    subfolder: str = ""
+    uploaded_at: float = 0.0
+    validated_at: float = 0.0
+    last_used: float = 0.0
+
+
+class UploadCache:
+    """JSON-backed map of (server, content digest) -> remote upload name. Thread safe."""
+
+    VERSION = 1
+
+    def __init__(
+        self,
+        path: Optional[Path],
+        *,
+        max_entries: int = 20000,
+        max_age: float = 30 * 24 * 3600,
+        revalidate_after: float = 3600.0,
+        flush_delay: float = DEFAULT_FLUSH_DELAY,
+    ):
+        self.path = Path(path) if path else None
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.revalidate_after = revalidate_after
+        self._uploads: Dict[str, UploadEntry] = {}
+        self._digests = DigestMemo()
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._writer = DeferredWriter(self.path, self._snapshot, delay=flush_delay) if self.path else None
+        self._load()
+
+    # --------------------------------------------------------------- digests
+    def digest(self, path: Path) -> str:
+        """SHA-256 of the file content, reused while size and mtime are unchanged."""
+        value, computed = self._digests.lookup(path)
+        if computed:
+            with self._lock:
+                self._dirty = True
+        return value
+
+    # --------------------------------------------------------------- entries
+    def get(self, server: str, digest: str) -> Optional[UploadEntry]:
+        key = self._key(server, digest)
+        now = time.time()
+        with self._lock:
+            entry = self._uploads.get(key)
+            if entry is None:
+                return None
+            if now - entry.last_used > self.max_age:
+                del self._uploads[key]
+                self._dirty = True
+                return None
+            entry.last_used = now
+            self._dirty = True
+            return entry
+
+    def needs_validation(self, entry: UploadEntry) -> bool:
+        return time.time() - entry.validated_at > self.revalidate_after
+
+    def mark_validated(self, server: str, digest: str) -> None:
+        with self._lock:
+            entry = self._uploads.get(self._key(server, digest))
+            if entry is not None:
+                entry.validated_at = time.time()
+                self._dirty = True
+
+    def put(self, server: str, digest: str, name: str, subfolder: str = "") -> None:
+        now = time.time()
+        with self._lock:
+            self._uploads[self._key(server, digest)] = UploadEntry(
+                name=name, subfolder=subfolder, uploaded_at=now, validated_at=now, last_used=now
+            )
+            self._evict()
+            self._dirty = True
+        self._schedule()
+
+    def invalidate(self, server: str, digest: str) -> None:
+        with self._lock:
+            if self._uploads.pop(self._key(server, digest), None) is not None:
+                self._dirty = True
+        self._schedule()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._uploads)
+
+    # ----------------------------------------------------------- persistence
+    def flush(self) -> None:
+        """Write pending changes now instead of waiting for the timer."""
+        if self._writer is not None:
+            self._writer.flush()
+
+    def _schedule(self) -> None:
+        if self._writer is not None:
+            self._writer.schedule()
+
+    def _snapshot(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if not self._dirty:
+                return None
+            self._dirty = False
+            uploads = {key: asdict(entry) for key, entry in self._uploads.items()}
+        return {"version": self.VERSION, "uploads": uploads, "digests": self._digests.entries()}
+
+    def _load(self) -> None:
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            with self.path.open("r", encoding="utf-8") as handle:
+                payload = json.load(handle)
+            if payload.get("version") != self.VERSION:
+                raise ValueError(f"unsupported version {payload.get('version')}")
+            self._uploads = {key: UploadEntry(**value) for key, value in (payload.get("uploads") or {}).items()}
+            self._digests = DigestMemo(payload.get("digests"))
+        except (OSError, ValueError, TypeError) as exc:
+            LOG.warning("Ignoring unreadable upload cache %s: %s", self.path, exc)
+            self._uploads = {}
+            self._digests = DigestMemo()
+            return
+        with self._lock:
+            self._evict()
+
+    def _evict(self) -> None:
+        cutoff = time.time() - self.max_age
+        stale = [key for key, entry in self._uploads.items() if entry.last_used < cutoff]
+        for key in stale:
+            del self._uploads[key]
+        overflow = len(self._uploads) - self.max_entries
+        if overflow > 0:
+            for key, _ in sorted(self._uploads.items(), key=lambda item: item[1].last_used)[:overflow]:
+                del self._uploads[key]
+        trimmed = self._digests.trim(self.max_entries)
+        if stale or overflow > 0 or trimmed:
+            self._dirty = True
+
+    @staticmethod
+    def _key(server: str, digest: str) -> str:
+        return f"{server.rstrip('/')}|{digest}"
@@ -1,13 +1,9 @@
 import glob 
 import os 
 import requests
-import pandas as pd
 import json
 import urllib.request
 import urllib.parse
-import pandas as pd
-import urllib.request
-import urllib.parse
 import time
 import uuid
 
@@ -131,6 +127,7 @@ def json_by_title(data, title):
     return None
 
 def get_from_excel(file_path ='HeadShot_paramdata.xlsx'):
+    import pandas as pd  # 只在读取表格时才导入，批量测试等入口不需要 pandas
     df = pd.read_excel(file_path)
     # Loop through each row to extract the required information
     extracted_data = []
@@ -154,6 +151,7 @@ def get_from_excel(file_path ='HeadShot_paramdata.xlsx'):
     return extracted_data
 
 def get_from_excel_backend(file_path ='headshot_style_release.xlsx'):
+    import pandas as pd
     df = pd.read_excel(file_path)
     # Loop through each row to extract the required information
     extracted_data = []
@@ -177,6 +175,7 @@ def get_from_excel_backend(file_path ='headshot_style_release.xlsx'):
     return extracted_data
 
 def get_data_from_excel(file_path = 'run_headshot.xlsx'):
+    import pandas as pd
     df = pd.read_excel(file_path)
     # Loop through each row to extract the required information
     extracted_data = []
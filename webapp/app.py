@@ -1,59 +1,77 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
 import mimetypes
 import os
 import shutil
 import tempfile
+import threading
 import zipfile
+from contextlib import asynccontextmanager
+from functools import partial
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 
 import requests
-from fastapi import BackgroundTasks, Body, FastAPI, File, Form, HTTPException, UploadFile, status
+from fastapi import Body, FastAPI, File, Form, HTTPException, Query, Request, Response, UploadFile, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel, Field
 
 from batch_workflow_tester import (
+    DEFAULT_MAX_IN_FLIGHT,
     IMAGE_EXTENSIONS,
     VIDEO_EXTENSIONS,
-    BatchWorkflowTester,
-    ComfyAPIClient,
+    AsyncBatchWorkflowTester,
+    AsyncClientProvider,
+    AsyncComfyAPIClient,
+    AsyncServerPool,
     WorkflowTestCase,
-    _apply_text_inputs,
-    _replace_placeholders,
+    WorkflowTemplate,
     _sanitize_for_fs,
+    list_outputs,
 )
 from .config import (
     DATASET_ROOT,
     DEFAULT_OUTPUT_ROOT,
     DEFAULT_SERVER_URL,
+    JOB_DB_PATH,
+    LATENCY_HISTORY_PATH,
+    MAX_CONCURRENT_JOBS,
+    MAX_JOBS_PER_SERVER,
     MEDIA_ROOT,
+    RESULT_CACHE_PATH,
+    UPLOAD_CACHE_PATH,
+    WORKFLOW_INDEX_PATH,
     WORKFLOW_ROOT,
     ensure_dataset_root,
     ensure_media_root,
 )
+from latency_history import DEFAULT_METRIC, LatencyHistory
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY as METRICS_REGISTRY
+from result_cache import ResultCache
+from upload_cache import UploadCache
+
+from . import job_metrics
 from .dataset_jobs import DatasetJobManager
 from .dataset_manager import DatasetManager
-from .jobs import JobManager
+from .events import JobEventBus, close_on_exit_signals, stream_events
+from .job_store import JobStore
+from .jobs import DEFAULT_PAGE_SIZE, FINISHED_STATUSES, MAX_LOG_PAGE, JobManager
 from .media_manager import MediaEntry, MediaManager
+from .payload_cache import PayloadCache, payload_response
+from .scheduler import JobScheduler
 from .workflow_manager import WorkflowManager
 from .workflow_store import PlaceholderInfo, WorkflowGroup, WorkflowInfo, WorkflowStore
+from .workflow_watcher import WorkflowWatcher
 
 
 LOG = logging.getLogger("webapp")
 
 AUDIO_EXTENSIONS = {".mp3", ".wav", ".flac", ".aac", ".ogg", ".m4a"}
-# ComfyUI统一使用 /upload/image 接口上传所有类型的文件（图片、视频、音频等）
-UPLOAD_ENDPOINTS = {
-    "image": "/upload/image",
-    "video": "/upload/image",  # ComfyUI没有单独的video端点
-    "audio": "/upload/image",  # ComfyUI没有单独的audio端点
-    "file": "/upload/image",
-}
 
 
 class CreateFolderPayload(BaseModel):
@@ -76,8 +94,11 @@ class DeleteMediaPayload(BaseModel):
 
 class DatasetRunOptions(BaseModel):
     server_url: Optional[str] = None
+    server_urls: List[str] = Field(default_factory=list, description="多个ComfyUI服务器地址，填写后按负载分发")
+    max_in_flight: int = Field(DEFAULT_MAX_IN_FLIGHT, ge=1, le=32, description="每个服务器同时排队的运行数量")
     convert_images_to_jpg: bool = True
     append: bool = False
+    priority: int = Field(0, ge=-100, le=100, description="调度优先级，数值越大越先执行")
 
 
 class PromptOverride(BaseModel):
@@ -104,7 +125,11 @@ class RunBatchPayload(BaseModel):
     workflow_ids: List[str] = Field(..., description="要批量执行的工作流id列表")
     placeholders: Dict[str, str] = Field(..., description="占位符到媒体资源相对路径的映射")
     server_url: str = Field(DEFAULT_SERVER_URL, description="ComfyUI服务器地址")
+    server_urls: List[str] = Field(default_factory=list, description="多个ComfyUI服务器地址，填写后按负载分发")
     output_dir: str | None = Field(None, description="输出目录（可选）")
+    max_in_flight: int = Field(DEFAULT_MAX_IN_FLIGHT, ge=1, le=32, description="每个服务器同时排队的工作流数量")
+    reuse_results: bool = Field(False, description="工作流与素材内容完全相同时直接复用之前的输出")
+    priority: int = Field(0, ge=-100, le=100, description="调度优先级，数值越大越先执行")
 
 
 class ServerTestPayload(BaseModel):
@@ -114,7 +139,26 @@ class ServerTestPayload(BaseModel):
 def create_app() -> FastAPI:
     ensure_media_root()
     ensure_dataset_root()
-    app = FastAPI(title="ComfyUI批量测试平台", version="0.1.0")
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # 后台导入历史运行记录，不阻塞启动
+        threading.Thread(target=_backfill_jobs, args=(app.state.jobs,), name="job-backfill", daemon=True).start()
+        restore_signals = close_on_exit_signals(app.state.job_events)
+        app.state.workflow_watcher.start()
+        try:
+            yield
+        finally:
+            restore_signals()
+            await app.state.workflow_watcher.close()
+            app.state.job_events.close()
+            await app.state.scheduler.close("服务关闭，任务已中断")
+            app.state.job_store.close()
+            # 上传缓存、结果缓存与延迟记录定时写回，退出前写入尚未保存的变化
+            app.state.upload_cache.flush()
+            app.state.result_cache.flush()
+            app.state.latency_history.flush()
+
+    app = FastAPI(title="ComfyUI批量测试平台", version="0.1.0", lifespan=lifespan)
     app.add_middleware(
         CORSMiddleware,
         allow_origins=["*"],
@@ -128,30 +172,68 @@ def create_app() -> FastAPI:
     app.mount("/media", StaticFiles(directory=MEDIA_ROOT), name="media")
     app.mount("/datasets", StaticFiles(directory=DATASET_ROOT), name="datasets")
 
-    store = WorkflowStore(WORKFLOW_ROOT)
+    # 只载入持久化索引，不在启动时解析工作流；目录由 workflow_watcher 在后台校验
+    store = WorkflowStore(WORKFLOW_ROOT, index_path=WORKFLOW_INDEX_PATH, scan=False)
     media_manager = MediaManager(MEDIA_ROOT)
-    job_manager = JobManager()
+    job_store = JobStore(JOB_DB_PATH)
+    if interrupted := job_store.fail_unfinished("服务重启，任务已中断"):
+        LOG.warning("%s 个未完成的任务因服务重启被标记为失败", interrupted)
+    job_events = JobEventBus()
+    scheduler = JobScheduler(max_jobs=MAX_CONCURRENT_JOBS, max_jobs_per_server=MAX_JOBS_PER_SERVER)
+    job_manager = JobManager(job_store, events=job_events)
     dataset_manager = DatasetManager(DATASET_ROOT)
-    dataset_job_manager = DatasetJobManager()
+    dataset_job_manager = DatasetJobManager(job_store, events=job_events)
     workflow_manager = WorkflowManager(WORKFLOW_ROOT)
+    upload_cache = UploadCache(UPLOAD_CACHE_PATH)
+    result_cache = ResultCache(RESULT_CACHE_PATH)
+    latency_history = LatencyHistory(LATENCY_HISTORY_PATH)
+    job_metrics.watch(scheduler, job_events)
+    # 工作流目录变化后推送新的 generation，前端据此重新拉取分组与目录树
+    workflow_watcher = WorkflowWatcher(
+        store, on_change=lambda generation: job_events.publish("workflows.changed", {"generation": generation})
+    )
 
     app.state.store = store
+    app.state.workflow_watcher = workflow_watcher
+    # 分组、目录树与数据集工作流列表按 generation 缓存编码好的响应体
+    payload_cache = PayloadCache()
+    app.state.payload_cache = payload_cache
     app.state.media = media_manager
+    app.state.job_store = job_store
+    app.state.job_events = job_events
+    app.state.scheduler = scheduler
     app.state.jobs = job_manager
     app.state.datasets = dataset_manager
     app.state.dataset_jobs = dataset_job_manager
     app.state.workflow_files = workflow_manager
+    app.state.upload_cache = upload_cache
+    app.state.result_cache = result_cache
+    app.state.latency_history = latency_history
 
     @app.get("/")
     async def index() -> FileResponse:
         return FileResponse(static_dir / "index.html")
 
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics() -> PlainTextResponse:
+        """Prometheus 格式的运行指标。"""
+        return PlainTextResponse(METRICS_REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
     # ------------------------------------------------------------- workflow API
     @app.get("/api/workflow-groups")
-    async def list_workflow_groups() -> Dict[str, object]:
-        store.refresh()
-        groups = [serialize_group(group) for group in store.list_groups()]
-        return {"groups": groups}
+    async def list_workflow_groups(request: Request) -> Response:
+        generation = store.generation
+        payload = payload_cache.get(
+            "workflow-groups",
+            generation,
+            lambda: {"groups": [serialize_group(group) for group in store.list_groups()], "generation": generation},
+        )
+        return payload_response(request, payload)
+
+    @app.get("/api/workflow-generation")
+    async def get_workflow_generation() -> Dict[str, object]:
+        """工作流索引的版本号，变化时再拉取分组与目录树。"""
+        return {"generation": store.generation, "watch_mode": workflow_watcher.mode}
 
     @app.get("/api/workflows/{workflow_id}")
     async def get_workflow(workflow_id: str) -> Dict[str, object]:
@@ -177,21 +259,18 @@ def create_app() -> FastAPI:
         finally:
             for upload in files:
                 await upload.close()
-        store.refresh()
+        await workflow_watcher.sync()
         return saved
 
     @app.get("/api/workflow-tree")
-    async def get_workflow_tree() -> Dict[str, object]:
-        store.refresh()
-        tree = workflow_manager.list_tree()
-        workflow_map: Dict[str, WorkflowInfo] = {info.identifier: info for info in store.list_workflows()}
-        group_map: Dict[str, List[Dict[str, object]]] = {}
-        for group in store.list_groups():
-            for workflow in group.workflows:
-                entry = group_map.setdefault(workflow.identifier, [])
-                entry.append({"id": group.identifier, "label": group.label})
-        enriched = _enrich_tree(tree, workflow_map, group_map)
-        return {"tree": enriched}
+    async def get_workflow_tree(request: Request) -> Response:
+        generation = store.generation
+        payload = payload_cache.get(
+            "workflow-tree",
+            generation,
+            lambda: {"tree": serialize_workflow_tree(workflow_manager.list_tree(), store), "generation": generation},
+        )
+        return payload_response(request, payload)
 
     @app.post("/api/workflow-tree/rename")
     async def rename_workflow_entry(payload: RenamePayload) -> Dict[str, object]:
@@ -201,7 +280,7 @@ def create_app() -> FastAPI:
             raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc)) from exc
         except ValueError as exc:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
-        store.refresh()
+        await workflow_watcher.sync()
         return {"entry": entry}
 
     @app.post("/api/workflow-tree/delete")
@@ -214,7 +293,7 @@ def create_app() -> FastAPI:
                 workflow_manager.delete(path)
             except (FileNotFoundError, ValueError, PermissionError) as exc:
                 failures.append(f"{path}: {exc}")
-        store.refresh()
+        await workflow_watcher.sync()
         if failures:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="; ".join(failures))
         return {"status": "ok"}
@@ -362,20 +441,25 @@ def create_app() -> FastAPI:
         return {"status": "ok", "prompt": prompt_info}
 
     @app.post("/api/datasets/run", status_code=status.HTTP_202_ACCEPTED)
-    async def run_dataset(payload: DatasetRunRequest, background_tasks: BackgroundTasks) -> Dict[str, object]:
+    async def run_dataset(payload: DatasetRunRequest) -> Dict[str, object]:
         dataset_name_raw = (payload.dataset_name or "").strip()
         if not dataset_name_raw:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="数据集名称不能为空")
         safe_name = _sanitize_for_fs(dataset_name_raw)
         options = payload.options or DatasetRunOptions()
-        normalized_server = normalize_server_url(options.server_url or DEFAULT_SERVER_URL)
-        safe_options = options.copy(update={"server_url": normalized_server})
+        try:
+            server_urls = resolve_server_urls(options.server_url, options.server_urls)
+        except ValueError as exc:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+        safe_options = options.copy(update={"server_url": server_urls[0], "server_urls": server_urls})
         safe_payload = payload.copy(update={"dataset_name": safe_name, "options": safe_options})
-        job = dataset_job_manager.create_job(safe_name, safe_payload.workflow_id, server_url=normalized_server)
+        job = dataset_job_manager.create_job(safe_name, safe_payload.workflow_id, server_url=", ".join(server_urls))
 
-        def _task() -> None:
+        async def _task() -> None:
             try:
-                summary = execute_dataset_run(store, dataset_manager, safe_payload, dataset_job_manager, job.job_id)
+                summary = await execute_dataset_run(
+                    store, dataset_manager, safe_payload, dataset_job_manager, job.job_id, upload_cache
+                )
                 dataset_job_manager.mark_finished(job.job_id, summary)
             except HTTPException as exc:
                 dataset_job_manager.mark_failed(job.job_id, str(exc.detail))
@@ -383,13 +467,29 @@ def create_app() -> FastAPI:
                 LOG.exception("数据集任务失败: %s", exc)
                 dataset_job_manager.mark_failed(job.job_id, str(exc))
 
-        background_tasks.add_task(_task)
+        ahead = scheduler.submit(
+            job.job_id,
+            _task,
+            servers=server_urls,
+            priority=safe_options.priority,
+            on_cancel=partial(dataset_job_manager.mark_cancelled, job.job_id),
+        )
+        if ahead is not None:
+            dataset_job_manager.append_log(job.job_id, f"已加入队列（优先级 {safe_options.priority}），前面还有 {ahead} 个任务")
         return {"job_id": job.job_id}
 
     @app.get("/api/dataset-jobs")
-    async def list_dataset_jobs() -> Dict[str, object]:
-        jobs = [serialize_dataset_job(job) for job in dataset_job_manager.list_jobs()]
-        return {"jobs": jobs}
+    async def list_dataset_jobs(
+        status_filter: Optional[str] = Query(None, alias="status", description="按状态过滤"),
+        workflow_id: Optional[str] = Query(None, description="按工作流过滤"),
+        dataset_name: Optional[str] = Query(None, description="按数据集名称过滤"),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=500),
+        offset: int = Query(0, ge=0),
+    ) -> Dict[str, object]:
+        jobs, total = dataset_job_manager.query_jobs(
+            status=status_filter, workflow_id=workflow_id, dataset_name=dataset_name, limit=limit, offset=offset
+        )
+        return {"jobs": [job.to_summary() for job in jobs], "total": total, "limit": limit, "offset": offset}
 
     @app.get("/api/dataset-jobs/{job_id}")
     async def get_dataset_job(job_id: str) -> Dict[str, object]:
@@ -398,54 +498,34 @@ def create_app() -> FastAPI:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="未找到数据集任务")
         return serialize_dataset_job(job)
 
+    @app.post("/api/dataset-jobs/{job_id}/cancel", status_code=status.HTTP_202_ACCEPTED)
+    async def cancel_dataset_job(job_id: str) -> Dict[str, object]:
+        job = dataset_job_manager.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="未找到数据集任务")
+        return cancel_scheduled_job(scheduler, job_id, job.status)
+
+    @app.get("/api/dataset-jobs/{job_id}/logs")
+    async def get_dataset_job_logs(
+        job_id: str,
+        since: int = Query(0, ge=0, description="起始行号"),
+        limit: int = Query(MAX_LOG_PAGE, ge=1, le=MAX_LOG_PAGE),
+    ) -> Dict[str, object]:
+        try:
+            lines, total = dataset_job_manager.read_logs(job_id, since, limit)
+        except KeyError as exc:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="未找到数据集任务") from exc
+        return serialize_log_page(job_id, since, lines, total)
+
     @app.get("/api/dataset/workflows")
-    async def dataset_workflow_candidates() -> Dict[str, object]:
-        store.refresh()
-        workflows: List[Dict[str, object]] = []
-        for info in store.list_workflows():
-            placeholders: List[Dict[str, object]] = []
-            auto_placeholders: List[Dict[str, str]] = []
-            for placeholder in info.placeholders:
-                if placeholder.default_value is not None:
-                    auto_placeholders.append(
-                        {
-                            "name": placeholder.name,
-                            "value": placeholder.default_value,
-                        }
-                    )
-                    continue
-                normalized = normalize_placeholder_key(placeholder.name)
-                if not normalized.strip("{}").lower().startswith("input"):
-                    continue
-                placeholders.append(
-                    {
-                        "name": normalized,
-                        "display": placeholder.name,
-                        "type": placeholder.media_type,
-                    }
-                )
-            if not placeholders:
-                continue
-            prompt_fields = [
-                {
-                    "node_id": field.node_id,
-                    "field": field.field,
-                    "label": field.label,
-                    "default_value": field.default_value,
-                }
-                for field in info.prompt_fields
-            ]
-            workflows.append(
-                {
-                    "id": info.identifier,
-                    "name": info.name,
-                    "path": str(info.path),
-                    "placeholders": placeholders,
-                    "prompt_fields": prompt_fields,
-                    "auto_placeholders": auto_placeholders,
-                }
-            )
-        return {"workflows": workflows}
+    async def dataset_workflow_candidates(request: Request) -> Response:
+        generation = store.generation
+        payload = payload_cache.get(
+            "dataset-workflows",
+            generation,
+            lambda: {"workflows": serialize_dataset_workflows(store.list_workflows()), "generation": generation},
+        )
+        return payload_response(request, payload)
 
     @app.get("/api/media/all")
     async def list_all_media(media_type: str = "") -> Dict[str, object]:
@@ -507,10 +587,27 @@ def create_app() -> FastAPI:
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(exc)) from exc
 
     # ----------------------------------------------------------------- job API
+    @app.get("/api/events")
+    async def job_event_stream() -> StreamingResponse:
+        """以 Server-Sent Events 推送批量任务与数据集任务的增量变更。"""
+        return StreamingResponse(
+            stream_events(job_events),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
     @app.get("/api/jobs")
-    async def list_jobs() -> Dict[str, object]:
-        jobs = [job.to_dict() for job in job_manager.list_jobs()]
-        return {"jobs": jobs}
+    async def list_jobs(
+        status_filter: Optional[str] = Query(None, alias="status", description="按状态过滤"),
+        group_id: Optional[str] = Query(None, description="按工作流分组过滤"),
+        workflow_id: Optional[str] = Query(None, description="按包含的工作流过滤"),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=500),
+        offset: int = Query(0, ge=0),
+    ) -> Dict[str, object]:
+        jobs, total = job_manager.query_jobs(
+            status=status_filter, group_id=group_id, workflow_id=workflow_id, limit=limit, offset=offset
+        )
+        return {"jobs": [job.to_summary() for job in jobs], "total": total, "limit": limit, "offset": offset}
 
     @app.get("/api/jobs/{job_id}")
     async def get_job(job_id: str) -> Dict[str, object]:
@@ -519,6 +616,25 @@ def create_app() -> FastAPI:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="未找到任务")
         return job.to_dict()
 
+    @app.post("/api/jobs/{job_id}/cancel", status_code=status.HTTP_202_ACCEPTED)
+    async def cancel_job(job_id: str) -> Dict[str, object]:
+        job = job_manager.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="未找到任务")
+        return cancel_scheduled_job(scheduler, job_id, job.status)
+
+    @app.get("/api/jobs/{job_id}/logs")
+    async def get_job_logs(
+        job_id: str,
+        since: int = Query(0, ge=0, description="起始行号"),
+        limit: int = Query(MAX_LOG_PAGE, ge=1, le=MAX_LOG_PAGE),
+    ) -> Dict[str, object]:
+        try:
+            lines, total = job_manager.read_logs(job_id, since, limit)
+        except KeyError as exc:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="未找到任务") from exc
+        return serialize_log_page(job_id, since, lines, total)
+
     @app.get("/api/jobs/{job_id}/artifacts/{artifact_id}")
     async def get_job_artifact(job_id: str, artifact_id: str) -> FileResponse:
         job = job_manager.get(job_id)
@@ -533,6 +649,35 @@ def create_app() -> FastAPI:
         guessed_type, _ = mimetypes.guess_type(str(path))
         return FileResponse(path, media_type=guessed_type or "application/octet-stream", filename=artifact.filename)
 
+    # ------------------------------------------------------------- latency API
+    @app.get("/api/latency")
+    async def latency_report(
+        workflow: Optional[List[str]] = Query(None, description="只统计这些工作流（按名称，可重复）"),
+        server: Optional[str] = Query(None, description="只统计该服务器"),
+        metric: str = Query(DEFAULT_METRIC, description="比较的阶段（execution、queue_wait、upload、download 等）或 total"),
+        window: int = Query(10, ge=1, le=1000, description="工作流未改动时，与更早运行比较的最近运行数"),
+        min_slowdown: float = Query(0.1, ge=0, description="判定为变慢的最小中位数增幅"),
+        alpha: float = Query(0.05, gt=0, lt=1, description="显著性水平"),
+    ) -> Dict[str, object]:
+        """每个工作流在每台服务器上的延迟分位数，以及相对基线（上一版本或更早运行）是否显著变慢。"""
+        reports = latency_history.report(
+            workflows=workflow, server=server, metric=metric, window=window, min_slowdown=min_slowdown, alpha=alpha
+        )
+        return {
+            "metric": metric,
+            "reports": [report.to_dict() for report in reports],
+            "regressions": sum(1 for report in reports if report.regression),
+        }
+
+    @app.get("/api/latency/samples")
+    async def latency_samples(
+        workflow: Optional[str] = Query(None, description="工作流名称"),
+        server: Optional[str] = Query(None, description="服务器"),
+        limit: int = Query(200, ge=1, le=5000),
+    ) -> Dict[str, object]:
+        samples = latency_history.samples(workflow=workflow, server=server, limit=limit)
+        return {"samples": [sample.to_dict() for sample in samples]}
+
     @app.post("/api/test-server")
     async def test_server(payload: ServerTestPayload) -> Dict[str, object]:
         try:
@@ -546,8 +691,7 @@ def create_app() -> FastAPI:
         return {"status": status_label, "detail": message}
 
     @app.post("/api/run-batch", status_code=status.HTTP_202_ACCEPTED)
-    async def run_batch(payload: RunBatchPayload = Body(...), background_tasks: BackgroundTasks = BackgroundTasks()) -> Dict[str, object]:
-        store.refresh()
+    async def run_batch(payload: RunBatchPayload = Body(...)) -> Dict[str, object]:
         group = store.get_group(payload.group_id)
         if group is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="未找到分组")
@@ -570,8 +714,7 @@ def create_app() -> FastAPI:
                 issues.append(f"多余占位符: {', '.join(sorted(extra))}")
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="; ".join(issues))
 
-        uploaded_names: Dict[str, str] = {}
-        upload_cache: Dict[Path, str] = {}
+        input_paths: Dict[str, Path] = {}
         for placeholder, relative in payload.placeholders.items():
             try:
                 real_path = media_manager.resolve_path(relative)
@@ -579,16 +722,11 @@ def create_app() -> FastAPI:
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
             if not real_path.exists() or real_path.is_dir():
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"资源不存在: {relative}")
-            cached = upload_cache.get(real_path)
-            if cached is None:
-                try:
-                    cached = upload_media_asset(payload.server_url, real_path)
-                except ValueError as exc:
-                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
-                except requests.RequestException as exc:
-                    raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(exc)) from exc
-                upload_cache[real_path] = cached
-            uploaded_names[placeholder] = cached
+            input_paths[placeholder] = real_path
+        try:
+            server_urls = resolve_server_urls(payload.server_url, payload.server_urls)
+        except ValueError as exc:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
 
         output_root = Path(payload.output_dir) if payload.output_dir else DEFAULT_OUTPUT_ROOT
         if not output_root.is_absolute():
@@ -599,82 +737,140 @@ def create_app() -> FastAPI:
             group_id=payload.group_id,
             workflow_ids=payload.workflow_ids,
             placeholders=dict(payload.placeholders),
-            server_url=payload.server_url,
+            server_url=", ".join(server_urls),
             output_dir=str(output_root),
-            uploaded_names=uploaded_names,
+            uploaded_names=None,
         )
 
-        background_tasks.add_task(
+        # 素材在执行时上传到实际分配到的服务器（远端文件名按服务器区分）
+        runner = partial(
             execute_job,
             job.identifier,
             payload.workflow_ids,
-            uploaded_names,
-            payload.server_url,
+            input_paths,
+            server_urls,
             output_root,
             store,
             job_manager,
+            payload.max_in_flight,
+            upload_cache,
+            result_cache,
+            payload.reuse_results,
+            latency_history,
+        )
+        ahead = scheduler.submit(
+            job.identifier,
+            runner,
+            servers=server_urls,
+            priority=payload.priority,
+            on_cancel=partial(job_manager.mark_cancelled, job.identifier),
         )
+        if ahead is not None:
+            job_manager.append_log(job.identifier, f"已加入队列（优先级 {payload.priority}），前面还有 {ahead} 个任务")
         return {"job_id": job.identifier}
 
     return app
 
 
-def execute_job(
+async def execute_job(
     job_id: str,
     workflow_ids: List[str],
-    uploaded_names: Dict[str, str],
-    server_url: str,
+    input_paths: Dict[str, Path],
+    server_urls: List[str],
     output_root: Path,
     store: WorkflowStore,
     job_manager: JobManager,
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+    upload_cache: Optional[UploadCache] = None,
+    result_cache: Optional[ResultCache] = None,
+    reuse_results: bool = False,
+    latency_history: Optional[LatencyHistory] = None,
 ) -> None:
     job_manager.mark_running(job_id)
-    job_manager.append_log(job_id, f"开始执行任务，共 {len(workflow_ids)} 个工作流")
+    job_manager.append_log(
+        job_id,
+        f"开始执行任务，共 {len(workflow_ids)} 个工作流，{len(server_urls)} 台服务器，每台并发 {max_in_flight}",
+    )
+    provider = build_client_provider(server_urls, upload_cache)
     try:
-        client = ComfyAPIClient(server_url)
-        tester = BatchWorkflowTester(client, output_root=output_root)
+        # 不复用时仍记录本次结果，供之后勾选复用的任务使用
+        tester = AsyncBatchWorkflowTester(
+            provider,
+            output_root=output_root,
+            max_in_flight=max_in_flight * len(server_urls),
+            result_cache=result_cache,
+            refresh_results=not reuse_results,
+        )
         cases: List[WorkflowTestCase] = []
         for identifier in workflow_ids:
             info = store.get_workflow(identifier)
             if info is None:
                 raise RuntimeError(f"工作流 {identifier} 不存在或已被删除")
-            case_inputs: Dict[str, Dict[str, str]] = {}
+            case_inputs: Dict[str, object] = {}
             for placeholder in info.placeholders:
                 if placeholder.default_value is not None:
                     case_inputs[placeholder.name] = {"upload": False, "name": placeholder.default_value}
                     continue
-                remote_name = uploaded_names.get(placeholder.name)
-                if not remote_name:
-                    raise RuntimeError(f"占位符 {placeholder.name} 缺少已上传的资源")
-                case_inputs[placeholder.name] = {"upload": False, "name": remote_name, "path": remote_name}
-            case = WorkflowTestCase(name=info.name, workflow_path=info.path, inputs=case_inputs)
+                local_path = input_paths.get(placeholder.name)
+                if local_path is None:
+                    raise RuntimeError(f"占位符 {placeholder.name} 缺少素材")
+                case_inputs[placeholder.name] = {"path": str(local_path)}
+            try:
+                template: Optional[WorkflowTemplate] = await asyncio.to_thread(store.load_template, info)
+            except (OSError, ValueError) as exc:
+                # 文件刚被删除或改坏：交给执行器按路径加载，错误记录在该工作流的结果中
+                LOG.warning("预编译工作流 %s 失败: %s", identifier, exc)
+                template = None
+            case = WorkflowTestCase(name=info.name, workflow_path=info.path, inputs=case_inputs, template=template)
             cases.append(case)
         total = len(cases)
-        for index, case in enumerate(cases, start=1):
+
+        def _on_start(index: int, case: WorkflowTestCase) -> None:
             job_manager.append_log(job_id, f"开始执行第 {index}/{total} 个工作流：{case.name}")
-            result = tester.run_case(case)
-            if result.get("status") == "success":
-                job_manager.append_log(job_id, f"完成第 {index}/{total} 个工作流：{case.name}")
+
+        def _on_result(index: int, case: WorkflowTestCase, result: Dict[str, object]) -> None:
+            job_manager.record_result(job_id, result)
+            if latency_history is not None:
+                latency_history.record_result(result)
+            server = result.get("server") or "-"
+            uploads = result.get("uploads") or {}
+            if uploads:
+                prefix = f"{server} · " if len(server_urls) > 1 else ""
+                job_manager.record_uploads(
+                    job_id,
+                    {name: f"{prefix}{remote}" for name, remote in uploads.items() if name in input_paths},  # type: ignore[union-attr]
+                )
+            if result.get("cached"):
+                job_manager.append_log(
+                    job_id, f"第 {index}/{total} 个工作流与之前的运行相同，复用已有结果：{case.name} -> {result.get('output_dir')}"
+                )
+            elif result.get("status") == "success":
+                job_manager.append_log(job_id, f"完成第 {index}/{total} 个工作流：{case.name}（{server}）")
             else:
                 job_manager.append_log(
                     job_id,
                     f"第 {index}/{total} 个工作流失败：{case.name} -> {result.get('error', '未知错误')}",
                 )
+
+        await tester.run_all(cases, on_start=_on_start, on_result=_on_result)
         job_manager.mark_finished(job_id, tester.results)
         job_manager.append_log(job_id, "任务执行完成")
     except Exception as exc:  # pylint: disable=broad-except
         LOG.exception("任务执行失败: %s", exc)
         job_manager.mark_failed(job_id, str(exc))
         job_manager.append_log(job_id, f"任务失败: {exc}")
+    finally:
+        await provider.close()
 
 
 # ---------------------------------------------------------------- dataset run
-def execute_dataset_run(
+async def execute_dataset_run(
     store: WorkflowStore,
     dataset_manager: DatasetManager,
     payload: DatasetRunRequest,
     job_manager: DatasetJobManager,
     job_id: str,
+    upload_cache: Optional[UploadCache] = None,
 ) -> Dict[str, object]:
     options = payload.options or DatasetRunOptions()
     dataset_name_raw = (payload.dataset_name or "").strip()
@@ -721,8 +917,7 @@ def execute_dataset_run(
     target_dir = structure.get("target") or next((v for k, v in structure.items() if k.endswith("_target")), None)
     if target_dir is None:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="未找到输出目录")
-    server_url = normalize_server_url(options.server_url or DEFAULT_SERVER_URL)
-    client = ComfyAPIClient(server_url)
+    server_urls = resolve_server_urls(options.server_url, options.server_urls)
 
     pairs = list(dataset_manager.iter_pairs(normalized_map))
     total_runs = len(pairs)
@@ -730,7 +925,7 @@ def execute_dataset_run(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="未生成任何运行批次")
 
     job_manager.mark_running(job_id, total_runs)
-    job_manager.append_log(job_id, f"使用服务器：{server_url}")
+    job_manager.append_log(job_id, f"使用服务器：{', '.join(server_urls)}")
     prompt_mapping: Dict[str, Dict[str, str]] = {}
     prompt_overrides_list: List[Dict[str, str]] = []
     for override in payload.prompt_overrides or []:
@@ -743,21 +938,24 @@ def execute_dataset_run(
         prompt_mapping.setdefault(key, {})[field] = text_value
         prompt_overrides_list.append({"node_id": node_id, "field": field, "value": text_value})
     dataset_prompt_text = (payload.dataset_prompt or "").strip()
-    try:
-        for offset, pair in enumerate(pairs, start=1):
-            index = last_index + offset
+    template = await asyncio.to_thread(store.load_template, workflow_info)
+
+    async def _run_pair(offset: int, pair: Dict[str, Path]) -> None:
+        index = last_index + offset
+        async with window, provider.lease() as client:
             remote_mapping: Dict[str, str] = {}
             for placeholder in normalized_order:
                 slot_name = control_slot_map.get(placeholder, "control")
                 control_dir = structure[slot_name]
                 source_path = pair[placeholder]
-                saved_control = dataset_manager.save_control(
+                saved_control = await asyncio.to_thread(
+                    dataset_manager.save_control,
                     control_dir,
                     index,
                     source_path,
                     force_jpg=options.convert_images_to_jpg,
                 )
-                uploaded_name = client.upload_file(saved_control)
+                uploaded_name = await client.upload_file(saved_control)
                 for alias in placeholder_aliases(placeholder):
                     remote_mapping[alias] = uploaded_name
             for placeholder in workflow_info.placeholders:
@@ -766,31 +964,46 @@ def execute_dataset_run(
                 for alias in placeholder_aliases(placeholder.name):
                     remote_mapping.setdefault(alias, placeholder.default_value)
 
-            with workflow_info.path.open("r", encoding="utf-8") as handle:
-                workflow_data = json.load(handle)
-            _replace_placeholders(workflow_data, remote_mapping)
-            if prompt_mapping:
-                _apply_text_inputs(workflow_data, prompt_mapping)
-            prompt_id, history = client.execute_prompt(workflow_data)
-            outputs = client.collect_outputs(history)
-            asset = next((item for item in outputs if item.bucket in ("images", "videos")), None)
+            workflow_data = template.render(remote_mapping, text_inputs=prompt_mapping)
+            prompt_id, history = await client.execute_prompt(workflow_data)
+            # 只有第一个图像/视频输出作为目标，其余输出不下载
+            asset = next((item for item in list_outputs(history) if item.bucket in ("images", "videos")), None)
             if asset is None:
                 raise RuntimeError("工作流未返回图像或视频输出")
-            convert_output = options.convert_images_to_jpg and asset.bucket == "images"
-            dataset_manager.save_target_asset(
-                target_dir,
-                index,
-                asset.original_filename,
-                asset.data,
-                convert_to_jpg=convert_output,
+            staged = await client.download_output(
+                asset, dataset_manager.staging_path(staging_dir, index, asset.original_filename)
             )
-            if dataset_prompt_text:
-                dataset_manager.save_prompt_annotation(target_dir, index, dataset_prompt_text)
-            job_manager.update_progress(job_id, offset, f"第 {offset}/{total_runs} 次运行完成")
-    except Exception:
+        convert_output = options.convert_images_to_jpg and asset.bucket == "images"
+        await asyncio.to_thread(
+            dataset_manager.save_target_asset,
+            target_dir,
+            index,
+            staged.path,
+            convert_to_jpg=convert_output,
+        )
+        if dataset_prompt_text:
+            await asyncio.to_thread(dataset_manager.save_prompt_annotation, target_dir, index, dataset_prompt_text)
+
+    # 下载先写到数据集之外的临时目录，进程中途退出时不会在数据集中留下半成品
+    staging_dir = Path(await asyncio.to_thread(tempfile.mkdtemp, prefix="dataset-staging-"))
+    provider = build_client_provider(server_urls, upload_cache)
+    window = asyncio.Semaphore(options.max_in_flight * len(server_urls))
+    tasks = [asyncio.ensure_future(_run_pair(offset, pair)) for offset, pair in enumerate(pairs, start=1)]
+    try:
+        for completed, finished in enumerate(asyncio.as_completed(tasks), start=1):
+            await finished
+            job_manager.update_progress(job_id, completed, f"第 {completed}/{total_runs} 次运行完成")
+    except BaseException:
+        # 失败或被取消时停止其余运行（会撤回它们在服务器上的 prompt）
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
         if not dataset_pre_exists:
-            dataset_manager.remove_dataset(dataset_name)
+            await asyncio.to_thread(dataset_manager.remove_dataset, dataset_name)
         raise
+    finally:
+        await provider.close()
+        await asyncio.to_thread(shutil.rmtree, staging_dir, True)
 
     existing_runs = existing_metadata.get("total_runs", 0)
     metadata = {
@@ -805,7 +1018,7 @@ def execute_dataset_run(
         "prompt_overrides": prompt_overrides_list,
         "dataset_prompt": dataset_prompt_text,
     }
-    dataset_manager.save_metadata(dataset_name, metadata)
+    await asyncio.to_thread(dataset_manager.save_metadata, dataset_name, metadata)
     return {
         "dataset": dataset_name,
         "total_runs": total_runs,
@@ -814,7 +1027,27 @@ def execute_dataset_run(
     }
 
 
+def _backfill_jobs(job_manager: JobManager) -> None:
+    try:
+        imported = job_manager.backfill(DEFAULT_OUTPUT_ROOT, WORKFLOW_ROOT)
+    except Exception as exc:  # pylint: disable=broad-except
+        LOG.exception("导入历史运行记录失败: %s", exc)
+        return
+    if imported:
+        LOG.info("已从 %s 导入 %s 条历史运行记录", DEFAULT_OUTPUT_ROOT, imported)
+
+
 # ----------------------------------------------------------------- serializers
+def serialize_workflow_tree(tree: Dict[str, object], store: WorkflowStore) -> Dict[str, object]:
+    workflow_map: Dict[str, WorkflowInfo] = {info.identifier: info for info in store.list_workflows()}
+    group_map: Dict[str, List[Dict[str, object]]] = {}
+    for group in store.list_groups():
+        for workflow in group.workflows:
+            entry = group_map.setdefault(workflow.identifier, [])
+            entry.append({"id": group.identifier, "label": group.label})
+    return _enrich_tree(tree, workflow_map, group_map)
+
+
 def _enrich_tree(
     node: Dict[str, object],
     workflow_map: Dict[str, WorkflowInfo],
@@ -845,6 +1078,55 @@ def _enrich_tree(
     return enriched
 
 
+def serialize_dataset_workflows(infos: Iterable[WorkflowInfo]) -> List[Dict[str, object]]:
+    """可以用于数据集的工作流（至少有一个需要选择素材的输入占位符）。"""
+    workflows: List[Dict[str, object]] = []
+    for info in infos:
+        placeholders: List[Dict[str, object]] = []
+        auto_placeholders: List[Dict[str, str]] = []
+        for placeholder in info.placeholders:
+            if placeholder.default_value is not None:
+                auto_placeholders.append(
+                    {
+                        "name": placeholder.name,
+                        "value": placeholder.default_value,
+                    }
+                )
+                continue
+            normalized = normalize_placeholder_key(placeholder.name)
+            if not normalized.strip("{}").lower().startswith("input"):
+                continue
+            placeholders.append(
+                {
+                    "name": normalized,
+                    "display": placeholder.name,
+                    "type": placeholder.media_type,
+                }
+            )
+        if not placeholders:
+            continue
+        prompt_fields = [
+            {
+                "node_id": field.node_id,
+                "field": field.field,
+                "label": field.label,
+                "default_value": field.default_value,
+            }
+            for field in info.prompt_fields
+        ]
+        workflows.append(
+            {
+                "id": info.identifier,
+                "name": info.name,
+                "path": str(info.path),
+                "placeholders": placeholders,
+                "prompt_fields": prompt_fields,
+                "auto_placeholders": auto_placeholders,
+            }
+        )
+    return workflows
+
+
 def serialize_group(group: WorkflowGroup) -> Dict[str, object]:
     return {
         "id": group.identifier,
@@ -921,21 +1203,22 @@ def normalize_placeholder_key(key: str) -> str:
 
 
 def serialize_dataset_job(job) -> Dict[str, object]:
-    return {
-        "job_id": job.job_id,
-        "dataset_name": job.dataset_name,
-        "workflow_id": job.workflow_id,
-        "server_url": job.server_url,
-        "status": job.status,
-        "total": job.total,
-        "completed": job.completed,
-        "error": job.error,
-        "result": job.result,
-        "logs": job.logs,
-        "started_at": job.started_at,
-        "finished_at": job.finished_at,
-    }
+    return job.to_dict()
+
+
+def cancel_scheduled_job(scheduler: JobScheduler, job_id: str, current_status: str) -> Dict[str, object]:
+    if current_status in FINISHED_STATUSES:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="任务已结束，无法取消")
+    previous = scheduler.cancel(job_id, "用户取消")
+    if previous is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="任务不在调度队列中")
+    # 运行中的任务会先撤回已排队的 prompt 并中断正在执行的 prompt，随后状态才变为 cancelled
+    return {"job_id": job_id, "status": "cancelled" if previous == "queued" else "cancelling"}
+
 
+def serialize_log_page(job_id: str, since: int, lines: List[str], total: int) -> Dict[str, object]:
+    # next 作为下一次请求的 since，追上最新日志后保持不变
+    return {"job_id": job_id, "since": since, "next": since + len(lines), "total": total, "logs": lines}
 
 app = create_app()
 
@@ -949,6 +1232,18 @@ def normalize_server_url(server_url: str) -> str:
     return cleaned.rstrip("/")
 
 
+def resolve_server_urls(server_url: Optional[str], server_urls: Optional[List[str]] = None) -> List[str]:
+    candidates = [url for url in (server_urls or []) if url and url.strip()] or [server_url or DEFAULT_SERVER_URL]
+    normalized = [normalize_server_url(url) for url in candidates]
+    return list(dict.fromkeys(normalized))
+
+
+def build_client_provider(server_urls: List[str], upload_cache: Optional[UploadCache] = None) -> AsyncClientProvider:
+    if len(server_urls) > 1:
+        return AsyncServerPool(server_urls, upload_cache=upload_cache)
+    return AsyncComfyAPIClient(server_urls[0], upload_cache=upload_cache)
+
+
 def ping_comfy_server(server_url: str) -> Tuple[bool, str]:
     base = normalize_server_url(server_url)
     endpoints = ("/system_stats", "/queue/status", "")
@@ -976,21 +1271,3 @@ def detect_media_type(path: Path) -> str:
     if suffix in AUDIO_EXTENSIONS:
         return "audio"
     return "file"
-
-
-def upload_media_asset(server_url: str, path: Path) -> str:
-    if not path.exists():
-        raise ValueError(f"文件不存在: {path}")
-    if not path.is_file():
-        raise ValueError(f"路径不是文件: {path}")
-    media_type = detect_media_type(path)
-    endpoint = UPLOAD_ENDPOINTS.get(media_type, UPLOAD_ENDPOINTS["image"])
-    url = f"{normalize_server_url(server_url)}{endpoint}"
-    with path.open("rb") as handle:
-        response = requests.post(url, files={"image": handle}, timeout=60)
-    response.raise_for_status()
-    data = response.json()
-    uploaded_name = data.get("name")
-    if not uploaded_name:
-        raise ValueError("上传响应缺少文件名")
-    return uploaded_name
@@ -1,14 +1,26 @@
 from __future__ import annotations
 
+import os
 from pathlib import Path
 
 
 BASE_DIR = Path(__file__).resolve().parent.parent
-WORKFLOW_ROOT = BASE_DIR / "workflow"
-MEDIA_ROOT = BASE_DIR / "media"
+# 工作流、素材、输出等数据默认放在项目目录下，可通过环境变量指向其他位置（如基准测试用的临时目录）
+DATA_DIR = Path(os.environ.get("COMFY_BATCH_DATA_DIR") or BASE_DIR).resolve()
+WORKFLOW_ROOT = DATA_DIR / "workflow"
+MEDIA_ROOT = DATA_DIR / "media"
 DEFAULT_SERVER_URL = "http://127.0.0.1:8189"
-DEFAULT_OUTPUT_ROOT = BASE_DIR / "workflow_test_output"
-DATASET_ROOT = BASE_DIR / "datasets"
+DEFAULT_OUTPUT_ROOT = DATA_DIR / "workflow_test_output"
+DATASET_ROOT = DATA_DIR / "datasets"
+UPLOAD_CACHE_PATH = DATA_DIR / "upload_cache.json"
+RESULT_CACHE_PATH = DATA_DIR / "result_cache.json"
+JOB_DB_PATH = DATA_DIR / "jobs.sqlite3"
+LATENCY_HISTORY_PATH = DATA_DIR / "latency_history.jsonl"
+# 工作流解析结果的持久化索引，启动时直接载入，后台再校验
+WORKFLOW_INDEX_PATH = DATA_DIR / "workflow_index.json"
+# 调度器：同时运行的任务总数，以及每台 ComfyUI 服务器上同时运行的任务数
+MAX_CONCURRENT_JOBS = 4
+MAX_JOBS_PER_SERVER = 1
 
 
 def ensure_media_root() -> None:
@@ -3,8 +3,15 @@ from __future__ import annotations
 import threading
 import time
 import uuid
+from collections import OrderedDict
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+
+from . import job_metrics
+from .events import JobEventBus, job_event
+from .job_store import JobStore, dumps, loads
+from .jobs import DEFAULT_PAGE_SIZE, FINISHED_STATUSES, LOG_TAIL_SIZE, MAX_LOG_PAGE, JobLog
 
 
 @dataclass
@@ -16,31 +23,119 @@ class DatasetJob:
     status: str = "queued"
     total: int = 0
     completed: int = 0
+    created_at: float = field(default_factory=lambda: time.time())
     started_at: Optional[float] = None
     finished_at: Optional[float] = None
     error: Optional[str] = None
     result: Optional[Dict[str, object]] = None
-    logs: List[str] = field(default_factory=list)
+    logs: JobLog = field(default_factory=JobLog)
+
+    def to_summary(self) -> Dict[str, object]:
+        return {
+            "job_id": self.job_id,
+            "dataset_name": self.dataset_name,
+            "workflow_id": self.workflow_id,
+            "server_url": self.server_url,
+            "status": self.status,
+            "created_at": self.created_at,
+            "total": self.total,
+            "completed": self.completed,
+            "error": self.error,
+            "result": self.result,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "log_count": self.logs.total,
+            "last_log": self.logs.last,
+        }
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "job_id": self.job_id,
+            "dataset_name": self.dataset_name,
+            "workflow_id": self.workflow_id,
+            "server_url": self.server_url,
+            "status": self.status,
+            "created_at": self.created_at,
+            "total": self.total,
+            "completed": self.completed,
+            "error": self.error,
+            "result": self.result,
+            **self.logs.to_dict(),
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
 
 
 class DatasetJobManager:
-    def __init__(self) -> None:
-        self._jobs: Dict[str, DatasetJob] = {}
+    """数据集任务管理，持久化方式与 :class:`JobManager` 相同。"""
+
+    TABLE = "dataset_jobs"
+    KIND = "dataset"
+
+    def __init__(
+        self, store: Optional[JobStore] = None, *, cache_size: int = 200, events: Optional[JobEventBus] = None
+    ) -> None:
+        self._store = store or JobStore(None)
+        self._events = events
+        self._cache_size = cache_size
+        self._jobs: "OrderedDict[str, DatasetJob]" = OrderedDict()
         self._lock = threading.Lock()
 
     def create_job(self, dataset_name: str, workflow_id: str, *, server_url: Optional[str] = None) -> DatasetJob:
         job = DatasetJob(job_id=uuid.uuid4().hex[:12], dataset_name=dataset_name, workflow_id=workflow_id, server_url=server_url)
+        self._store.insert(self.TABLE, self._to_row(job))
         with self._lock:
-            self._jobs[job.job_id] = job
+            self._remember(job)
+            payload = job.to_summary()
+        job_metrics.record_created(self.KIND)
+        self._publish("job.created", job.job_id, job=payload)
         return job
 
     def list_jobs(self) -> List[DatasetJob]:
+        jobs, _ = self.query_jobs(limit=DEFAULT_PAGE_SIZE)
+        return jobs
+
+    def query_jobs(
+        self,
+        *,
+        status: Optional[str] = None,
+        workflow_id: Optional[str] = None,
+        dataset_name: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        offset: int = 0,
+    ) -> Tuple[List[DatasetJob], int]:
+        """按条件分页查询，用于列表摘要：不在内存中的任务只载入最后一行日志（总行数准确）。"""
+        rows, total = self._store.query(
+            self.TABLE,
+            filters={"status": status, "dataset_name": dataset_name},
+            workflow_id=workflow_id,
+            limit=limit,
+            offset=offset,
+        )
         with self._lock:
-            return sorted(self._jobs.values(), key=lambda job: job.started_at or 0, reverse=True)
+            live = {row["id"]: self._jobs[row["id"]] for row in rows if row["id"] in self._jobs}
+        missing = [row["id"] for row in rows if row["id"] not in live]
+        # 列表只返回摘要：未缓存的任务只取日志总行数与最后一行，完整的日志尾部由 get 载入
+        tails = self._store.log_summaries(missing)
+        return [live.get(row["id"]) or self._from_row(row, tails.get(row["id"], (0, []))) for row in rows], total
 
     def get(self, job_id: str) -> Optional[DatasetJob]:
         with self._lock:
-            return self._jobs.get(job_id)
+            job = self._jobs.get(job_id)
+            if job is not None:
+                self._jobs.move_to_end(job_id)
+                return job
+            return self._load(job_id)
+
+    def read_logs(self, job_id: str, since: int = 0, limit: int = MAX_LOG_PAGE) -> Tuple[List[str], int]:
+        with self._lock:
+            job = self._require(job_id)
+            total = job.logs.total
+            lines = job.logs.since(since)
+        if lines is None:
+            self._store.flush()
+            lines = self._store.read_logs(job_id, since, limit)
+        return lines[:limit], total
 
     def mark_running(self, job_id: str, total: int) -> None:
         with self._lock:
@@ -48,14 +143,21 @@ class DatasetJobManager:
             job.status = "running"
             job.total = total
             job.started_at = time.time()
-            job.logs.append(f"开始执行，预计 {total} 次运行")
+            self._log(job, f"开始执行，预计 {total} 次运行")
+        self._touch(job)
+        self._publish_status(job)
 
     def update_progress(self, job_id: str, completed: int, message: Optional[str] = None) -> None:
         with self._lock:
             job = self._require(job_id)
+            advanced = completed - job.completed
             job.completed = completed
             if message:
-                job.logs.append(message)
+                self._log(job, message)
+            total = job.total
+        job_metrics.record_dataset_runs(advanced)
+        self._touch(job)
+        self._publish("job.progress", job_id, completed=completed, total=total)
 
     def mark_finished(self, job_id: str, result: Dict[str, object]) -> None:
         with self._lock:
@@ -64,7 +166,10 @@ class DatasetJobManager:
             job.completed = job.total
             job.finished_at = time.time()
             job.result = result
-            job.logs.append("数据集任务完成")
+            self._log(job, "数据集任务完成")
+        self._touch(job)
+        self._store.flush()
+        self._publish_status(job)
 
     def mark_failed(self, job_id: str, error: str) -> None:
         with self._lock:
@@ -72,15 +177,110 @@ class DatasetJobManager:
             job.status = "failed"
             job.error = error
             job.finished_at = time.time()
-            job.logs.append(f"任务失败: {error}")
+            self._log(job, f"任务失败: {error}")
+        self._touch(job)
+        self._store.flush()
+        self._publish_status(job)
+
+    def mark_cancelled(self, job_id: str, reason: str) -> None:
+        with self._lock:
+            job = self._require(job_id)
+            job.status = "cancelled"
+            job.error = reason
+            job.finished_at = time.time()
+            self._log(job, f"任务已取消：{reason}")
+        self._touch(job)
+        self._store.flush()
+        self._publish_status(job)
 
     def append_log(self, job_id: str, message: str) -> None:
         with self._lock:
             job = self._require(job_id)
-            job.logs.append(message)
+            self._log(job, message)
+
+    # ---------------------------------------------------------------- internal
+    def _log(self, job: DatasetJob, message: str) -> None:
+        seq = job.logs.append(message)
+        self._store.append_log(job.job_id, seq, message)
+        self._publish("job.log", job.job_id, seq=seq, message=message)
+
+    def _publish(self, event_type: str, job_id: str, **fields: object) -> None:
+        if self._events is not None:
+            self._events.publish(event_type, job_event(self.KIND, job_id, **fields))
+
+    def _publish_status(self, job: DatasetJob) -> None:
+        with self._lock:
+            fields = {
+                "status": job.status,
+                "total": job.total,
+                "completed": job.completed,
+                "started_at": job.started_at,
+                "finished_at": job.finished_at,
+                "error": job.error,
+                "result": job.result,
+            }
+        job_metrics.record_status(self.KIND, job.status, job.created_at, job.started_at, job.finished_at)
+        self._publish("job.status", job.job_id, **fields)
 
     def _require(self, job_id: str) -> DatasetJob:
-        job = self._jobs.get(job_id)
+        job = self._jobs.get(job_id) or self._load(job_id)
         if job is None:
             raise KeyError(f"dataset job {job_id} not found")
         return job
+
+    def _load(self, job_id: str) -> Optional[DatasetJob]:
+        row = self._store.load(self.TABLE, job_id)
+        if row is None:
+            return None
+        return self._remember(self._from_row(row, self._store.log_tails([job_id], LOG_TAIL_SIZE)[job_id]))
+
+    def _remember(self, job: DatasetJob) -> DatasetJob:
+        current = self._jobs.setdefault(job.job_id, job)
+        self._jobs.move_to_end(job.job_id)
+        overflow = len(self._jobs) - self._cache_size
+        if overflow > 0:
+            for stale in [key for key, item in self._jobs.items() if item.status in FINISHED_STATUSES][:overflow]:
+                del self._jobs[stale]
+        return current
+
+    def _touch(self, job: DatasetJob) -> None:
+        self._store.schedule(self.TABLE, job.job_id, partial(self._snapshot, job))
+
+    def _snapshot(self, job: DatasetJob) -> Dict[str, object]:
+        with self._lock:
+            return self._to_row(job)
+
+    @staticmethod
+    def _to_row(job: DatasetJob) -> Dict[str, object]:
+        return {
+            "id": job.job_id,
+            "dataset_name": job.dataset_name,
+            "workflow_id": job.workflow_id,
+            "status": job.status,
+            "created_at": job.created_at,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+            "server_url": job.server_url,
+            "total": job.total,
+            "completed": job.completed,
+            "error": job.error,
+            "result": dumps(job.result) if job.result is not None else None,
+        }
+
+    @staticmethod
+    def _from_row(row: Dict[str, object], log_tail: Tuple[int, List[str]]) -> DatasetJob:
+        return DatasetJob(
+            job_id=str(row["id"]),
+            dataset_name=str(row.get("dataset_name") or ""),
+            workflow_id=str(row.get("workflow_id") or ""),
+            server_url=row.get("server_url"),  # type: ignore[arg-type]
+            status=str(row.get("status") or "queued"),
+            total=int(row.get("total") or 0),  # type: ignore[arg-type]
+            completed=int(row.get("completed") or 0),  # type: ignore[arg-type]
+            created_at=float(row.get("created_at") or 0),  # type: ignore[arg-type]
+            started_at=row.get("started_at"),  # type: ignore[arg-type]
+            finished_at=row.get("finished_at"),  # type: ignore[arg-type]
+            error=row.get("error"),  # type: ignore[arg-type]
+            result=loads(row.get("result"), None),  # type: ignore[arg-type]
+            logs=JobLog(log_tail[1], total=log_tail[0]),
+        )
@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import io
 import json
 import shutil
 from dataclasses import dataclass, field
@@ -142,18 +141,24 @@ class DatasetManager:
             shutil.copy2(source, dest)
         return dest
 
-    def save_target_asset(self, folder: Path, index: int, filename_hint: str, data: bytes, convert_to_jpg: bool = True) -> Path:
+    def staging_path(self, folder: Path, index: int, filename_hint: str) -> Path:
+        """目标输出在临时目录 ``folder``（应位于数据集之外）中的下载位置，之后由 ``save_target_asset`` 移入数据集。"""
+        suffix = Path(filename_hint).suffix.lower() or ".png"
+        return folder / f"{index:07d}.download{suffix}"
+
+    def save_target_asset(self, folder: Path, index: int, source: Path, convert_to_jpg: bool = True) -> Path:
         alias = f"{index:07d}"
-        suffix = Path(filename_hint).suffix.lower()
+        suffix = source.suffix.lower()
         if convert_to_jpg and suffix in {".png", ".webp", ".bmp"}:
             dest = folder / f"{alias}.jpg"
-            with Image.open(io.BytesIO(data)) as image:
-                image.convert("RGB").save(dest, format="JPEG")
+            self._convert_to_jpg(source, dest)
+            source.unlink()
         else:
             if not suffix:
                 suffix = ".png"
             dest = folder / f"{alias}{suffix}"
-            dest.write_bytes(data)
+            # 临时目录可能与数据集不在同一个文件系统上
+            shutil.move(str(source), dest)
         return dest
 
     def save_prompt_annotation(self, folder: Path, index: int, text: str) -> Path:
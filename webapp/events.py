@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import signal
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Mapping, Optional
+
+
+HEARTBEAT_INTERVAL = 15.0
+
+
+class JobSubscription:
+    """单个 SSE 连接的事件队列；积压过多时清空并要求客户端重新同步。"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_pending: int):
+        self.loop = loop
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue()
+        self._max_pending = max_pending
+        self.closed = False
+
+    def close(self) -> None:
+        self.closed = True
+        self._queue.put_nowait("")
+
+    def push(self, message: str) -> None:
+        if self._queue.qsize() >= self._max_pending:
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            message = format_event("resync", {"reason": "overflow"})
+        self._queue.put_nowait(message)
+
+    async def get(self, timeout: float) -> Optional[str]:
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class JobEventBus:
+    """任务变更的发布/订阅中心，供 ``/api/events`` 以 Server-Sent Events 推送。
+
+    任务管理器在任意线程调用 :meth:`publish`；事件会被投递到各订阅者所在的事件循环。
+    事件只推送给在线的连接，客户端在每次连上（收到 ``hello``）后自行拉取一次完整快照。
+    """
+
+    def __init__(self, *, max_pending: int = 2000):
+        self._max_pending = max_pending
+        self._subscribers: List[JobSubscription] = []
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self._closed = False
+
+    def publish(self, event_type: str, data: Mapping[str, Any]) -> None:
+        with self._lock:
+            self._sequence += 1
+            message = format_event(event_type, data, self._sequence)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.push, message)
+            except RuntimeError:
+                # 事件循环已关闭，连接随之失效
+                self._remove(subscription)
+
+    @asynccontextmanager
+    async def subscribe(self) -> AsyncIterator[JobSubscription]:
+        subscription = JobSubscription(asyncio.get_running_loop(), self._max_pending)
+        with self._lock:
+            self._subscribers.append(subscription)
+            sequence = self._sequence
+            if self._closed:
+                subscription.close()
+        subscription.push(format_event("hello", {"sequence": sequence}, sequence))
+        try:
+            yield subscription
+        finally:
+            self._remove(subscription)
+
+    def close(self) -> None:
+        """结束所有连接并拒绝新的订阅，服务退出时调用。"""
+        with self._lock:
+            self._closed = True
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.close)
+            except RuntimeError:
+                pass
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def _remove(self, subscription: JobSubscription) -> None:
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+
+
+def format_event(event_type: str, data: Mapping[str, Any], event_id: Optional[int] = None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def stream_events(bus: JobEventBus, *, heartbeat: float = HEARTBEAT_INTERVAL) -> AsyncIterator[str]:
+    async with bus.subscribe() as subscription:
+        yield "retry: 3000\n\n"
+        while not subscription.closed:
+            message = await subscription.get(heartbeat)
+            if subscription.closed:
+                break
+            # 定期发送注释行，防止代理因空闲断开连接
+            yield message if message is not None else ": ping\n\n"
+
+
+def close_on_exit_signals(bus: JobEventBus) -> Callable[[], None]:
+    """在退出信号到达时先关闭事件流。
+
+    uvicorn 会等待所有连接结束才完成关闭，而事件流永不自行结束；因此在原有的信号处理函数之前
+    插入 :meth:`JobEventBus.close`。返回用于恢复原处理函数的回调。只能在主线程中安装。
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return lambda: None
+    previous: Dict[int, Any] = {}
+
+    def _handler(signum: int, frame: Any) -> None:
+        bus.close()
+        original = previous.get(signum)
+        if callable(original):
+            original(signum, frame)
+        elif original == signal.SIG_DFL:
+            signal.signal(signum, signal.SIG_DFL)
+            signal.raise_signal(signum)
+
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        previous[signum] = signal.getsignal(signum)
+        signal.signal(signum, _handler)
+
+    def _restore() -> None:
+        for signum, original in previous.items():
+            if signal.getsignal(signum) is _handler:
+                signal.signal(signum, original)
+
+    return _restore
+
+
+def job_event(kind: str, identifier: str, **fields: Any) -> Dict[str, Any]:
+    return {"kind": kind, "id": identifier, **fields}
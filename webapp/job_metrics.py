@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import time
+from typing import Optional
+
+from metrics import LONG_BUCKETS, REGISTRY, Counter, Gauge, Histogram
+
+from .events import JobEventBus
+from .scheduler import JobScheduler
+
+
+# 任务级指标；单次运行、上传下载与服务器健康由 batch_workflow_tester 记录
+JOBS_CREATED = Counter("comfy_jobs_created_total", "创建的任务数", ("kind",))
+JOBS_STARTED = Counter("comfy_jobs_started_total", "开始执行的任务数", ("kind",))
+JOBS_FINISHED = Counter("comfy_jobs_finished_total", "结束的任务数，按最终状态区分", ("kind", "status"))
+JOB_QUEUE_SECONDS = Histogram("comfy_job_queue_seconds", "任务从创建到开始执行的等待时间", ("kind",), buckets=LONG_BUCKETS)
+JOB_DURATION_SECONDS = Histogram(
+    "comfy_job_duration_seconds", "任务从开始执行到结束的耗时", ("kind", "status"), buckets=LONG_BUCKETS
+)
+DATASET_RUNS = Counter("comfy_dataset_runs_total", "数据集任务完成的运行次数", ())
+JOBS_QUEUED = Gauge("comfy_jobs_queued", "调度器中排队的任务数", ())
+JOBS_RUNNING = Gauge("comfy_jobs_running", "正在运行的任务数", ())
+SERVER_RUNNING_JOBS = Gauge("comfy_server_running_jobs", "每台服务器上正在运行的任务数", ("server",))
+EVENT_SUBSCRIBERS = Gauge("comfy_event_subscribers", "已连接的任务事件流（SSE）数量", ())
+
+
+def record_created(kind: str) -> None:
+    JOBS_CREATED.inc(kind=kind)
+
+
+def record_status(kind: str, status: str, created_at: float, started_at: Optional[float], finished_at: Optional[float]) -> None:
+    """任务状态变更时调用：开始时记录排队时间，结束时记录最终状态与耗时。"""
+    if status == "running":
+        JOBS_STARTED.inc(kind=kind)
+        JOB_QUEUE_SECONDS.observe(max(0.0, (started_at or time.time()) - created_at), kind=kind)
+    elif status in ("finished", "failed", "cancelled"):
+        JOBS_FINISHED.inc(kind=kind, status=status)
+        # 排队时被取消的任务没有开始时间，不计入耗时
+        if started_at is not None:
+            JOB_DURATION_SECONDS.observe(max(0.0, (finished_at or time.time()) - started_at), kind=kind, status=status)
+
+
+def record_dataset_runs(count: int) -> None:
+    if count > 0:
+        DATASET_RUNS.inc(count)
+
+
+def watch(scheduler: JobScheduler, events: JobEventBus) -> None:
+    """抓取 /metrics 时从调度器与事件总线读取当前的队列与连接数。"""
+
+    def _collect() -> None:
+        snapshot = scheduler.snapshot()
+        JOBS_QUEUED.set(len(snapshot["queued"]))  # type: ignore[arg-type]
+        JOBS_RUNNING.set(len(snapshot["running"]))  # type: ignore[arg-type]
+        SERVER_RUNNING_JOBS.clear()
+        for server, load in snapshot["server_load"].items():  # type: ignore[union-attr]
+            SERVER_RUNNING_JOBS.set(load, server=server)
+        EVENT_SUBSCRIBERS.set(events.subscriber_count())
+
+    REGISTRY.set_collector("webapp.jobs", _collect)
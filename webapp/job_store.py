@@ -0,0 +1,312 @@
+from __future__ import annotations
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+
+LOG = logging.getLogger("job_store")
+
+# 行快照由任务管理器在写入时生成，避免持有过期对象
+RowFactory = Callable[[], Mapping[str, Any]]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS batch_jobs (
+    id TEXT PRIMARY KEY,
+    group_id TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    server_url TEXT,
+    output_dir TEXT,
+    error TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_batch_jobs_status ON batch_jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS idx_batch_jobs_created ON batch_jobs (created_at);
+CREATE INDEX IF NOT EXISTS idx_batch_jobs_group ON batch_jobs (group_id, created_at);
+
+CREATE TABLE IF NOT EXISTS batch_job_workflows (
+    job_id TEXT NOT NULL,
+    workflow_id TEXT NOT NULL,
+    PRIMARY KEY (job_id, workflow_id)
+);
+CREATE INDEX IF NOT EXISTS idx_batch_job_workflows_workflow ON batch_job_workflows (workflow_id);
+
+CREATE TABLE IF NOT EXISTS dataset_jobs (
+    id TEXT PRIMARY KEY,
+    dataset_name TEXT NOT NULL,
+    workflow_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    server_url TEXT,
+    total INTEGER NOT NULL DEFAULT 0,
+    completed INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    result TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_dataset_jobs_status ON dataset_jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS idx_dataset_jobs_created ON dataset_jobs (created_at);
+CREATE INDEX IF NOT EXISTS idx_dataset_jobs_workflow ON dataset_jobs (workflow_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_dataset_jobs_dataset ON dataset_jobs (dataset_name, created_at);
+
+CREATE TABLE IF NOT EXISTS job_logs (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    message TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+);
+
+CREATE TABLE IF NOT EXISTS run_files (
+    metadata_file TEXT PRIMARY KEY,
+    job_id TEXT NOT NULL
+);
+"""
+
+TABLE_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    "batch_jobs": ("id", "group_id", "status", "created_at", "started_at", "finished_at", "server_url", "output_dir", "error", "data"),
+    "dataset_jobs": (
+        "id", "dataset_name", "workflow_id", "status", "created_at", "started_at", "finished_at",
+        "server_url", "total", "completed", "error", "result",
+    ),  # fmt: skip
+}
+
+
+class JobStore:
+    """SQLite 持久化的任务存储，批量任务与数据集任务共用。
+
+    状态变更先登记为待写入，由后台线程每隔 ``flush_interval`` 秒合并成一个事务写入；
+    日志按行追加，是完整日志的唯一来源（内存中只保留末尾若干行）。``path`` 为 None 时使用内存数据库（不落盘）。
+    """
+
+    def __init__(self, path: Optional[Path], *, flush_interval: float = 0.5):
+        self.path = Path(path) if path else None
+        self.flush_interval = flush_interval
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path) if self.path else ":memory:", check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._db_lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending_rows: Dict[Tuple[str, str], RowFactory] = {}
+        self._pending_logs: List[Tuple[str, int, str]] = []
+        self._pending_run_files: List[Tuple[str, str]] = []
+        self._wake = threading.Event()
+        self._closed = False
+        with self._db_lock:
+            if self.path is not None:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+            self._conn.commit()
+        self._writer = threading.Thread(target=self._write_loop, name="job-store-writer", daemon=True)
+        self._writer.start()
+
+    # ----------------------------------------------------------------- writes
+    def insert(self, table: str, row: Mapping[str, Any], *, workflow_ids: Sequence[str] = ()) -> None:
+        """立即写入新任务，保证创建后即可查询到。"""
+        with self._db_lock, self._conn:
+            self._upsert(table, row)
+            if workflow_ids:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO batch_job_workflows (job_id, workflow_id) VALUES (?, ?)",
+                    [(row["id"], workflow_id) for workflow_id in workflow_ids],
+                )
+
+    def schedule(self, table: str, identifier: str, factory: RowFactory) -> None:
+        with self._pending_lock:
+            self._pending_rows[(table, identifier)] = factory
+
+    def append_log(self, job_id: str, seq: int, message: str) -> None:
+        with self._pending_lock:
+            self._pending_logs.append((job_id, seq, message))
+
+    def record_run_files(self, job_id: str, metadata_files: Iterable[str]) -> None:
+        """登记任务已有的 run_metadata.json，导入历史记录时跳过；与状态变更一起批量写入。"""
+        rows = [(str(path), job_id) for path in metadata_files if path]
+        if not rows:
+            return
+        with self._pending_lock:
+            self._pending_run_files.extend(rows)
+
+    def fail_unfinished(self, error: str) -> int:
+        """上次进程退出时仍未结束的任务已无法继续，启动时统一标记为失败。
+
+        这些任务已完成的运行同时登记到 run_files（结果保存在批量任务的 data 中），导入历史记录时不会重复导入。
+        """
+        now = time.time()
+        updated = 0
+        with self._db_lock, self._conn:
+            interrupted = self._conn.execute("SELECT id, data FROM batch_jobs WHERE status IN ('queued', 'running')").fetchall()
+            run_files = [
+                (str(result["metadata_file"]), row["id"])
+                for row in interrupted
+                for result in loads(row["data"], {}).get("results") or []
+                if isinstance(result, dict) and result.get("metadata_file")
+            ]
+            self._conn.executemany("INSERT OR IGNORE INTO run_files (metadata_file, job_id) VALUES (?, ?)", run_files)
+            for table in TABLE_COLUMNS:
+                cursor = self._conn.execute(
+                    f"UPDATE {table} SET status = 'failed', error = ?, finished_at = ? WHERE status IN ('queued', 'running')",
+                    (error, now),
+                )
+                updated += cursor.rowcount
+        return updated
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            with self._pending_lock:
+                factories, self._pending_rows = self._pending_rows, {}
+                logs, self._pending_logs = self._pending_logs, []
+                run_files, self._pending_run_files = self._pending_run_files, []
+            if not factories and not logs and not run_files:
+                return
+            # 在待写入锁之外生成快照：工厂函数会获取任务管理器自己的锁
+            rows = [(table, factory()) for (table, _), factory in factories.items()]
+            with self._db_lock, self._conn:
+                for table, row in rows:
+                    self._upsert(table, row)
+                if logs:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO job_logs (job_id, seq, message) VALUES (?, ?, ?)", logs
+                    )
+                if run_files:
+                    self._conn.executemany("INSERT OR IGNORE INTO run_files (metadata_file, job_id) VALUES (?, ?)", run_files)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._writer.join(timeout=5)
+        self.flush()
+        with self._db_lock:
+            self._conn.close()
+
+    # ------------------------------------------------------------------ reads
+    def load(self, table: str, identifier: str) -> Optional[Dict[str, Any]]:
+        with self._db_lock:
+            row = self._conn.execute(f"SELECT * FROM {table} WHERE id = ?", (identifier,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def query(
+        self,
+        table: str,
+        *,
+        filters: Optional[Mapping[str, Optional[str]]] = None,
+        workflow_id: Optional[str] = None,
+        limit: int = 50,
+        offset: int = 0,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """按字段过滤并按创建时间倒序分页，返回 (当前页, 总数)。"""
+        clauses: List[str] = []
+        params: List[Any] = []
+        for column, value in (filters or {}).items():
+            if value is None:
+                continue
+            if column not in TABLE_COLUMNS[table]:
+                raise ValueError(f"unknown column {column}")
+            clauses.append(f"{column} = ?")
+            params.append(value)
+        if workflow_id is not None:
+            if table == "batch_jobs":
+                clauses.append("id IN (SELECT job_id FROM batch_job_workflows WHERE workflow_id = ?)")
+            else:
+                clauses.append("workflow_id = ?")
+            params.append(workflow_id)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._db_lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM {table}{where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT * FROM {table}{where} ORDER BY created_at DESC LIMIT ? OFFSET ?", [*params, limit, offset]
+            ).fetchall()
+        return [dict(row) for row in rows], int(total)
+
+    def log_tails(self, job_ids: Sequence[str], size: int) -> Dict[str, Tuple[int, List[str]]]:
+        """每个任务的日志总行数与最后 ``size`` 行。"""
+        tails: Dict[str, Tuple[int, List[str]]] = {job_id: (0, []) for job_id in job_ids}
+        if not job_ids:
+            return tails
+        placeholders = ", ".join("?" for _ in job_ids)
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT job_id, message, total FROM ("
+                " SELECT job_id, seq, message, MAX(seq) OVER (PARTITION BY job_id) + 1 AS total,"
+                " ROW_NUMBER() OVER (PARTITION BY job_id ORDER BY seq DESC) AS position"
+                f" FROM job_logs WHERE job_id IN ({placeholders})"
+                ") WHERE position <= ? ORDER BY job_id, seq",
+                [*job_ids, size],
+            ).fetchall()
+        for row in rows:
+            _, lines = tails[row["job_id"]]
+            lines.append(row["message"])
+            tails[row["job_id"]] = (int(row["total"]), lines)
+        return tails
+
+    def log_summaries(self, job_ids: Sequence[str]) -> Dict[str, Tuple[int, List[str]]]:
+        """每个任务的日志总行数与最后一行，格式同 :meth:`log_tails`；列表摘要只需要这些。"""
+        summaries: Dict[str, Tuple[int, List[str]]] = {job_id: (0, []) for job_id in job_ids}
+        if not job_ids:
+            return summaries
+        placeholders = ", ".join("?" for _ in job_ids)
+        with self._db_lock:
+            # 只有一个 MAX 聚合时，SQLite 的裸列 message 取自 seq 最大的那一行
+            rows = self._conn.execute(
+                f"SELECT job_id, MAX(seq) + 1 AS total, message FROM job_logs WHERE job_id IN ({placeholders}) GROUP BY job_id",
+                list(job_ids),
+            ).fetchall()
+        for row in rows:
+            summaries[row["job_id"]] = (int(row["total"]), [row["message"]])
+        return summaries
+
+    def read_logs(self, job_id: str, since: int, limit: int) -> List[str]:
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT message FROM job_logs WHERE job_id = ? AND seq >= ? ORDER BY seq LIMIT ?", (job_id, since, limit)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def known_run_files(self) -> set[str]:
+        # 运行中任务刚登记的文件可能还在待写入队列中
+        self.flush()
+        with self._db_lock:
+            return {row[0] for row in self._conn.execute("SELECT metadata_file FROM run_files")}
+
+    # --------------------------------------------------------------- internal
+    def _upsert(self, table: str, row: Mapping[str, Any]) -> None:
+        columns = TABLE_COLUMNS[table]
+        assignments = ", ".join(f"{column} = excluded.{column}" for column in columns if column != "id")
+        self._conn.execute(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)}) "
+            f"ON CONFLICT(id) DO UPDATE SET {assignments}",
+            [row.get(column) for column in columns],
+        )
+
+    def _write_loop(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as exc:  # pylint: disable=broad-except
+                LOG.exception("写入任务数据库失败: %s", exc)
+
+
+def dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+def loads(value: Optional[str], default: Any) -> Any:
+    if not value:
+        return default
+    try:
+        return json.loads(value)
+    except ValueError:
+        return default
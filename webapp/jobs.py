@@ -1,11 +1,70 @@
 from __future__ import annotations
 
+import hashlib
+import json
+import logging
 import threading
 import time
 import uuid
+from collections import OrderedDict, deque
 from dataclasses import dataclass, field
+from functools import partial
+from itertools import islice
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from . import job_metrics
+from .events import JobEventBus, job_event
+from .job_store import JobStore, dumps, loads
+
+
+LOG = logging.getLogger("jobs")
+
+DEFAULT_PAGE_SIZE = 50
+FINISHED_STATUSES = frozenset({"finished", "failed", "cancelled"})
+# 保留产出物的状态；失败的任务不展示产出物
+ARTIFACT_STATUSES = frozenset({"finished", "cancelled"})
+LOG_TAIL_SIZE = 200
+MAX_LOG_PAGE = 5000
+
+
+class JobLog:
+    """任务日志的内存部分：只保留最后 ``size`` 行，完整日志按行写入 :class:`JobStore`。
+
+    行号（``seq``）从 0 开始连续编号，``offset`` 为内存中第一行的行号。
+    """
+
+    def __init__(self, lines: Iterable[str] = (), *, total: Optional[int] = None, size: int = LOG_TAIL_SIZE):
+        self._tail: "deque[str]" = deque(lines, maxlen=size)
+        self.total = len(self._tail) if total is None else total
+
+    def append(self, message: str) -> int:
+        self._tail.append(message)
+        self.total += 1
+        return self.total - 1
+
+    @property
+    def offset(self) -> int:
+        return self.total - len(self._tail)
+
+    @property
+    def last(self) -> Optional[str]:
+        return self._tail[-1] if self._tail else None
+
+    def lines(self) -> List[str]:
+        return list(self._tail)
+
+    def since(self, seq: int) -> Optional[List[str]]:
+        """从行号 ``seq`` 开始的内存日志；其中有行已移出内存时返回 None。"""
+        if seq < self.offset:
+            return None
+        return list(islice(self._tail, seq - self.offset, None))
+
+    def __len__(self) -> int:
+        return self.total
+
+    def to_dict(self) -> Dict[str, object]:
+        return {"logs": self.lines(), "log_count": self.total, "log_offset": self.offset}
 
 
 @dataclass
@@ -24,7 +83,27 @@ class BatchJob:
     finished_at: Optional[float] = None
     results: List[Dict[str, object]] = field(default_factory=list)
     error: Optional[str] = None
-    logs: List[str] = field(default_factory=list)
+    logs: JobLog = field(default_factory=JobLog)
+
+    def to_summary(self) -> Dict[str, object]:
+        """列表视图使用的摘要，大小与日志和结果数量无关。"""
+        return {
+            "id": self.identifier,
+            "group_id": self.group_id,
+            "server_url": self.server_url,
+            "output_dir": self.output_dir,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "workflow_count": len(self.workflow_ids),
+            "result_count": len(self.results),
+            "success_count": sum(1 for result in self.results if result.get("status") == "success"),
+            "artifact_count": len(self.artifacts),
+            "log_count": self.logs.total,
+            "last_log": self.logs.last,
+        }
 
     def to_dict(self) -> Dict[str, object]:
         return {
@@ -41,7 +120,7 @@ class BatchJob:
             "finished_at": self.finished_at,
             "results": self.results,
             "error": self.error,
-            "logs": self.logs,
+            **self.logs.to_dict(),
             "artifacts": [artifact.to_dict(self.identifier) for artifact in self.artifacts],
         }
 
@@ -65,18 +144,67 @@ class JobArtifact:
 
 
 class JobManager:
-    def __init__(self):
-        self._jobs: Dict[str, BatchJob] = {}
+    """批量任务管理：运行中的任务常驻内存，所有状态持久化到 :class:`JobStore`。
+
+    已结束的任务只保留最近 ``cache_size`` 个在内存中，其余按需从数据库读取。
+    传入 ``events`` 时，每次变更都会以增量事件的形式发布，供页面实时刷新。
+    """
+
+    TABLE = "batch_jobs"
+    KIND = "batch"
+
+    def __init__(self, store: Optional[JobStore] = None, *, cache_size: int = 200, events: Optional[JobEventBus] = None):
+        self._store = store or JobStore(None)
+        self._events = events
+        self._cache_size = cache_size
+        self._jobs: "OrderedDict[str, BatchJob]" = OrderedDict()
         self._lock = threading.Lock()
 
     # ------------------------------------------------------------------ lookup
     def list_jobs(self) -> List[BatchJob]:
+        jobs, _ = self.query_jobs(limit=DEFAULT_PAGE_SIZE)
+        return jobs
+
+    def query_jobs(
+        self,
+        *,
+        status: Optional[str] = None,
+        group_id: Optional[str] = None,
+        workflow_id: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        offset: int = 0,
+    ) -> Tuple[List[BatchJob], int]:
+        """按条件分页查询，用于列表摘要：不在内存中的任务只载入最后一行日志（总行数准确）。"""
+        rows, total = self._store.query(
+            self.TABLE, filters={"status": status, "group_id": group_id}, workflow_id=workflow_id, limit=limit, offset=offset
+        )
         with self._lock:
-            return sorted(self._jobs.values(), key=lambda job: job.created_at, reverse=True)
+            # 内存中的任务比数据库更新（写入是批量延迟的）
+            live = {row["id"]: self._jobs[row["id"]] for row in rows if row["id"] in self._jobs}
+        missing = [row["id"] for row in rows if row["id"] not in live]
+        # 列表只返回摘要：未缓存的任务只取日志总行数与最后一行，完整的日志尾部由 get 载入
+        tails = self._store.log_summaries(missing)
+        return [live.get(row["id"]) or self._from_row(row, tails.get(row["id"], (0, []))) for row in rows], total
 
     def get(self, identifier: str) -> Optional[BatchJob]:
         with self._lock:
-            return self._jobs.get(identifier)
+            job = self._jobs.get(identifier)
+            if job is not None:
+                self._jobs.move_to_end(identifier)
+                return job
+            return self._load(identifier)
+
+    def read_logs(self, identifier: str, since: int = 0, limit: int = MAX_LOG_PAGE) -> Tuple[List[str], int]:
+        """从行号 ``since`` 开始读取日志，返回 (日志行, 当前总行数)。任务不存在时抛出 KeyError。"""
+        with self._lock:
+            job = self._require(identifier)
+            total = job.logs.total
+            lines = job.logs.since(since)
+        if lines is None:
+            # 更早的行已移出内存；日志是批量写入的，先落盘再从数据库读取
+            self._store.flush()
+            lines = self._store.read_logs(identifier, since, limit)
+        return lines[:limit], total
 
     # ---------------------------------------------------------------- creation
     def create_job(
@@ -99,8 +227,12 @@ class JobManager:
             server_url=server_url,
             output_dir=output_dir,
         )
+        self._store.insert(self.TABLE, self._to_row(job), workflow_ids=job.workflow_ids)
         with self._lock:
-            self._jobs[identifier] = job
+            self._remember(job)
+            payload = job.to_summary()
+        job_metrics.record_created(self.KIND)
+        self._publish("job.created", job.identifier, job=payload)
         return job
 
     # ----------------------------------------------------------------- updates
@@ -109,19 +241,59 @@ class JobManager:
             job = self._require(identifier)
             job.status = "running"
             job.started_at = time.time()
+        self._touch(job)
+        self._publish_status(job)
 
     def append_log(self, identifier: str, message: str) -> None:
         with self._lock:
             job = self._require(identifier)
-            job.logs.append(message)
+            seq = job.logs.append(message)
+        self._store.append_log(identifier, seq, message)
+        self._publish("job.log", identifier, seq=seq, message=message)
+
+    def record_uploads(self, identifier: str, uploaded_names: Dict[str, str]) -> None:
+        with self._lock:
+            job = self._require(identifier)
+            job.uploaded_names.update(uploaded_names)
+            payload = dict(job.uploaded_names)
+        self._touch(job)
+        self._publish("job.uploads", identifier, uploaded_names=payload)
+
+    def record_result(self, identifier: str, result: Dict[str, object]) -> None:
+        """登记单个工作流的结果，产物随之可用，无需等待整个任务结束。"""
+        with self._lock:
+            job = self._require(identifier)
+            index = len(job.results)
+            job.results.append(result)
+            artifacts = self._build_artifacts(job, [result], start=len(job.artifacts))
+            job.artifacts.extend(artifacts)
+            summary = job.to_summary()
+        self._touch(job)
+        # 无论任务最终如何结束，这次运行的记录都已属于它，导入历史记录时不再重复导入
+        self._store.record_run_files(identifier, [str(result.get("metadata_file") or "")])
+        self._publish(
+            "job.result",
+            identifier,
+            index=index,
+            result=result,
+            artifacts=[artifact.to_dict(identifier) for artifact in artifacts],
+            result_count=summary["result_count"],
+            success_count=summary["success_count"],
+            artifact_count=summary["artifact_count"],
+        )
 
     def mark_finished(self, identifier: str, results: List[Dict[str, object]]) -> None:
         with self._lock:
             job = self._require(identifier)
             job.status = "finished"
             job.finished_at = time.time()
-            job.results = results
-            job.artifacts = self._build_artifacts(job, results)
+            job.results = list(results)
+            job.artifacts = self._build_artifacts(job, job.results)
+        self._touch(job)
+        self._store.record_run_files(identifier, [str(result.get("metadata_file") or "") for result in results or []])
+        # 结束状态立即落盘
+        self._store.flush()
+        self._publish_status(job)
 
     def mark_failed(self, identifier: str, error: str) -> None:
         with self._lock:
@@ -130,16 +302,183 @@ class JobManager:
             job.finished_at = time.time()
             job.error = error
             job.artifacts = []
+            results = list(job.results)
+        self._touch(job)
+        self._store.record_run_files(identifier, [str(result.get("metadata_file") or "") for result in results])
+        self._store.flush()
+        self._publish_status(job)
+
+    def mark_cancelled(self, identifier: str, reason: str) -> None:
+        """取消后保留已完成的结果与产出物。"""
+        with self._lock:
+            job = self._require(identifier)
+            job.status = "cancelled"
+            job.finished_at = time.time()
+            job.error = reason
+            results = list(job.results)
+        self._touch(job)
+        self._store.record_run_files(identifier, [str(result.get("metadata_file") or "") for result in results])
+        self.append_log(identifier, f"任务已取消：{reason}")
+        self._store.flush()
+        self._publish_status(job)
+
+    # ---------------------------------------------------------------- backfill
+    def backfill(self, output_root: Path, workflow_root: Optional[Path] = None) -> int:
+        """把输出目录中尚未登记的 run_metadata.json 导入为已完成的任务，返回导入数量。
+
+        指定 ``workflow_root`` 时，记录中的工作流路径转换为相对该目录的工作流标识，导入的任务可以按工作流筛选。
+        """
+        if not output_root.exists():
+            return 0
+        known = self._store.known_run_files()
+        imported = 0
+        for metadata_path in sorted(output_root.rglob("run_metadata.json")):
+            if str(metadata_path) in known:
+                continue
+            try:
+                with metadata_path.open("r", encoding="utf-8") as handle:
+                    metadata = json.load(handle)
+            except (OSError, ValueError) as exc:
+                LOG.warning("跳过无法读取的运行记录 %s: %s", metadata_path, exc)
+                continue
+            job = self._job_from_metadata(metadata_path, metadata, workflow_root)
+            self._store.insert(self.TABLE, self._to_row(job), workflow_ids=job.workflow_ids)
+            for seq, message in enumerate(job.logs.lines()):
+                self._store.append_log(job.identifier, seq, message)
+            self._store.record_run_files(job.identifier, [str(metadata_path)])
+            imported += 1
+        self._store.flush()
+        return imported
+
+    def _job_from_metadata(self, metadata_path: Path, metadata: Dict[str, object], workflow_root: Optional[Path] = None) -> BatchJob:
+        identifier = hashlib.sha1(str(metadata_path).encode("utf-8")).hexdigest()[:12]
+        status_info = metadata.get("status") if isinstance(metadata.get("status"), dict) else {}
+        succeeded = status_info.get("status_str", "success") == "success"  # type: ignore[union-attr]
+        timestamp = metadata_path.stat().st_mtime
+        workflow_path = str(metadata.get("workflow_path") or "")
+        name = str(metadata.get("case_name") or Path(workflow_path).stem or metadata_path.parent.parent.name)
+        result: Dict[str, object] = {
+            "name": name,
+            "status": "success" if succeeded else "failed",
+            "server": metadata.get("server"),
+            "prompt_id": metadata.get("prompt_id"),
+            "output_dir": str(metadata_path.parent),
+            "saved_files": list(metadata.get("saved_files") or []),
+            "metadata_file": str(metadata_path),
+        }
+        if isinstance(metadata.get("timings"), dict):
+            result["timings"] = metadata["timings"]
+        job = BatchJob(
+            identifier=identifier,
+            group_id="",
+            workflow_ids=[_workflow_identifier(workflow_path, workflow_root)] if workflow_path else [],
+            placeholders={},
+            server_url=str(metadata.get("server") or ""),
+            output_dir=str(metadata_path.parent),
+            status="finished",
+            created_at=timestamp,
+            started_at=timestamp,
+            finished_at=timestamp,
+            results=[result],
+            logs=JobLog([f"从 {metadata_path} 导入的历史运行"]),
+        )
+        job.artifacts = self._build_artifacts(job, job.results)
+        return job
+
+    # ---------------------------------------------------------------- internal
+    def _publish(self, event_type: str, identifier: str, **fields: object) -> None:
+        if self._events is not None:
+            self._events.publish(event_type, job_event(self.KIND, identifier, **fields))
+
+    def _publish_status(self, job: BatchJob) -> None:
+        with self._lock:
+            fields = {
+                "status": job.status,
+                "started_at": job.started_at,
+                "finished_at": job.finished_at,
+                "error": job.error,
+                "result_count": len(job.results),
+                "artifact_count": len(job.artifacts),
+            }
+        job_metrics.record_status(self.KIND, job.status, job.created_at, job.started_at, job.finished_at)
+        self._publish("job.status", job.identifier, **fields)
 
     def _require(self, identifier: str) -> BatchJob:
-        job = self._jobs.get(identifier)
+        job = self._jobs.get(identifier) or self._load(identifier)
         if job is None:
             raise KeyError(f"job {identifier} not found")
         return job
 
-    def _build_artifacts(self, job: BatchJob, results: List[Dict[str, object]]) -> List[JobArtifact]:
+    def _load(self, identifier: str) -> Optional[BatchJob]:
+        row = self._store.load(self.TABLE, identifier)
+        if row is None:
+            return None
+        return self._remember(self._from_row(row, self._store.log_tails([identifier], LOG_TAIL_SIZE)[identifier]))
+
+    def _remember(self, job: BatchJob) -> BatchJob:
+        current = self._jobs.setdefault(job.identifier, job)
+        self._jobs.move_to_end(job.identifier)
+        overflow = len(self._jobs) - self._cache_size
+        if overflow > 0:
+            # 只淘汰已结束的任务，运行中的任务始终保留在内存
+            for stale in [key for key, item in self._jobs.items() if item.status in FINISHED_STATUSES][:overflow]:
+                del self._jobs[stale]
+        return current
+
+    def _touch(self, job: BatchJob) -> None:
+        self._store.schedule(self.TABLE, job.identifier, partial(self._snapshot, job))
+
+    def _snapshot(self, job: BatchJob) -> Dict[str, object]:
+        with self._lock:
+            return self._to_row(job)
+
+    @staticmethod
+    def _to_row(job: BatchJob) -> Dict[str, object]:
+        return {
+            "id": job.identifier,
+            "group_id": job.group_id,
+            "status": job.status,
+            "created_at": job.created_at,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+            "server_url": job.server_url,
+            "output_dir": job.output_dir,
+            "error": job.error,
+            "data": dumps(
+                {
+                    "workflow_ids": job.workflow_ids,
+                    "placeholders": job.placeholders,
+                    "uploaded_names": job.uploaded_names,
+                    "results": job.results,
+                }
+            ),
+        }
+
+    def _from_row(self, row: Dict[str, object], log_tail: Tuple[int, List[str]]) -> BatchJob:
+        data = loads(row.get("data"), {})  # type: ignore[arg-type]
+        job = BatchJob(
+            identifier=str(row["id"]),
+            group_id=str(row.get("group_id") or ""),
+            workflow_ids=list(data.get("workflow_ids") or []),
+            placeholders=dict(data.get("placeholders") or {}),
+            uploaded_names=dict(data.get("uploaded_names") or {}),
+            server_url=str(row.get("server_url") or ""),
+            output_dir=row.get("output_dir"),  # type: ignore[arg-type]
+            status=str(row.get("status") or "queued"),
+            created_at=float(row.get("created_at") or 0),  # type: ignore[arg-type]
+            started_at=row.get("started_at"),  # type: ignore[arg-type]
+            finished_at=row.get("finished_at"),  # type: ignore[arg-type]
+            results=list(data.get("results") or []),
+            error=row.get("error"),  # type: ignore[arg-type]
+            logs=JobLog(log_tail[1], total=log_tail[0]),
+        )
+        if job.status in ARTIFACT_STATUSES:
+            job.artifacts = self._build_artifacts(job, job.results)
+        return job
+
+    def _build_artifacts(self, job: BatchJob, results: List[Dict[str, object]], *, start: int = 0) -> List[JobArtifact]:
         artifacts: List[JobArtifact] = []
-        counter = 0
+        counter = start
         for result in results or []:
             workflow_name = result.get("name") or "未命名工作流"
             for saved in result.get("saved_files") or []:
@@ -168,3 +507,13 @@ class JobManager:
         if suffix in {".mp3", ".wav", ".flac", ".aac", ".ogg"}:
             return "audio"
         return "file"
+
+
+def _workflow_identifier(workflow_path: str, workflow_root: Optional[Path]) -> str:
+    """运行记录中的工作流路径对应的工作流标识（相对 ``workflow_root``，分隔符为 ``/``）；不在该目录下时原样返回。"""
+    if workflow_root is None:
+        return workflow_path
+    try:
+        return Path(workflow_path).resolve().relative_to(workflow_root.resolve()).as_posix()
+    except (OSError, ValueError):
+        return workflow_path
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from fastapi import Request, Response, status
+
+
+@dataclass(frozen=True)
+class EncodedPayload:
+    body: bytes
+    # 强 ETag（带引号），由响应体内容决定
+    etag: str
+
+
+class PayloadCache:
+    """按名称缓存编码好的 JSON 响应体，``key`` 变化（通常是工作流索引的 generation）时才重新生成。
+
+    只在事件循环中使用，不加锁。
+    """
+
+    def __init__(self) -> None:
+        self._entries: Dict[str, Tuple[Hashable, EncodedPayload]] = {}
+
+    def get(self, name: str, key: Hashable, build: Callable[[], Any]) -> EncodedPayload:
+        entry = self._entries.get(name)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+        payload = encode_payload(build())
+        self._entries[name] = (key, payload)
+        return payload
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        """丢弃指定名称（省略时为全部）的缓存；用于 key 不变但内容可能变化的情况。"""
+        if name is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(name, None)
+
+
+def encode_payload(payload: Any) -> EncodedPayload:
+    # 与 FastAPI 默认的 JSONResponse 编码方式一致
+    body = json.dumps(payload, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+    return EncodedPayload(body=body, etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+
+
+def payload_response(request: Request, payload: EncodedPayload) -> Response:
+    """返回缓存的响应体；请求的 ``If-None-Match`` 与 ETag 相同时返回 304。"""
+    # no-cache：浏览器可以缓存，但每次使用前都要带 ETag 向服务端确认
+    headers = {"ETag": payload.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), payload.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=payload.body, media_type="application/json", headers=headers)
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """``If-None-Match`` 使用弱比较：忽略 ``W/`` 前缀，``*`` 匹配任意 ETag。"""
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import asyncio
+import bisect
+import itertools
+import logging
+from dataclasses import dataclass
+from functools import partial
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+
+LOG = logging.getLogger("scheduler")
+
+JobRunner = Callable[[], Awaitable[None]]
+# 收到取消原因；排队中被取消时立即调用，运行中被取消时在任务退出后调用
+CancelHandler = Callable[[str], None]
+
+
+@dataclass
+class ScheduledJob:
+    job_id: str
+    run: JobRunner
+    servers: Tuple[str, ...]
+    priority: int
+    sequence: int
+    on_cancel: Optional[CancelHandler] = None
+    cancel_reason: Optional[str] = None
+    task: Optional["asyncio.Task[None]"] = None
+
+    @property
+    def sort_key(self) -> Tuple[int, int]:
+        return (-self.priority, self.sequence)
+
+
+class JobScheduler:
+    """批量任务与数据集任务共用的调度器，运行在服务的事件循环上。
+
+    任务按优先级排队（数值大者先执行，同优先级先进先出）。同时运行的任务不超过 ``max_jobs`` 个，
+    每台 ComfyUI 服务器上同时运行的任务不超过 ``max_jobs_per_server`` 个；队首任务的服务器已满时，
+    使用其他服务器的任务可以先开始。
+    """
+
+    def __init__(self, *, max_jobs: int = 4, max_jobs_per_server: int = 1):
+        self.max_jobs = max(1, max_jobs)
+        self.max_jobs_per_server = max(1, max_jobs_per_server)
+        self._queue: List[ScheduledJob] = []
+        self._running: Dict[str, ScheduledJob] = {}
+        self._server_load: Dict[str, int] = {}
+        self._sequence = itertools.count()
+        self._closed = False
+
+    # ---------------------------------------------------------------- public
+    def submit(
+        self,
+        job_id: str,
+        run: JobRunner,
+        *,
+        servers: Sequence[str],
+        priority: int = 0,
+        on_cancel: Optional[CancelHandler] = None,
+    ) -> Optional[int]:
+        """加入队列并尝试立即开始；仍在排队时返回排在它前面的任务数，已开始运行时返回 None。"""
+        if self._closed:
+            raise RuntimeError("调度器已关闭")
+        entry = ScheduledJob(
+            job_id=job_id,
+            run=run,
+            servers=tuple(dict.fromkeys(server.rstrip("/") for server in servers)),
+            priority=priority,
+            sequence=next(self._sequence),
+            on_cancel=on_cancel,
+        )
+        bisect.insort(self._queue, entry, key=lambda item: item.sort_key)
+        self._dispatch()
+        return self.position(job_id)
+
+    def cancel(self, job_id: str, reason: str) -> Optional[str]:
+        """取消任务，返回取消前的状态（``queued``/``running``）；不在调度器中时返回 None。"""
+        for index, entry in enumerate(self._queue):
+            if entry.job_id == job_id:
+                del self._queue[index]
+                self._notify_cancel(entry, reason)
+                return "queued"
+        entry = self._running.get(job_id)
+        if entry is None or entry.task is None:
+            return None
+        if entry.cancel_reason is None:
+            entry.cancel_reason = reason
+            entry.task.cancel()
+        return "running"
+
+    def position(self, job_id: str) -> Optional[int]:
+        for index, entry in enumerate(self._queue):
+            if entry.job_id == job_id:
+                return index
+        return None
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "running": list(self._running),
+            "queued": [entry.job_id for entry in self._queue],
+            "server_load": dict(self._server_load),
+            "max_jobs": self.max_jobs,
+            "max_jobs_per_server": self.max_jobs_per_server,
+        }
+
+    async def close(self, reason: str) -> None:
+        """停止调度：排队的任务直接取消，运行中的任务取消后等待其退出。"""
+        self._closed = True
+        queued, self._queue = self._queue, []
+        for entry in queued:
+            self._notify_cancel(entry, reason)
+        running = list(self._running.values())
+        for entry in running:
+            entry.cancel_reason = entry.cancel_reason or reason
+            if entry.task is not None:
+                entry.task.cancel()
+        await asyncio.gather(*(entry.task for entry in running if entry.task is not None), return_exceptions=True)
+
+    # -------------------------------------------------------------- internal
+    def _dispatch(self) -> None:
+        index = 0
+        while not self._closed and index < len(self._queue) and len(self._running) < self.max_jobs:
+            entry = self._queue[index]
+            if any(self._server_load.get(server, 0) >= self.max_jobs_per_server for server in entry.servers):
+                index += 1
+                continue
+            del self._queue[index]
+            self._start(entry)
+
+    def _start(self, entry: ScheduledJob) -> None:
+        for server in entry.servers:
+            self._server_load[server] = self._server_load.get(server, 0) + 1
+        self._running[entry.job_id] = entry
+        entry.task = asyncio.get_running_loop().create_task(entry.run(), name=f"job-{entry.job_id}")
+        # 用完成回调而不是 try/finally：刚创建就被取消的任务不会进入协程
+        entry.task.add_done_callback(partial(self._finished, entry))
+
+    def _finished(self, entry: ScheduledJob, task: "asyncio.Task[None]") -> None:
+        self._running.pop(entry.job_id, None)
+        for server in entry.servers:
+            remaining = self._server_load.get(server, 0) - 1
+            if remaining > 0:
+                self._server_load[server] = remaining
+            else:
+                self._server_load.pop(server, None)
+        if task.cancelled():
+            self._notify_cancel(entry, entry.cancel_reason or "任务已取消")
+        elif task.exception() is not None:
+            LOG.error("任务 %s 异常退出: %s", entry.job_id, task.exception())
+        self._dispatch()
+
+    @staticmethod
+    def _notify_cancel(entry: ScheduledJob, reason: str) -> None:
+        if entry.on_cancel is None:
+            return
+        try:
+            entry.on_cancel(reason)
+        except Exception as exc:  # pylint: disable=broad-except
+            LOG.exception("记录任务 %s 取消状态失败: %s", entry.job_id, exc)
@@ -8,6 +8,12 @@ const state = {
   modalPlaceholderType: null,
   jobs: [],
   jobPoller: null,
+  jobEvents: null,
+  jobEventsConnected: false,
+  jobEventBuffer: null,
+  jobRenderTimer: null,
+  workflowGeneration: 0,
+  workflowRefreshTimer: null,
   activeTab: "workflows",
   workflowTree: null,
   workflowNodeMeta: new Map(),
@@ -67,6 +73,9 @@ const refs = {
   clearSelectionButton: document.getElementById("clear-selection"),
   serverInput: document.getElementById("server-url"),
   outputInput: document.getElementById("output-dir"),
+  maxInFlightInput: document.getElementById("max-in-flight"),
+  jobPriorityInput: document.getElementById("job-priority"),
+  reuseResultsToggle: document.getElementById("reuse-results"),
   tabButtons: document.querySelectorAll(".tab-button"),
   tabContents: document.querySelectorAll(".tab-content"),
   mediaFolders: document.getElementById("media-folders"),
@@ -149,6 +158,31 @@ async function fetchJSON(url, options = {}) {
   return response.json();
 }
 
+// 上次响应的 ETag 与解析结果，按 URL 保存；带 If-None-Match 重新请求，304 时直接复用
+const conditionalCache = new Map();
+
+async function fetchCachedJSON(url) {
+  const cached = conditionalCache.get(url);
+  const headers = cached ? { "If-None-Match": cached.etag } : {};
+  const response = await fetch(url, { headers });
+  if (response.status === 304 && cached) {
+    return cached.data;
+  }
+  if (!response.ok) {
+    const detail = await safeJson(response);
+    const message = detail?.detail || response.statusText;
+    throw new Error(message);
+  }
+  const data = await response.json();
+  const etag = response.headers.get("ETag");
+  if (etag) {
+    conditionalCache.set(url, { etag, data });
+  } else {
+    conditionalCache.delete(url);
+  }
+  return data;
+}
+
 async function safeJson(response) {
   try {
     return await response.json();
@@ -212,6 +246,13 @@ function getConfiguredServerUrl() {
   return fallback;
 }
 
+function getConfiguredServerUrls() {
+  return getConfiguredServerUrl()
+    .split(/[\s,，]+/)
+    .map((item) => item.trim())
+    .filter(Boolean);
+}
+
 function updateDatasetServerStatus() {
   if (!refs.datasetServerStatus) {
     return;
@@ -271,6 +312,61 @@ function renderErrorDetail(parent, rawError) {
   parent.appendChild(block);
 }
 
+const RUN_STAGE_LABELS = {
+  upload: "上传",
+  queue_wait: "排队",
+  execution: "执行",
+  history_fetch: "读取历史",
+  download: "下载",
+  persist: "写入元数据",
+};
+
+function formatSeconds(value) {
+  return value >= 10 ? `${value.toFixed(1)}s` : `${value.toFixed(2)}s`;
+}
+
+function renderRunTimings(parent, timings) {
+  if (!timings || !timings.stages) {
+    return;
+  }
+  const block = document.createElement("div");
+  block.className = "run-timings";
+  const stages = Object.entries(timings.stages)
+    .map(([stage, seconds]) => `${RUN_STAGE_LABELS[stage] || stage} ${formatSeconds(seconds)}`)
+    .join(" · ");
+  const summary = document.createElement("p");
+  summary.textContent = `耗时 ${formatSeconds(timings.total || 0)}：${stages}`;
+  block.appendChild(summary);
+
+  const nodes = timings.nodes || [];
+  if (nodes.length) {
+    const details = document.createElement("details");
+    const title = document.createElement("summary");
+    title.textContent = `节点耗时（${nodes.length} 个节点）`;
+    details.appendChild(title);
+    const list = document.createElement("ol");
+    // 最慢的节点排在前面
+    [...nodes]
+      .sort((a, b) => b.duration - a.duration)
+      .forEach((node) => {
+        const item = document.createElement("li");
+        const parts = [`#${node.node}${node.class_type ? ` ${node.class_type}` : ""}`];
+        parts.push(node.cached ? "已缓存" : formatSeconds(node.duration));
+        if (node.steps) {
+          parts.push(`${node.steps} 步`);
+        }
+        if (node.until_first_progress !== undefined) {
+          parts.push(`首步前 ${formatSeconds(node.until_first_progress)}`);
+        }
+        item.textContent = parts.join("，");
+        list.appendChild(item);
+      });
+    details.appendChild(list);
+    block.appendChild(details);
+  }
+  parent.appendChild(block);
+}
+
 function getNodeKey(node) {
   const path = node.path || "";
   return path ? path : TREE_ROOT_KEY;
@@ -830,7 +926,8 @@ function renderMedia(listing) {
 
 async function loadDatasetWorkflows() {
   try {
-    const { workflows } = await fetchJSON("/api/dataset/workflows");
+    const { workflows, generation } = await fetchCachedJSON("/api/dataset/workflows");
+    noteWorkflowGeneration(generation);
     const previous = state.dataset.selectedWorkflowId;
     state.dataset.workflows = workflows || [];
     state.dataset.workflowIdSet = new Set((state.dataset.workflows || []).map((item) => item.id));
@@ -1429,7 +1526,8 @@ async function runDataset() {
     return;
   }
   const serverUrl = getConfiguredServerUrl();
-  if (!serverUrl) {
+  const serverUrls = getConfiguredServerUrls();
+  if (!serverUrls.length) {
     showToast("请先在数据集服务器地址中填写可用的 ComfyUI 地址");
     return;
   }
@@ -1449,7 +1547,9 @@ async function runDataset() {
     options: {
       convert_images_to_jpg: true,
       append: state.dataset.appendMode,
-      server_url: serverUrl,
+      server_url: serverUrls[0],
+      server_urls: serverUrls,
+      priority: getJobPriority(),
     },
   };
   state.dataset.serverUrl = serverUrl;
@@ -1584,57 +1684,78 @@ function startDatasetJobPolling(jobId) {
   state.dataset.jobStatus = state.dataset.jobStatus || { status: "queued", total: 0, completed: 0 };
   renderDatasetJobStatus();
   pollDatasetJob(jobId);
-  state.dataset.jobPoller = setInterval(() => pollDatasetJob(jobId), 1000);
+  // 事件流已连接时由推送更新进度，只在断开时轮询
+  if (!state.jobEventsConnected) {
+    state.dataset.jobPoller = setInterval(() => pollDatasetJob(jobId), 1000);
+  }
 }
 
 function stopDatasetJobPolling() {
+  clearDatasetJobPoller();
+  state.dataset.currentJobId = null;
+}
+
+function clearDatasetJobPoller() {
   if (state.dataset.jobPoller) {
     clearInterval(state.dataset.jobPoller);
     state.dataset.jobPoller = null;
   }
-  state.dataset.currentJobId = null;
 }
 
 async function pollDatasetJob(jobId) {
   try {
     const job = await fetchJSON(`/api/dataset-jobs/${jobId}`);
-    state.dataset.jobStatus = job;
+    if (state.dataset.currentJobId !== jobId) {
+      return;
+    }
+    await applyDatasetJobUpdate(job);
+  } catch (error) {
+    stopDatasetJobPolling();
+    state.dataset.isRunning = false;
+    updateDatasetRunButton();
+    showToast(`查询数据集任务失败：${error.message}`);
     renderDatasetJobStatus();
     updateDatasetServerStatus();
-    if (job.status === "running") {
-      state.dataset.isRunning = true;
-      updateDatasetRunButton();
+  }
+}
+
+async function applyDatasetJobUpdate(job) {
+  state.dataset.jobStatus = job;
+  renderDatasetJobStatus();
+  updateDatasetServerStatus();
+  if (job.status === "running") {
+    state.dataset.isRunning = true;
+    updateDatasetRunButton();
+  }
+  if (job.status === "finished") {
+    stopDatasetJobPolling();
+    state.dataset.isRunning = false;
+    updateDatasetRunButton();
+    const result = job.result || {};
+    const totalText = result.total_runs ? `新增 ${result.total_runs} 条，累计 ${result.total_count || result.total_runs} 条` : "任务完成";
+    showToast(`数据集 ${result.dataset || state.dataset.datasetName} ${totalText}`);
+    await loadDatasetsList();
+    const datasetName = result.dataset || state.dataset.datasetName;
+    if (datasetName) {
+      await viewDataset(datasetName);
     }
-    if (job.status === "finished") {
-      stopDatasetJobPolling();
-      state.dataset.isRunning = false;
-      updateDatasetRunButton();
-      const result = job.result || {};
-      const totalText = result.total_runs ? `新增 ${result.total_runs} 条，累计 ${result.total_count || result.total_runs} 条` : "任务完成";
-      showToast(`数据集 ${result.dataset || state.dataset.datasetName} ${totalText}`);
-      await loadDatasetsList();
-      const datasetName = result.dataset || state.dataset.datasetName;
-      if (datasetName) {
-        await viewDataset(datasetName);
-      }
-      if (!state.dataset.appendMode) {
-        state.dataset.datasetName = "";
-        state.dataset.newDatasetName = "";
-        if (refs.datasetNameInput) {
-          refs.datasetNameInput.value = "";
-        }
+    if (!state.dataset.appendMode) {
+      state.dataset.datasetName = "";
+      state.dataset.newDatasetName = "";
+      if (refs.datasetNameInput) {
+        refs.datasetNameInput.value = "";
       }
-    } else if (job.status === "failed") {
-      stopDatasetJobPolling();
-      state.dataset.isRunning = false;
-      updateDatasetRunButton();
-      showToast(`数据集任务失败：${job.error || "未知错误"}`);
     }
-  } catch (error) {
+  } else if (job.status === "failed") {
     stopDatasetJobPolling();
     state.dataset.isRunning = false;
     updateDatasetRunButton();
-    showToast(`查询数据集任务失败：${error.message}`);
+    showToast(`数据集任务失败：${job.error || "未知错误"}`);
+  } else if (job.status === "cancelled") {
+    stopDatasetJobPolling();
+    state.dataset.isRunning = false;
+    updateDatasetRunButton();
+    showToast("数据集任务已取消");
   }
   renderDatasetJobStatus();
   updateDatasetServerStatus();
@@ -1665,6 +1786,31 @@ function renderDatasetJobStatus() {
     text += ` · 错误：${job.error}`;
   }
   refs.datasetJobStatus.textContent = text;
+  const jobId = state.dataset.currentJobId;
+  if (jobId && (job.status === "queued" || job.status === "running")) {
+    const cancelButton = document.createElement("button");
+    cancelButton.type = "button";
+    cancelButton.textContent = "取消任务";
+    cancelButton.addEventListener("click", () => cancelJob(`/api/dataset-jobs/${jobId}/cancel`, cancelButton));
+    refs.datasetJobStatus.appendChild(document.createTextNode(" "));
+    refs.datasetJobStatus.appendChild(cancelButton);
+  }
+}
+
+function getJobPriority() {
+  const priority = parseInt(refs.jobPriorityInput?.value, 10);
+  return Number.isFinite(priority) ? Math.max(-100, Math.min(100, priority)) : 0;
+}
+
+async function cancelJob(url, button) {
+  button.disabled = true;
+  try {
+    const { status } = await fetchJSON(url, { method: "POST" });
+    showToast(status === "cancelling" ? "正在取消任务，已撤回排队中的运行" : "任务已取消");
+  } catch (error) {
+    button.disabled = false;
+    showToast(`取消任务失败：${error.message}`);
+  }
 }
 
 function translateJobStatus(status) {
@@ -1677,6 +1823,8 @@ function translateJobStatus(status) {
       return "已完成";
     case "failed":
       return "已失败";
+    case "cancelled":
+      return "已取消";
     default:
       return status || "未知";
   }
@@ -2478,6 +2626,20 @@ async function openResultsModal(jobId) {
   }
 }
 
+function createLogItem(entry) {
+  const item = document.createElement("li");
+  const detail = extractErrorDetail(entry);
+  if (detail) {
+    const pre = document.createElement("pre");
+    pre.className = "error-pre";
+    pre.textContent = JSON.stringify(detail, null, 2);
+    item.appendChild(pre);
+  } else {
+    item.textContent = entry;
+  }
+  return item;
+}
+
 function closeResultsModal() {
   refs.resultsModal.classList.add("hidden");
   refs.resultsModalContent.innerHTML = "";
@@ -2526,19 +2688,27 @@ function renderResultsModal(job) {
     logsTitle.textContent = "执行日志：";
     container.appendChild(logsTitle);
     const logsList = document.createElement("ul");
-    job.logs.forEach((entry) => {
-      const item = document.createElement("li");
-      const detail = extractErrorDetail(entry);
-      if (detail) {
-        const pre = document.createElement("pre");
-        pre.className = "error-pre";
-        pre.textContent = JSON.stringify(detail, null, 2);
-        item.appendChild(pre);
-      } else {
-        item.textContent = entry;
-      }
-      logsList.appendChild(item);
-    });
+    job.logs.forEach((entry) => logsList.appendChild(createLogItem(entry)));
+    if (job.log_offset > 0) {
+      // 详情只带最近的日志，更早的部分按需读取
+      const moreButton = document.createElement("button");
+      moreButton.type = "button";
+      moreButton.textContent = `加载更早的 ${job.log_offset} 行日志`;
+      moreButton.addEventListener("click", async () => {
+        moreButton.disabled = true;
+        try {
+          const page = await fetchJSON(`/api/jobs/${job.id}/logs?since=0&limit=${job.log_offset}`);
+          const fragment = document.createDocumentFragment();
+          page.logs.forEach((entry) => fragment.appendChild(createLogItem(entry)));
+          logsList.insertBefore(fragment, logsList.firstChild);
+          moreButton.remove();
+        } catch (error) {
+          moreButton.disabled = false;
+          showToast(`读取日志失败：${error.message}`);
+        }
+      });
+      container.appendChild(moreButton);
+    }
     container.appendChild(logsList);
   }
 
@@ -2576,6 +2746,7 @@ function renderResultsModal(job) {
       if (result.error) {
         renderErrorDetail(card, result.error);
       }
+      renderRunTimings(card, result.timings);
 
       const artifacts = artifactGroups[name] || [];
       if (artifacts.length) {
@@ -2663,12 +2834,23 @@ async function runBatch() {
     group_id: state.selectedGroupId,
     workflow_ids: workflowIds,
     placeholders,
-    server_url: refs.serverInput.value.trim() || "http://127.0.0.1:8189",
+    server_url: "http://127.0.0.1:8189",
   };
+  const serverUrls = getConfiguredServerUrls();
+  if (serverUrls.length) {
+    payload.server_url = serverUrls[0];
+    payload.server_urls = serverUrls;
+  }
   const outputDir = refs.outputInput.value.trim();
   if (outputDir) {
     payload.output_dir = outputDir;
   }
+  const maxInFlight = parseInt(refs.maxInFlightInput?.value, 10);
+  if (Number.isFinite(maxInFlight) && maxInFlight > 0) {
+    payload.max_in_flight = maxInFlight;
+  }
+  payload.reuse_results = Boolean(refs.reuseResultsToggle?.checked);
+  payload.priority = getJobPriority();
 
   refs.runButton.disabled = true;
   try {
@@ -2678,7 +2860,9 @@ async function runBatch() {
       body: JSON.stringify(payload),
     });
     showToast(`任务已提交：${job_id}`);
-    pollJobs();
+    if (!state.jobEventsConnected) {
+      pollJobs();
+    }
   } catch (error) {
     showToast(`提交任务失败：${error.message}`);
   } finally {
@@ -2688,7 +2872,8 @@ async function runBatch() {
 
 async function loadGroups() {
   try {
-    const { groups } = await fetchJSON("/api/workflow-groups");
+    const { groups, generation } = await fetchCachedJSON("/api/workflow-groups");
+    noteWorkflowGeneration(generation);
     state.groups = groups;
     renderGroups();
     const activeGroup = state.groups.find((item) => item.id === state.selectedGroupId) || state.groups[0];
@@ -2742,7 +2927,8 @@ function clearAllSelections() {
 
 async function loadWorkflowTree() {
   try {
-    const { tree } = await fetchJSON("/api/workflow-tree");
+    const { tree, generation } = await fetchCachedJSON("/api/workflow-tree");
+    noteWorkflowGeneration(generation);
     state.workflowTree = tree;
     if (tree) {
       indexWorkflowTree(tree);
@@ -2764,24 +2950,52 @@ async function pollJobs() {
   } catch (error) {
     console.error("读取任务失败", error);
   }
+  checkWorkflowGeneration();
+}
+
+function noteWorkflowGeneration(generation) {
+  if (typeof generation === "number" && generation > state.workflowGeneration) {
+    state.workflowGeneration = generation;
+  }
+}
+
+// 服务端工作流索引变化（generation 增加）后重新拉取分组、目录树与数据集工作流；短时间内的多次变化合并为一次
+function scheduleWorkflowRefresh(generation) {
+  if (typeof generation !== "number" || generation <= state.workflowGeneration) {
+    return;
+  }
+  clearTimeout(state.workflowRefreshTimer);
+  state.workflowRefreshTimer = setTimeout(() => {
+    state.workflowRefreshTimer = null;
+    if (generation <= state.workflowGeneration) {
+      return;
+    }
+    Promise.all([loadGroups(), loadWorkflowTree(), loadDatasetWorkflows()]);
+  }, 300);
+}
+
+async function checkWorkflowGeneration() {
+  try {
+    const { generation } = await fetchJSON("/api/workflow-generation");
+    scheduleWorkflowRefresh(generation);
+  } catch (error) {
+    console.error("读取工作流版本失败", error);
+  }
 }
 
 function renderJobs() {
   refs.resultsTableBody.innerHTML = "";
   state.jobs.forEach((job) => {
     const row = document.createElement("tr");
-    const lastLog = job.logs && job.logs.length ? job.logs[job.logs.length - 1] : "";
-    let remark = job.error || lastLog;
+    let remark = job.error || job.last_log || "";
     const parsedRemark = extractErrorDetail(remark);
     if (parsedRemark && parsedRemark.error && parsedRemark.error.message) {
       remark = parsedRemark.error.message;
     } else if (parsedRemark && parsedRemark.message) {
       remark = parsedRemark.message;
     }
-    const totalWorkflows = Array.isArray(job.results) ? job.results.length : 0;
-    const successWorkflows = Array.isArray(job.results)
-      ? job.results.filter((result) => result.status === "success").length
-      : 0;
+    const totalWorkflows = job.result_count || 0;
+    const successWorkflows = job.success_count || 0;
     let summary = totalWorkflows ? `${successWorkflows}/${totalWorkflows} 成功` : "";
     if (remark) {
       summary = summary ? `${summary} | ${remark}` : remark;
@@ -2789,7 +3003,7 @@ function renderJobs() {
     row.innerHTML = `
       <td>${job.id}</td>
       <td>${job.status}</td>
-      <td>${job.workflow_ids.length}</td>
+      <td>${job.workflow_count}</td>
       <td>${formatTime(job.started_at)}</td>
       <td>${formatTime(job.finished_at)}</td>
       <td class="job-remark"></td>
@@ -2801,6 +3015,13 @@ function renderJobs() {
     button.textContent = "查看";
     button.addEventListener("click", () => openResultsModal(job.id));
     detailCell.appendChild(button);
+    if (job.status === "queued" || job.status === "running") {
+      const cancelButton = document.createElement("button");
+      cancelButton.type = "button";
+      cancelButton.textContent = "取消";
+      cancelButton.addEventListener("click", () => cancelJob(`/api/jobs/${job.id}/cancel`, cancelButton));
+      detailCell.appendChild(cancelButton);
+    }
     const remarkCell = row.querySelector(".job-remark");
     if (remarkCell) {
       remarkCell.textContent = summary;
@@ -2929,25 +3150,27 @@ function isAncestorPath(parent, child) {
 }
 
 async function testServerConnection() {
-  const serverUrl = refs.serverInput.value.trim();
-  if (!serverUrl) {
+  const serverUrls = getConfiguredServerUrls();
+  if (!serverUrls.length) {
     showToast("请输入服务器地址");
     return;
   }
-  try {
-    const result = await fetchJSON("/api/test-server", {
-      method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ server_url: serverUrl }),
-    });
-    if (result.status === "ok") {
-      showToast(result.detail || "连接成功");
-    } else {
-      showToast(result.detail || "连接失败");
-    }
-  } catch (error) {
-    showToast(`连接失败：${error.message}`);
-  }
+  const messages = await Promise.all(
+    serverUrls.map(async (serverUrl) => {
+      try {
+        const result = await fetchJSON("/api/test-server", {
+          method: "POST",
+          headers: { "Content-Type": "application/json" },
+          body: JSON.stringify({ server_url: serverUrl }),
+        });
+        const detail = result.detail || (result.status === "ok" ? "连接成功" : "连接失败");
+        return serverUrls.length > 1 ? `${serverUrl}：${detail}` : detail;
+      } catch (error) {
+        return serverUrls.length > 1 ? `${serverUrl}：连接失败：${error.message}` : `连接失败：${error.message}`;
+      }
+    }),
+  );
+  showToast(messages.join("；"));
 }
 
 function switchTab(tabId) {
@@ -3325,11 +3548,173 @@ function setupEventListeners() {
 }
 
 function startPolling() {
+  stopPolling();
+  state.jobPoller = setInterval(pollJobs, 5000);
+  pollJobs();
+}
+
+function stopPolling() {
   if (state.jobPoller) {
     clearInterval(state.jobPoller);
+    state.jobPoller = null;
   }
-  state.jobPoller = setInterval(pollJobs, 5000);
-  pollJobs();
+}
+
+const JOB_EVENT_TYPES = ["job.created", "job.status", "job.log", "job.result", "job.progress"];
+const JOB_LIST_LIMIT = 50;
+
+function connectJobEvents() {
+  if (!window.EventSource) {
+    startPolling();
+    return;
+  }
+  const source = new EventSource("/api/events");
+  state.jobEvents = source;
+  // 每次（重新）连接都会先收到 hello，此时拉取一次完整快照，之后只应用增量
+  source.addEventListener("hello", () => {
+    state.jobEventsConnected = true;
+    stopPolling();
+    clearDatasetJobPoller();
+    resyncJobs();
+    // 断线期间可能错过 workflows.changed
+    checkWorkflowGeneration();
+  });
+  source.addEventListener("resync", () => resyncJobs());
+  source.addEventListener("workflows.changed", (event) => {
+    try {
+      scheduleWorkflowRefresh(JSON.parse(event.data).generation);
+    } catch (error) {
+      console.error("无法解析工作流事件", error);
+    }
+  });
+  JOB_EVENT_TYPES.forEach((type) => {
+    source.addEventListener(type, (event) => {
+      let data;
+      try {
+        data = JSON.parse(event.data);
+      } catch (error) {
+        console.error("无法解析任务事件", error);
+        return;
+      }
+      handleJobEvent(type, data);
+    });
+  });
+  source.onerror = () => {
+    if (state.jobEventsConnected) {
+      state.jobEventsConnected = false;
+      // 断线期间退回轮询，浏览器会自动重连
+      startPolling();
+      const datasetJobId = state.dataset.currentJobId;
+      if (datasetJobId && !state.dataset.jobPoller) {
+        state.dataset.jobPoller = setInterval(() => pollDatasetJob(datasetJobId), 1000);
+      }
+    }
+    if (source.readyState === EventSource.CLOSED) {
+      state.jobEvents = null;
+      if (!state.jobPoller) {
+        startPolling();
+      }
+      setTimeout(connectJobEvents, 10000);
+    }
+  };
+}
+
+async function resyncJobs() {
+  state.jobEventBuffer = [];
+  try {
+    const { jobs } = await fetchJSON(`/api/jobs?limit=${JOB_LIST_LIMIT}`);
+    state.jobs = jobs;
+  } catch (error) {
+    console.error("读取任务失败", error);
+  }
+  // 快照返回前到达的事件可能已包含在快照里，事件本身是幂等的，重新应用即可
+  const pending = state.jobEventBuffer || [];
+  state.jobEventBuffer = null;
+  pending.forEach(([type, data]) => applyBatchJobEvent(type, data));
+  renderJobs();
+  if (state.dataset.currentJobId) {
+    pollDatasetJob(state.dataset.currentJobId);
+  }
+}
+
+function handleJobEvent(type, data) {
+  if (data.kind === "dataset") {
+    applyDatasetJobEvent(type, data);
+    return;
+  }
+  if (state.jobEventBuffer) {
+    state.jobEventBuffer.push([type, data]);
+    return;
+  }
+  applyBatchJobEvent(type, data);
+  scheduleJobsRender();
+}
+
+function applyBatchJobEvent(type, data) {
+  if (type === "job.created") {
+    if (!state.jobs.some((job) => job.id === data.id)) {
+      state.jobs.unshift(data.job);
+      state.jobs.length = Math.min(state.jobs.length, JOB_LIST_LIMIT);
+    }
+    return;
+  }
+  const job = state.jobs.find((item) => item.id === data.id);
+  if (!job) {
+    return;
+  }
+  if (type === "job.status") {
+    job.status = data.status;
+    job.started_at = data.started_at;
+    job.finished_at = data.finished_at;
+    job.error = data.error;
+    job.result_count = data.result_count;
+    job.artifact_count = data.artifact_count;
+  } else if (type === "job.log") {
+    // 快照之后重放的旧事件不能覆盖更新的摘要
+    if (data.seq + 1 >= (job.log_count || 0)) {
+      job.log_count = data.seq + 1;
+      job.last_log = data.message;
+    }
+  } else if (type === "job.result") {
+    job.result_count = Math.max(job.result_count || 0, data.result_count);
+    job.success_count = Math.max(job.success_count || 0, data.success_count);
+    job.artifact_count = Math.max(job.artifact_count || 0, data.artifact_count);
+  }
+}
+
+function applyDatasetJobEvent(type, data) {
+  if (data.id !== state.dataset.currentJobId) {
+    return;
+  }
+  const job = { ...(state.dataset.jobStatus || {}) };
+  if (type === "job.progress") {
+    job.completed = data.completed;
+    job.total = data.total;
+  } else if (type === "job.status") {
+    Object.assign(job, {
+      status: data.status,
+      total: data.total,
+      completed: data.completed,
+      started_at: data.started_at,
+      finished_at: data.finished_at,
+      error: data.error,
+      result: data.result,
+    });
+  } else {
+    return;
+  }
+  applyDatasetJobUpdate(job);
+}
+
+function scheduleJobsRender() {
+  // 日志事件可能很密集，合并到一次重绘
+  if (state.jobRenderTimer) {
+    return;
+  }
+  state.jobRenderTimer = setTimeout(() => {
+    state.jobRenderTimer = null;
+    renderJobs();
+  }, 200);
 }
 
 async function bootstrap() {
@@ -3339,7 +3724,7 @@ async function bootstrap() {
   await Promise.all([loadGroups(), loadWorkflowTree(), loadDatasetWorkflows(), loadDatasetsList()]);
   renderDatasetBuilder();
   switchTab("workflows");
-  startPolling();
+  connectJobEvents();
 }
 
 bootstrap();
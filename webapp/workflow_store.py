@@ -2,11 +2,25 @@ from __future__ import annotations
 
 import hashlib
 import json
+import logging
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from dataclasses import dataclass, field
+from functools import cached_property
 import re
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Mapping, MutableMapping, Optional, Sequence, Tuple
+from stat import S_ISREG
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, MutableMapping, Optional, Sequence, Tuple
 
+from batch_workflow_tester import SlotPath, WorkflowTemplate
+from result_cache import prompt_key
+
+
+LOG = logging.getLogger("workflow_store")
 
 PlaceholderUsage = Tuple[str, Tuple[str, ...]]
 
@@ -40,6 +54,10 @@ class PlaceholderInfo:
     default_value: Optional[str] = None
 
 
+# (st_mtime_ns, st_size, st_ino)：任一变化即视为文件被修改或替换
+FileFingerprint = Tuple[int, int, int]
+
+
 @dataclass
 class WorkflowInfo:
     identifier: str
@@ -48,6 +66,13 @@ class WorkflowInfo:
     placeholders: List[PlaceholderInfo] = field(default_factory=list)
     output_types: List[str] = field(default_factory=list)
     prompt_fields: List["PromptFieldInfo"] = field(default_factory=list)
+    # 与执行结果中的 workflow_hash 相同，标识工作流的一个版本
+    content_hash: Optional[str] = None
+    # 刷新时解析一次，执行时直接由它生成提示词，不再重新读取文件；
+    # 从索引载入或由子进程解析的工作流没有模板，由 WorkflowStore.load_template 在首次执行时编译
+    template: Optional[WorkflowTemplate] = field(default=None, repr=False, compare=False)
+    # 解析时的文件指纹；文件仍是这个版本时，首次执行编译的模板才缓存到 template
+    fingerprint: Optional[FileFingerprint] = field(default=None, repr=False, compare=False)
 
     @property
     def input_signature(self) -> Tuple[Tuple[str, str], ...]:
@@ -70,7 +95,8 @@ class WorkflowGroup:
     input_signature: Tuple[Tuple[str, str], ...]
     workflows: List[WorkflowInfo]
 
-    @property
+    # 分组在成员变化时整体重建，标签与输出签名只需计算一次
+    @cached_property
     def label(self) -> str:
         input_counts = self._count_by_type(self.input_signature)
         output_counts = self._count_outputs(self.workflows)
@@ -104,7 +130,7 @@ class WorkflowGroup:
             labels.append(f"{counts[media_type]}{label}")
         return "、".join(labels)
 
-    @property
+    @cached_property
     def output_signature(self) -> Tuple[str, ...]:
         collected = {media_type for info in self.workflows for media_type in info.output_types}
         return tuple(sorted(collected))
@@ -118,27 +144,321 @@ class PromptFieldInfo:
     default_value: str
 
 
+@dataclass
+class WorkflowAnalysis:
+    """:func:`analyze_workflow` 的结果。"""
+
+    # 规范化的占位符 → 每处使用的 (class_type, 路径)
+    placeholders: Dict[str, List[PlaceholderUsage]]
+    prompt_fields: List[PromptFieldInfo]
+    output_types: List[str]
+    # 交给 WorkflowTemplate，省去它再遍历一次：每个字符串值所在的位置、标题对应的节点
+    slots: Dict[str, List[Tuple[str, SlotPath]]]
+    titles: Dict[str, List[str]]
+
+
+PLACEHOLDER_PATTERN = re.compile(r"^\{?(input_[^{}]+)\}?$")
+PROMPT_FIELD_NAMES = frozenset({"prompt", "text"})
+
+
+def analyze_workflow(workflow: Mapping[str, Any]) -> WorkflowAnalysis:
+    """一次遍历节点图，同时得到占位符及其使用位置、提示词字段、输出类型与模板所需的字符串位置。
+
+    每个节点用显式栈按原顺序深度优先遍历，不使用递归生成器；只为字符串值构造路径元组。
+    JSON 解析出的节点只包含 dict/list/标量，因此用具体类型判断，而不是较慢的抽象基类检查。
+    内容哈希不在这里计算：它仍是 ``WorkflowTemplate.content_hash`` 对整个图的一次规范化序列化（``prompt_key``），
+    由 C 实现的 ``json.dumps`` 完成，比在遍历中逐个值更新哈希更快，且与命令行工具记录的哈希一致。
+    """
+    placeholders: Dict[str, List[PlaceholderUsage]] = {}
+    prompt_fields: List[PromptFieldInfo] = []
+    output_types: set[str] = set()
+    slots: Dict[str, List[Tuple[str, SlotPath]]] = {}
+    titles: Dict[str, List[str]] = {}
+    match_placeholder = PLACEHOLDER_PATTERN.match
+
+    for node_id, node in workflow.items():
+        if not isinstance(node, dict):
+            continue
+        class_type = str(node.get("class_type", ""))
+        meta = node.get("_meta")
+        title = meta.get("title") if isinstance(meta, dict) else None
+        if title:
+            titles.setdefault(title, []).append(node_id)
+        inputs = node.get("inputs")
+        if not isinstance(inputs, dict):
+            inputs = None
+        saves_output = inputs is not None and ("filename_prefix" in inputs or bool(inputs.get("save_output")))
+        # 输出节点的 inputs 中任一键或字符串值含 "video" 即视为视频输出
+        mentions_video = False
+
+        stack: List[Tuple[Iterator[Tuple[Any, Any]], SlotPath]] = [(iter(node.items()), ())]
+        while stack:
+            items, prefix = stack[-1]
+            for key, value in items:
+                if isinstance(value, str):
+                    path = prefix + (key,)
+                    slots.setdefault(value, []).append((node_id, path))
+                    if "input_" in value:
+                        match = match_placeholder(value)
+                        if match:
+                            usage = (class_type, tuple(str(part) for part in path))
+                            placeholders.setdefault(_normalize_placeholder(match.group(1)), []).append(usage)
+                    if saves_output and not mentions_video and prefix[:1] == ("inputs",) and "video" in value.lower():
+                        mentions_video = True
+                elif isinstance(value, dict):
+                    if saves_output and not mentions_video and prefix == () and key == "inputs":
+                        mentions_video = any("video" in str(name).lower() for name in _iter_keys(value))
+                    stack.append((iter(value.items()), prefix + (key,)))
+                    break
+                elif isinstance(value, list):
+                    stack.append((iter(enumerate(value)), prefix + (key,)))
+                    break
+            else:
+                stack.pop()
+
+        if inputs is not None:
+            for key, value in inputs.items():
+                if isinstance(value, str) and key.lower() in PROMPT_FIELD_NAMES:
+                    prompt_fields.append(
+                        PromptFieldInfo(node_id=str(node_id), field=str(key), label=_prompt_label(node, key), default_value=value)
+                    )
+        if saves_output:
+            media_type = _output_type(class_type, mentions_video)
+            if media_type:
+                output_types.add(media_type)
+
+    return WorkflowAnalysis(
+        placeholders=placeholders,
+        prompt_fields=prompt_fields,
+        output_types=sorted(output_types),
+        slots=slots,
+        titles=titles,
+    )
+
+
+def _iter_keys(value: Any) -> Iterator[Any]:
+    """嵌套 dict 中的所有键（包括列表里的 dict）。"""
+    stack = [value]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, dict):
+            yield from current
+            stack.extend(item for item in current.values() if isinstance(item, (dict, list)))
+        elif isinstance(current, list):
+            stack.extend(item for item in current if isinstance(item, (dict, list)))
+
+
+def _prompt_label(node: Mapping[str, Any], field: str) -> str:
+    meta = node.get("_meta") if isinstance(node.get("_meta"), Mapping) else {}
+    title = meta.get("title") if isinstance(meta, Mapping) else None
+    class_type = node.get("class_type", "")
+    if title:
+        return f"{title} · {field}"
+    if class_type:
+        return f"{class_type} · {field}"
+    return field
+
+
+def _output_type(class_type: str, mentions_video: bool) -> Optional[str]:
+    lowered = class_type.lower()
+    if "video" in lowered or mentions_video:
+        return "video"
+    if "image" in lowered:
+        return "image"
+    if "audio" in lowered:
+        return "audio"
+    if "gif" in lowered:
+        return "gif"
+    if "text" in lowered:
+        return "text"
+    return None
+
+
+# 每个子进程至少分到这么多文件，否则进程启动的开销大于并行带来的收益
+PARALLEL_MIN_CHUNK = 32
+
+InputSignature = Tuple[Tuple[str, str], ...]
+
+
+@dataclass
+class StoreChanges:
+    """``WorkflowStore.scan`` 的结果：待移除的工作流，重新解析的文件（解析失败时为 None），以及增删的子目录。"""
+
+    removed: List[str] = field(default_factory=list)
+    updated: Dict[str, Tuple[FileFingerprint, Optional[WorkflowInfo]]] = field(default_factory=dict)
+    # 子目录 -> 是否存在；只影响目录树（如空文件夹、整个文件夹被移动）
+    directories: Dict[str, bool] = field(default_factory=dict)
+
+    def __bool__(self) -> bool:
+        return bool(self.removed or self.updated or self.directories)
+
+
 class WorkflowStore:
-    def __init__(self, root: Path):
+    """``workflow/`` 目录下工作流模板的索引。
+
+    更新分两步：``scan`` 对比文件指纹，只重新解析新增或指纹变化的文件，不修改索引，可以放到线程中执行；
+    ``apply`` 把结果写入索引，只重建成员有变化的分组，并递增 ``generation``。解析失败的文件同样记录指纹，
+    未修改前不会反复解析。索引只应在一个线程（服务的事件循环）中修改和读取。
+
+    需要解析的文件超过 ``PARALLEL_MIN_CHUNK`` 个时，分块交给进程池并行解析（如首次启动或整个目录被替换）。
+    子进程只返回可序列化的解析结果，不传回预编译的 ``template``（模板较大，跨进程传输得不偿失）；
+    这些工作流与从索引载入的一样，首次执行时由 :meth:`load_template` 编译并缓存。
+
+    指定 ``index_path`` 时，解析结果（占位符、输出类型、提示词字段，连同文件指纹）持久化到该文件，
+    启动时直接载入，无需解析任何工作流；``scan=False`` 时构造函数不扫描目录，由调用方（如
+    :class:`~webapp.workflow_watcher.WorkflowWatcher`）在后台校验。从索引载入的工作流没有预编译的
+    ``template``，首次执行时由 :meth:`load_template` 编译并缓存。
+    """
+
+    INDEX_VERSION = 2
+
+    def __init__(
+        self,
+        root: Path,
+        *,
+        index_path: Optional[Path] = None,
+        scan: bool = True,
+        workers: Optional[int] = None,
+    ):
         self.root = root
+        self.index_path = index_path
+        # 一次需要解析的文件较多时使用的进程数，默认为 CPU 核数；1 表示始终在当前进程中解析
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self._parser = WorkflowParser(root)
+        # 每次索引变化加一，客户端据此判断缓存的分组与目录树是否过期
+        self.generation = 0
         self._workflows: Dict[str, WorkflowInfo] = {}
         self._groups: Dict[str, WorkflowGroup] = {}
-        self.refresh()
+        self._fingerprints: Dict[str, FileFingerprint] = {}
+        self._members: Dict[InputSignature, Dict[str, WorkflowInfo]] = {}
+        # 持久化索引中的条目（解析失败的文件为 None），与 _fingerprints 同步维护
+        self._records: Dict[str, Optional[Dict[str, Any]]] = {}
+        # 已知的子目录（相对 root），第一次完整扫描前为 None；不写入持久化索引
+        self._directories: Optional[set[str]] = None
+        self._index_dirty = False
+        self._load_index()
+        if scan:
+            self.refresh()
 
     # --------------------------------------------------------------------- API
-    def refresh(self) -> None:
-        self._workflows.clear()
-        if not self.root.exists():
-            return
-        for path in sorted(self.root.rglob("*.json")):
-            info = self._inspect(path)
+    def refresh(self) -> bool:
+        """同步扫描整个目录并更新索引，返回索引是否有变化。"""
+        changed = self.apply(self.scan())
+        snapshot = self.index_snapshot()
+        if snapshot is not None:
+            self.write_index(snapshot)
+        return changed
+
+    def scan(self, paths: Optional[Iterable[Path]] = None) -> StoreChanges:
+        """找出磁盘上的变化；``paths`` 为变化的文件或目录（如文件系统事件），省略时扫描整个目录。"""
+        known = dict(self._fingerprints)
+        known_directories = set(self._directories or ())
+        if paths is None:
+            found, found_directories = self._walk(self.root)
+            candidates = set(known) | set(found)
+            directory_candidates = known_directories | found_directories
+        else:
+            found = {}
+            found_directories = set()
+            candidates = set()
+            directory_candidates = set()
+            for path in paths:
+                prefix = self._identifier(path)
+                if prefix is None:
+                    continue
+                # 目录被删除或移走时，其下所有已知文件和子目录都要检查
+                candidates.update(identifier for identifier in known if _within(identifier, prefix))
+                directory_candidates.update(identifier for identifier in known_directories if _within(identifier, prefix))
+                walked, walked_directories = self._walk(path)
+                found.update(walked)
+                candidates.update(walked)
+                found_directories |= walked_directories
+                directory_candidates |= walked_directories
+        changes = StoreChanges()
+        for identifier in sorted(directory_candidates):
+            exists = identifier in found_directories
+            if exists != (identifier in known_directories):
+                changes.directories[identifier] = exists
+        pending: List[Tuple[str, Path, FileFingerprint]] = []
+        for identifier in sorted(candidates):
+            entry = found.get(identifier)
+            if entry is None:
+                if identifier in known:
+                    changes.removed.append(identifier)
+                continue
+            path, fingerprint = entry
+            if known.get(identifier) != fingerprint:
+                pending.append((identifier, path, fingerprint))
+        infos = self._inspect_many([path for _, path, _ in pending])
+        for (identifier, _, fingerprint), info in zip(pending, infos):
+            changes.updated[identifier] = (fingerprint, info)
+        return changes
+
+    def apply(self, changes: StoreChanges) -> bool:
+        """把 ``scan`` 的结果写入索引，返回索引是否有变化。
+
+        任何 JSON 文件的增删改（包括无法解析的文件，目录树中同样会列出）以及子目录的增删都会增加 ``generation``。
+        第一次完整扫描只记录已有的子目录，不算作变化。
+        """
+        changed: set[InputSignature] = set()
+        for identifier in changes.removed:
+            self._fingerprints.pop(identifier, None)
+            self._records.pop(identifier, None)
+            self._discard(identifier, changed)
+        for identifier, (fingerprint, info) in changes.updated.items():
+            self._fingerprints[identifier] = fingerprint
+            self._records[identifier] = _info_to_record(info) if info is not None else None
+            self._discard(identifier, changed)
             if info is None:
                 continue
-            self._workflows[info.identifier] = info
-        self._rebuild_groups()
+            info.fingerprint = fingerprint
+            self._workflows[identifier] = info
+            self._members.setdefault(info.input_signature, {})[identifier] = info
+            changed.add(info.input_signature)
+        for signature in changed:
+            self._rebuild_group(signature)
+        directories_changed = bool(changes.directories) and self._directories is not None
+        if self._directories is None:
+            self._directories = set()
+        for identifier, exists in changes.directories.items():
+            if exists:
+                self._directories.add(identifier)
+            else:
+                self._directories.discard(identifier)
+        files_changed = bool(changes.removed or changes.updated)
+        if not files_changed and not directories_changed:
+            return False
+        if files_changed:
+            self._index_dirty = True
+        self.generation += 1
+        return True
+
+    def index_snapshot(self) -> Optional[Dict[str, Any]]:
+        """有未保存的变化时返回待写入的索引内容（在修改索引的线程中调用），否则返回 None。"""
+        if self.index_path is None or not self._index_dirty:
+            return None
+        self._index_dirty = False
+        entries = {
+            identifier: {"fingerprint": list(fingerprint), "info": self._records.get(identifier)}
+            for identifier, fingerprint in self._fingerprints.items()
+        }
+        return {"version": self.INDEX_VERSION, "entries": entries}
+
+    def write_index(self, snapshot: Mapping[str, Any]) -> None:
+        """原子地写入 ``index_snapshot`` 的结果，可以在线程中执行。"""
+        if self.index_path is None:
+            return
+        try:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.index_path.with_name(f"{self.index_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            with temp_path.open("w", encoding="utf-8") as handle:
+                json.dump(snapshot, handle, ensure_ascii=False)
+            os.replace(temp_path, self.index_path)
+        except OSError as exc:
+            LOG.warning("保存工作流索引失败: %s", exc)
 
     def list_groups(self) -> List[WorkflowGroup]:
-        return sorted(self._groups.values(), key=lambda group: group.label)
+        return sorted(self._groups.values(), key=lambda group: (group.label, group.identifier))
 
     def get_group(self, identifier: str) -> Optional[WorkflowGroup]:
         return self._groups.get(identifier)
@@ -149,31 +469,159 @@ class WorkflowStore:
     def list_workflows(self) -> List[WorkflowInfo]:
         return sorted(self._workflows.values(), key=lambda info: info.identifier)
 
+    def load_template(self, info: WorkflowInfo) -> WorkflowTemplate:
+        """工作流的预编译模板；还没有时读取文件编译。会读取文件，应在线程中调用。
+
+        文件指纹与索引中的一致时，模板缓存到 ``info.template``，之后的任务直接使用；文件在索引更新前
+        已被修改时只返回这次编译的模板，等监听器更新索引后再缓存新版本。
+        """
+        if info.template is not None:
+            return info.template
+        with info.path.open("r", encoding="utf-8") as handle:
+            fingerprint = _fingerprint(os.fstat(handle.fileno()))
+            workflow = json.load(handle)
+        if fingerprint != info.fingerprint:
+            return WorkflowTemplate(workflow, content_hash=prompt_key(workflow)[:16])
+        info.template = WorkflowTemplate(workflow, content_hash=info.content_hash or prompt_key(workflow)[:16])
+        return info.template
+
     # ------------------------------------------------------------ internal
-    def _rebuild_groups(self) -> None:
-        grouped: Dict[Tuple[Tuple[str, str], ...], List[WorkflowInfo]] = {}
-        for info in self._workflows.values():
-            key = info.input_signature
-            grouped.setdefault(key, []).append(info)
-
-        self._groups.clear()
-        for input_signature, items in grouped.items():
-            signature_blob = json.dumps({"inputs": input_signature}, ensure_ascii=False, sort_keys=True)
-            identifier = hashlib.sha1(signature_blob.encode("utf-8")).hexdigest()[:12]
-            self._groups[identifier] = WorkflowGroup(
-                identifier=identifier,
-                input_signature=input_signature,
-                workflows=sorted(items, key=lambda info: info.name),
-            )
+    def _load_index(self) -> None:
+        if self.index_path is None or not self.index_path.exists():
+            return
+        try:
+            with self.index_path.open("r", encoding="utf-8") as handle:
+                payload = json.load(handle)
+            if payload.get("version") != self.INDEX_VERSION:
+                return
+            loaded: Dict[str, Tuple[FileFingerprint, Optional[WorkflowInfo], Optional[Dict[str, Any]]]] = {}
+            for identifier, entry in payload.get("entries", {}).items():
+                fingerprint = tuple(int(value) for value in entry["fingerprint"])
+                record = entry.get("info")
+                info = _info_from_record(identifier, self.root / identifier, record) if record is not None else None
+                loaded[identifier] = (fingerprint, info, record)  # type: ignore[assignment]
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            # 索引损坏时忽略，之后的扫描会重新解析并覆盖
+            LOG.warning("工作流索引无法读取，将重新扫描: %s", exc)
+            return
+        for identifier, (fingerprint, info, record) in loaded.items():
+            self._fingerprints[identifier] = fingerprint
+            self._records[identifier] = record
+            if info is not None:
+                info.fingerprint = fingerprint
+                self._workflows[identifier] = info
+                self._members.setdefault(info.input_signature, {})[identifier] = info
+        for signature in self._members:
+            self._rebuild_group(signature)
+        if self._workflows:
+            self.generation += 1
+
+    def _identifier(self, path: Path) -> Optional[str]:
+        """相对 ``root`` 的路径（分隔符为 ``/``），根目录本身为空字符串；不在 ``root`` 下时返回 None。"""
+        try:
+            relative = Path(path).relative_to(self.root)
+        except ValueError:
+            return None
+        return "" if relative == Path(".") else relative.as_posix()
+
+    def _walk(self, path: Path) -> Tuple[Dict[str, Tuple[Path, FileFingerprint]], set[str]]:
+        """``path`` 下的 JSON 文件（带指纹）与子目录（包括 ``path`` 本身，根目录除外）。"""
+        found: Dict[str, Tuple[Path, FileFingerprint]] = {}
+        directories: set[str] = set()
+        if path.is_dir():
+            files: List[Path] = []
+            # 与 rglob 一样不进入指向目录的符号链接，但目录树会列出它们
+            for current, dirnames, filenames in os.walk(path):
+                current_path = Path(current)
+                if current_path != self.root:
+                    directories.add(current_path.relative_to(self.root).as_posix())
+                directories.update((current_path / name).relative_to(self.root).as_posix() for name in dirnames)
+                files.extend(current_path / name for name in filenames if name.endswith(".json"))
+        elif path.suffix == ".json":
+            files = [path]
+        else:
+            return found, directories
+        for file_path in files:
+            try:
+                stat = file_path.stat()
+            except OSError:
+                # 扫描过程中被删除或移动
+                continue
+            if not S_ISREG(stat.st_mode):
+                continue
+            found[file_path.relative_to(self.root).as_posix()] = (file_path, _fingerprint(stat))
+        return found, directories
+
+    def _discard(self, identifier: str, changed: set[InputSignature]) -> None:
+        info = self._workflows.pop(identifier, None)
+        if info is None:
+            return
+        members = self._members.get(info.input_signature)
+        if members is not None:
+            members.pop(identifier, None)
+        changed.add(info.input_signature)
+
+    def _rebuild_group(self, input_signature: InputSignature) -> None:
+        identifier = self._group_identifier(input_signature)
+        members = self._members.get(input_signature)
+        if not members:
+            self._members.pop(input_signature, None)
+            self._groups.pop(identifier, None)
+            return
+        self._groups[identifier] = WorkflowGroup(
+            identifier=identifier,
+            input_signature=input_signature,
+            workflows=sorted(members.values(), key=lambda info: info.name),
+        )
+
+    @staticmethod
+    def _group_identifier(input_signature: InputSignature) -> str:
+        signature_blob = json.dumps({"inputs": input_signature}, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha1(signature_blob.encode("utf-8")).hexdigest()[:12]
 
     def _inspect(self, path: Path) -> Optional[WorkflowInfo]:
+        return self._parser.inspect(path)
+
+    def _inspect_many(self, paths: Sequence[Path]) -> List[Optional[WorkflowInfo]]:
+        """解析多个文件；数量较多时分块交给进程池并行解析。"""
+        workers = min(self.workers, math.ceil(len(paths) / PARALLEL_MIN_CHUNK))
+        if workers <= 1:
+            return [self._inspect(path) for path in paths]
+        # 每个进程分到约 4 块，解析慢的文件不会拖住整批
+        size = max(PARALLEL_MIN_CHUNK, math.ceil(len(paths) / (workers * 4)))
+        chunks = [list(paths[start : start + size]) for start in range(0, len(paths), size)]
+        try:
+            # spawn：服务进程里有事件循环与后台线程，fork 出的子进程可能卡在它们持有的锁上
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                jobs = [[str(path) for path in chunk] for chunk in chunks]
+                records = list(pool.map(_inspect_chunk, [str(self.root)] * len(chunks), jobs))
+        except (OSError, BrokenProcessPool) as exc:
+            LOG.warning("并行解析工作流失败，改为逐个解析: %s", exc)
+            return [self._inspect(path) for path in paths]
+        infos: List[Optional[WorkflowInfo]] = []
+        for chunk, chunk_records in zip(chunks, records):
+            for path, record in zip(chunk, chunk_records):
+                identifier = path.relative_to(self.root).as_posix()
+                infos.append(_info_from_record(identifier, path, record) if record is not None else None)
+        return infos
+
+
+class WorkflowParser:
+    """把单个工作流 JSON 解析为 :class:`WorkflowInfo`；不保存状态，进程池的子进程各自创建一个。"""
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    def inspect(self, path: Path) -> Optional[WorkflowInfo]:
         try:
             with path.open("r", encoding="utf-8") as handle:
                 workflow: MutableMapping[str, Any] = json.load(handle)  # type: ignore[assignment]
         except Exception:
             return None
 
-        placeholders = self._collect_placeholders(workflow)
+        if not isinstance(workflow, dict):
+            return None
+        analysis = analyze_workflow(workflow)
         # 自定义排序：优先按照 _l, _r, _a 后缀顺序，然后按字母顺序
         def placeholder_sort_key(item: tuple[str, Any]) -> tuple[int, str]:
             name = item[0]
@@ -195,83 +643,23 @@ class WorkflowStore:
                 media_type=self._infer_media_type(name, usages),
                 default_value=DEFAULT_PLACEHOLDER_VALUES.get(name),
             )
-            for name, usages in sorted(placeholders.items(), key=placeholder_sort_key)
+            for name, usages in sorted(analysis.placeholders.items(), key=placeholder_sort_key)
         ]
-        output_types = sorted(self._infer_output_types(workflow))
-        prompt_fields = self._collect_prompt_fields(workflow)
-        identifier = str(path.relative_to(self.root))
+        identifier = path.relative_to(self.root).as_posix()
         name = path.stem
+        template = WorkflowTemplate(workflow, slots=analysis.slots, titles=analysis.titles)
 
         return WorkflowInfo(
             identifier=identifier,
             name=name,
             path=path,
             placeholders=placeholder_infos,
-            output_types=output_types,
-            prompt_fields=prompt_fields,
+            output_types=analysis.output_types,
+            prompt_fields=analysis.prompt_fields,
+            content_hash=template.content_hash,
+            template=template,
         )
 
-    def _collect_placeholders(self, workflow: MutableMapping[str, Any]) -> Dict[str, List[PlaceholderUsage]]:
-        collected: Dict[str, List[PlaceholderUsage]] = {}
-        placeholder_pattern = re.compile(r"^\{?(input_[^{}]+)\}?$")
-        for node_id, raw_node in workflow.items():
-            if not isinstance(raw_node, MutableMapping):
-                continue
-            class_type = str(raw_node.get("class_type", ""))
-            for path_keys, value in self._iter_paths(raw_node):
-                if isinstance(value, str):
-                    match = placeholder_pattern.match(value)
-                    if not match:
-                        continue
-                    placeholder = match.group(1)
-                    normalized = _normalize_placeholder(placeholder)
-                    collected.setdefault(normalized, []).append((class_type, path_keys))
-        return collected
-
-    def _collect_prompt_fields(self, workflow: MutableMapping[str, Any]) -> List[PromptFieldInfo]:
-        fields: List[PromptFieldInfo] = []
-        for node_id, node in workflow.items():
-            if not isinstance(node, MutableMapping):
-                continue
-            inputs = node.get("inputs")
-            if not isinstance(inputs, Mapping):
-                continue
-            for key, value in inputs.items():
-                if key.lower() not in {"prompt", "text"}:
-                    continue
-                if not isinstance(value, str):
-                    continue
-                label = self._compose_prompt_label(node, key)
-                fields.append(
-                    PromptFieldInfo(
-                        node_id=str(node_id),
-                        field=str(key),
-                        label=label,
-                        default_value=value,
-                    )
-                )
-        return fields
-
-    def _compose_prompt_label(self, node: Mapping[str, Any], field: str) -> str:
-        meta = node.get("_meta") if isinstance(node.get("_meta"), Mapping) else {}
-        title = meta.get("title") if isinstance(meta, Mapping) else None
-        class_type = node.get("class_type", "")
-        if title:
-            return f"{title} · {field}"
-        if class_type:
-            return f"{class_type} · {field}"
-        return field
-
-    def _iter_paths(self, obj: Any, prefix: Tuple[str, ...] = ()) -> Iterable[Tuple[Tuple[str, ...], Any]]:
-        if isinstance(obj, MutableMapping):
-            for key, value in obj.items():
-                yield from self._iter_paths(value, prefix + (str(key),))
-        elif isinstance(obj, list):
-            for index, value in enumerate(obj):
-                yield from self._iter_paths(value, prefix + (str(index),))
-        else:
-            yield prefix, obj
-
     def _infer_media_type(self, name: str, usages: Sequence[PlaceholderUsage]) -> str:
         lowered_name = name.strip("{}").lower()
         if "video" in lowered_name:
@@ -299,32 +687,43 @@ class WorkflowStore:
 
         return "file"
 
-    def _infer_output_types(self, workflow: MutableMapping[str, Any]) -> List[str]:
-        detected: set[str] = set()
-        for raw_node in workflow.values():
-            if not isinstance(raw_node, MutableMapping):
-                continue
-            class_type = str(raw_node.get("class_type", ""))
-            inputs = raw_node.get("inputs")
-            if not isinstance(inputs, Mapping):
-                continue
-            if "filename_prefix" not in inputs and not inputs.get("save_output"):
-                continue
-            media_type = self._output_type_from_class(class_type, inputs)
-            if media_type:
-                detected.add(media_type)
-        return sorted(detected)
 
-    def _output_type_from_class(self, class_type: str, inputs: Mapping[str, Any]) -> Optional[str]:
-        lowered = class_type.lower()
-        if "video" in lowered or "video" in json.dumps(inputs, ensure_ascii=False).lower():
-            return "video"
-        if "image" in lowered:
-            return "image"
-        if "audio" in lowered:
-            return "audio"
-        if "gif" in lowered:
-            return "gif"
-        if "text" in lowered:
-            return "text"
-        return None
+def _within(identifier: str, prefix: str) -> bool:
+    """``identifier`` 是否为 ``prefix`` 本身或其下的路径；空前缀表示根目录。"""
+    return not prefix or identifier == prefix or identifier.startswith(prefix + "/")
+
+
+def _fingerprint(stat: os.stat_result) -> FileFingerprint:
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+def _info_to_record(info: WorkflowInfo) -> Dict[str, Any]:
+    return {
+        "name": info.name,
+        "placeholders": [[item.name, item.media_type, item.default_value] for item in info.placeholders],
+        "output_types": list(info.output_types),
+        "prompt_fields": [[item.node_id, item.field, item.label, item.default_value] for item in info.prompt_fields],
+        "content_hash": info.content_hash,
+    }
+
+
+def _info_from_record(identifier: str, path: Path, record: Mapping[str, Any]) -> WorkflowInfo:
+    return WorkflowInfo(
+        identifier=identifier,
+        name=record["name"],
+        path=path,
+        placeholders=[PlaceholderInfo(name, media_type, default) for name, media_type, default in record["placeholders"]],
+        output_types=list(record["output_types"]),
+        prompt_fields=[PromptFieldInfo(*item) for item in record["prompt_fields"]],
+        content_hash=record.get("content_hash"),
+    )
+
+
+def _inspect_chunk(root: str, paths: Sequence[str]) -> List[Optional[Dict[str, Any]]]:
+    """进程池任务：解析一块文件，返回可序列化的索引条目（解析失败为 None）；模板留到首次执行时编译。"""
+    parser = WorkflowParser(Path(root))
+    records: List[Optional[Dict[str, Any]]] = []
+    for path in paths:
+        info = parser.inspect(Path(path))
+        records.append(_info_to_record(info) if info is not None else None)
+    return records
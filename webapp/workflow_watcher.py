@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+from .workflow_store import WorkflowStore
+
+
+LOG = logging.getLogger("workflow_watcher")
+
+# 收到新的 generation；在事件循环中调用
+ChangeHandler = Callable[[int], None]
+
+
+class WorkflowWatcher:
+    """在后台把 ``workflow/`` 目录的变化同步到 :class:`WorkflowStore`，读取接口直接使用内存索引。
+
+    安装了 ``watchfiles``（``uvicorn[standard]`` 自带，Linux 上基于 inotify）时按文件系统事件只检查
+    变化的路径；否则或监听失败时退回每 ``poll_interval`` 秒扫描一次文件指纹。解析在线程中进行，
+    写入索引在事件循环中进行，不会阻塞请求。
+    """
+
+    def __init__(
+        self,
+        store: WorkflowStore,
+        *,
+        poll_interval: float = 2.0,
+        debounce_ms: int = 200,
+        on_change: Optional[ChangeHandler] = None,
+    ):
+        self.store = store
+        self.poll_interval = poll_interval
+        self.debounce_ms = debounce_ms
+        self.on_change = on_change
+        self.mode = "stopped"
+        self._lock = asyncio.Lock()
+        self._stop = asyncio.Event()
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._stop.clear()
+            self._task = asyncio.get_running_loop().create_task(self._run(), name="workflow-watcher")
+
+    async def close(self) -> None:
+        task, self._task = self._task, None
+        if task is None:
+            return
+        self._stop.set()
+        try:
+            # watchfiles 在收到 stop_event 后最多再等一个 rust_timeout 周期
+            await asyncio.wait_for(task, timeout=5.0)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            pass
+        self.mode = "stopped"
+
+    async def sync(self, paths: Optional[Iterable[Path]] = None) -> bool:
+        """立即同步指定路径（省略时为整个目录），返回索引是否有变化；写操作接口在返回前调用。"""
+        async with self._lock:
+            changes = await asyncio.to_thread(self.store.scan, list(paths) if paths is not None else None)
+            changed = self.store.apply(changes)
+            snapshot = self.store.index_snapshot()
+            if snapshot is not None:
+                await asyncio.to_thread(self.store.write_index, snapshot)
+            if not changed:
+                return False
+        LOG.info("工作流索引已更新（第 %s 版，%s 个文件变化）", self.store.generation, len(changes.updated) + len(changes.removed))
+        if self.on_change is not None:
+            try:
+                self.on_change(self.store.generation)
+            except Exception as exc:  # pylint: disable=broad-except
+                LOG.warning("通知工作流变化失败: %s", exc)
+        return True
+
+    # -------------------------------------------------------------- internal
+    async def _run(self) -> None:
+        self.store.root.mkdir(parents=True, exist_ok=True)
+        try:
+            await self._watch()
+        except ImportError:
+            LOG.info("未安装 watchfiles，每 %.1f 秒扫描一次工作流目录", self.poll_interval)
+        except Exception as exc:  # pylint: disable=broad-except
+            # 例如 inotify 监听数达到上限
+            LOG.warning("监听工作流目录失败，改为每 %.1f 秒扫描: %s", self.poll_interval, exc)
+        if not self._stop.is_set():
+            await self._poll()
+
+    async def _watch(self) -> None:
+        from watchfiles import awatch  # pylint: disable=import-outside-toplevel
+
+        self.mode = "events"
+        # 监听建立之前的变化不会产生事件，先完整扫描一次
+        await self._sync_logged(None)
+        async for events in awatch(self.store.root, stop_event=self._stop, debounce=self.debounce_ms):
+            await self._sync_logged(Path(path) for _, path in events)
+
+    async def _poll(self) -> None:
+        self.mode = "polling"
+        while not self._stop.is_set():
+            await self._sync_logged(None)
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _sync_logged(self, paths: Optional[Iterable[Path]]) -> None:
+        try:
+            await self.sync(paths)
+        except Exception as exc:  # pylint: disable=broad-except
+            LOG.exception("同步工作流目录失败: %s", exc)